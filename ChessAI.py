@@ -1,80 +1,485 @@
+import json
+import multiprocessing
 import random
+import time
+from array import array
+import numpy as np
+import ChessBook
+import ChessEvaluation
 
-pieceScore = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 10, "K": 0}
-knightScores = [[1, 1, 1, 1, 1, 1, 1, 1],
-                [1, 2, 2, 2, 2, 2, 2, 1],
-                [1, 2, 3, 3, 3, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 3, 3, 3, 2, 1],
-                [1, 2, 2, 2, 2, 2, 2, 1],
-                [1, 1, 1, 1, 1, 1, 1, 1]]
-
-bishopScores = [[4, 3, 2, 1, 1, 2, 3, 4],
-                [3, 4, 3, 2, 2, 3, 4, 3],
-                [2, 3, 4, 3, 3, 4, 3, 2],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [1, 2, 3, 4, 4, 3, 2, 1],
-                [2, 3, 4, 3, 3, 4, 3, 2],
-                [3, 4, 3, 2, 2, 3, 4, 3],
-                [4, 3, 2, 1, 1, 2, 3, 4]]
-
-queenScores = [[1, 1, 1, 3, 1, 1, 1, 1],
-               [1, 1, 2, 3, 3, 1, 1, 1],
-               [1, 4, 3, 3, 3, 4, 2, 1],
-               [1, 2, 3, 3, 3, 2, 2, 1],
-               [1, 2, 3, 3, 3, 2, 2, 1],
-               [1, 4, 3, 3, 3, 4, 2, 1],
-               [1, 1, 2, 3, 3, 1, 1, 1],
-               [1, 1, 1, 3, 1, 1, 1, 1]]
-
-# Can try rook with open files ++, rook on same file as queen or other rook
-rookScores = [[4, 3, 4, 4, 4, 4, 3, 4],
-              [4, 4, 4, 4, 4, 4, 4, 4],
-              [1, 1, 2, 3, 3, 2, 1, 1],
-              [1, 2, 3, 4, 4, 3, 2, 1],
-              [1, 2, 3, 4, 4, 3, 2, 1],
-              [1, 1, 2, 3, 3, 2, 1, 1],
-              [4, 4, 4, 4, 4, 4, 4, 4],
-              [4, 3, 4, 4, 4, 4, 3, 4]]
-
-whitePawnScores = [[100, 100, 100, 100, 100, 100, 100, 100],
-                   [8, 8, 8, 8, 8, 8, 8, 8],
-                   [5, 6, 6, 7, 7, 6, 6, 5],
-                   [3, 3, 3, 5, 5, 3, 3, 3],
-                   [2, 2, 3, 4, 4, 3, 2, 2],
-                   [1, 1, 2, 3, 3, 2, 1, 1],
-                   [1, 1, 1, 0, 0, 1, 1, 1],
-                   [0, 0, 0, 0, 0, 0, 0, 0]]
-
-blackPawnScores = [[0, 0, 0, 0, 0, 0, 0, 0],
-                   [1, 1, 1, 0, 0, 1, 1, 1],
-                   [1, 1, 2, 3, 3, 2, 1, 1],
-                   [2, 2, 3, 4, 4, 3, 2, 2],
-                   [3, 3, 3, 5, 5, 3, 3, 3],
-                   [5, 6, 6, 7, 7, 6, 6, 5],
-                   [8, 8, 8, 8, 8, 8, 8, 8],
-                   [100, 100, 100, 100, 100, 100, 100, 100]]
-
-piecePositionScores = {"wP": whitePawnScores, "bP": blackPawnScores, "N": knightScores, "B": bishopScores, "R": rookScores, "Q" : queenScores}
+batchChunkSize = 65536 # Boards scored per step, keeps the temporary arrays small for huge batches
 
 checkmate = 10000
 stalemate = 0
-maxDepth = 3
+maxDepth = 3 # Depth used by findMoveMinMax and findMoveNegaMax
+debugIncrementalScore = False # Check the running score on GameState against a full board scan at every leaf
+maxSearchDepth = 32 # Deepest iteration findBestMove will try
+searchTimeLimit = 2.0 # Seconds per move for findBestMove, None for no limit
+searchNodeLimit = None # Nodes per move for findBestMove, None for no limit
+searchDepth = maxDepth # Depth of the iteration being searched, the root is where depth == searchDepth
+searchDeadline = None
+searchNodeBudget = None
+searchAborted = False
+stopRequested = None # Function returning True when the search should stop early, set by ChessWorker and ChessUCI (the pool processes read searchStopEvent instead)
+searchNodes = 0 # Nodes of the current search, counted even without stats since the node budget needs it
+collectSearchStats = False # Fill a SearchStats for every search, off the search only pays for one "is None" test at leaves and cutoffs
+searchStatsFile = None # Path every search's SearchStats is appended to as a JSON line, needs collectSearchStats
+searchStats = None # SearchStats of the current search or None
+searchRootPly = 0 # Length of the move log at the root, ply of a node is how many moves were made since
+pvTable = [] # pvTable[ply] is the best line found from the node at that ply, the root's is the principal variation
+principalVariation = [] # Line the last finished depth expects, starting with the best move
+searchScore = 0 # Score of the last finished depth for the side to move, in pawns
+searchBackend = "bitboard" # "array" searches on the GameState it is given, "bitboard" searches on a ChessBitboard copy
+searchWorkers = 1 # Processes used by findBestMove, more than 1 splits the root moves between a process pool
+searchPool = None
+searchPoolSize = 0
+searchStopEvent = None # Shared with the pool processes, set while their searches should stop since they can't call this process's stopRequested
+stopPollSeconds = 0.01 # How often stopRequested is checked while the pool searches
+useQuiescence = True # Search captures and promotions past depth 0 instead of scoring the board in the middle of an exchange
+maxQuiescenceDepth = 8 # Node cap, plies of captures searched past depth 0
+useNullMove = True # Let the opponent move twice, if they still can't get under beta the real moves won't either
+nullMoveReduction = 3 # Extra plies taken off the search after the null move
+nullMoveMinDepth = 3
+useLateMoveReductions = True # Search quiet moves late in the ordering less deep, again at full depth only if they beat alpha
+lateMoveIndex = 3 # Moves before this one in the ordering are never reduced
+lateMoveMinDepth = 2
+lateMoveReduction = 1
+usePrincipalVariationSearch = True # Search the first move with the full window and the others with a null window, again in full only if they beat alpha
+useAspirationWindows = True # Search every depth after the first in a window around the last depth's score, widened when the score falls outside
+aspirationWindow = 0.5 # Pawns either side of the last score, doubled on every fail
+nullWindow = 0.05 # Width of a null window, under the smallest score step (a tenth of a pawn) so a window of alpha, alpha + nullWindow only tells if a score beats alpha
+useOpeningBook = True # Play a move of the book at openingBookFile before searching, see ChessBook
+openingBookFile = ChessBook.defaultBookFile
+openingBook = None # ChessBook.OpeningBook of openingBookPath, None if that file can't be opened
+openingBookPath = None
+useTranspositionTable = True
+hashSizeMB = 16 # Memory budget of the transposition table
+transpositionTable = None
+
+# Bound types stored with a score
+exactBound = 0
+lowerBound = 1 # Score is at least this (search failed high)
+upperBound = 2 # Score is at most this (search failed low)
+
+# What one findBestMove call did, returned by findBestMove when collectSearchStats is on
+class SearchStats():
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.seconds = 0.0
+        self.nodes = 0
+        self.leafNodes = 0 # Nodes scored by the evaluation
+        self.quiescenceNodes = 0
+        self.betaCutoffs = 0
+        self.firstMoveCutoffs = 0 # Cutoffs by the first move searched, the closer to betaCutoffs the better the ordering
+        self.nullMoveCutoffs = 0
+        self.reductions = 0 # Late moves searched less deep
+        self.researches = 0 # Reduced moves that beat alpha and were searched again at full depth
+        self.depths = [] # Every finished iteration: depth, best move, score, nodes and seconds so far
+        self.bestMove = None
+        self.transpositionTable = None # TranspositionTable.getStats() at the end of the search
+
+    def finishDepth(self, depth, move, score, nodes, pv=()):
+        self.depths.append({"depth": depth, "move": str(move), "score": score, "nodes": nodes, "seconds": time.perf_counter() - self.start,
+                            "pv": [str(pvMove) for pvMove in pv]})
+
+    def finish(self, move, nodes):
+        self.seconds = time.perf_counter() - self.start
+        self.nodes = nodes
+        self.bestMove = move
+        if useTranspositionTable and transpositionTable is not None:
+            self.transpositionTable = transpositionTable.getStats()
+
+    # Counters of a search in another process, see searchRootMoves
+    def getCounters(self):
+        return self.leafNodes, self.quiescenceNodes, self.betaCutoffs, self.firstMoveCutoffs, self.nullMoveCutoffs, self.reductions, self.researches
+
+    def addCounters(self, counters):
+        self.leafNodes += counters[0]
+        self.quiescenceNodes += counters[1]
+        self.betaCutoffs += counters[2]
+        self.firstMoveCutoffs += counters[3]
+        self.nullMoveCutoffs += counters[4]
+        self.reductions += counters[5]
+        self.researches += counters[6]
+
+    def getFirstMoveCutoffRate(self):
+        return self.firstMoveCutoffs / self.betaCutoffs if self.betaCutoffs else 0.0
+
+    # Nodes of the last finished iteration over the nodes of the one before
+    def getBranchingFactor(self):
+        if len(self.depths) < 3:
+            return 0.0
+        last = self.depths[-1]["nodes"] - self.depths[-2]["nodes"]
+        previous = self.depths[-2]["nodes"] - self.depths[-3]["nodes"]
+        return last / previous if previous else 0.0
+
+    def getNPS(self):
+        return self.nodes / self.seconds if self.seconds > 0 else 0.0
+
+    def toDict(self):
+        return {"bestMove": str(self.bestMove) if self.bestMove is not None else None, "depth": self.depths[-1]["depth"] if self.depths else 0,
+                "seconds": self.seconds, "nodes": self.nodes, "nps": self.getNPS(), "leafNodes": self.leafNodes, "quiescenceNodes": self.quiescenceNodes,
+                "betaCutoffs": self.betaCutoffs, "firstMoveCutoffRate": self.getFirstMoveCutoffRate(), "nullMoveCutoffs": self.nullMoveCutoffs,
+                "reductions": self.reductions, "researches": self.researches, "branchingFactor": self.getBranchingFactor(),
+                "depths": self.depths, "transpositionTable": self.transpositionTable}
+
+    def toJSON(self):
+        return json.dumps(self.toDict())
+
+    def writeJSONLine(self, path):
+        with open(path, "a") as statsFile:
+            statsFile.write(self.toJSON() + "\n")
+
+# Fixed size table of searched positions indexed by the zobrist key
+# Every slot is stored across flat arrays (key, score, depth, bound, best moveID, search age) so the memory used is fixed by the budget
+class TranspositionTable():
+    entrySize = 8 + 8 + 1 + 1 + 2 + 1 # Bytes per slot
+
+    def __init__(self, sizeMB=hashSizeMB):
+        self.resize(sizeMB)
+
+    def resize(self, sizeMB):
+        self.sizeMB = sizeMB
+        # Largest power of two number of slots that fits the budget so the index is just a mask of the key
+        slots = 1
+        while slots * 2 * self.entrySize <= sizeMB * 1024 * 1024:
+            slots *= 2
+        self.size = slots
+        self.mask = slots - 1
+        self.keys = array("Q", bytes(8 * slots))
+        self.scores = array("d", bytes(8 * slots))
+        self.depths = array("b", bytes(slots))
+        self.bounds = array("B", bytes(slots))
+        self.moves = array("H", bytes(2 * slots)) # 0 means no best move
+        self.ages = array("B", bytes(slots))
+        self.age = 1 # Slots with age 0 are empty
+        self.resetStats()
+
+    def resetStats(self):
+        self.probes = 0
+        self.hits = 0
+        self.cutoffs = 0
+        self.stores = 0
+        self.overwrites = 0 # Stores that replaced a different position
+
+    # Call before every search so entries from older searches get replaced first
+    def newSearch(self):
+        self.age = self.age % 255 + 1
+
+    # Returns (depth, bound, score, moveID) for the position or None
+    def probe(self, key):
+        self.probes += 1
+        i = key & self.mask
+        if self.ages[i] and self.keys[i] == key:
+            self.hits += 1
+            return self.depths[i], self.bounds[i], self.scores[i], self.moves[i]
+        return None
+
+    # Replace if the slot is empty, holds the same position, is from an older search or was searched less deep
+    def store(self, key, depth, bound, score, moveID):
+        i = key & self.mask
+        if self.ages[i]:
+            if self.keys[i] == key:
+                if moveID == 0:
+                    moveID = self.moves[i] # Keep the old best move if this search didn't find one
+            elif self.ages[i] == self.age and self.depths[i] > depth:
+                return
+            else:
+                self.overwrites += 1
+        self.stores += 1
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.bounds[i] = bound
+        self.scores[i] = score
+        self.moves[i] = moveID
+        self.ages[i] = self.age
+
+    def getUsage(self):
+        return sum(1 for age in self.ages if age) / self.size
+
+    def getStats(self):
+        return {"probes": self.probes, "hits": self.hits, "hitRate": self.hits / self.probes if self.probes else 0.0,
+                "cutoffs": self.cutoffs, "stores": self.stores, "overwrites": self.overwrites}
+
+useMoveOrdering = True
+attackerOrder = {"P": 1, "N": 2, "B": 3, "R": 4, "Q": 5, "K": 6} # Least valuable attacker first, king last since it is worth 0 in ChessEvaluation.pieceScore
+# Ordering tiers, higher is searched first
+hashMoveOrder = 1000000000
+captureOrder = 100000000
+promotionOrder = 90000000
+killerOrder = 80000000
+killerMoves = [] # Two quiet moveIDs per ply that caused a cutoff
+historyScores = {} # Piece -> 8x8 table, grows every time a quiet move to that square causes a cutoff
+
+def resetMoveOrdering():
+    global killerMoves, historyScores
+    killerMoves = [[0, 0] for i in range(maxSearchDepth + 1)]
+    historyScores = {color + piece: [[0] * 8 for r in range(8)] for color in "wb" for piece in "PNBRQK"}
+
+# Sorts the root moves in place: hash move, captures by most valuable victim / least valuable attacker, promotions, killers, then quiet moves by history
+# Below the root GameState.generateMoves gives the moves in the same order stage by stage
+def orderMoves(moves, ply, hashMoveID):
+    killers = killerMoves[ply]
+    def moveOrder(move):
+        if move.moveID == hashMoveID:
+            return hashMoveOrder
+        order = 0
+        if move.isCapture:
+            order += captureOrder + 10 * ChessEvaluation.pieceScore[move.pieceCaptured[1]] - attackerOrder[move.pieceMoved[1]]
+        if move.pawnPromotion:
+            order += promotionOrder + 10 * ChessEvaluation.pieceScore[move.promotionPiece]
+        if order:
+            return order
+        if move.moveID == killers[0]:
+            return killerOrder + 1
+        if move.moveID == killers[1]:
+            return killerOrder
+        return min(historyOrder(move), killerOrder - 1)
+    moves.sort(key=moveOrder, reverse=True)
+
+def historyOrder(move):
+    return historyScores[move.pieceMoved][move.endRow][move.endCol]
+
+# Quiet move that caused a cutoff, remember it for this ply and score it in the history table
+def updateMoveOrdering(move, ply, depth):
+    killers = killerMoves[ply]
+    if killers[0] != move.moveID:
+        killers[1] = killers[0]
+        killers[0] = move.moveID
+    historyScores[move.pieceMoved][move.endRow][move.endCol] += depth * depth
 
 def findRandomMove(validMoves):
     return validMoves[random.randint(0, len(validMoves)-1)]
 
 # Helper method to make the first recursive call
-def findBestMove(gs, validMoves, returnQueue):
-    global nextMove, counter
+# Searches depth 1, 2, 3... until the time or node budget runs out, the best move of every finished depth is put on returnQueue
+# so the last move on the queue is always from the deepest completed search
+# Returns the SearchStats of the search, or None when collectSearchStats is off
+def findBestMove(gs, validMoves, returnQueue, timeLimit=None, nodeLimit=None):
+    global nextMove, principalVariation, searchScore
     nextMove = None
-    random.shuffle(validMoves)
-    counter = 0
-    # findMoveNegaMax(gs, validMoves, maxDepth, 1 if gs.whiteToMove else -1)
-    findMoveNegaMaxAplhaBeta(gs, validMoves, maxDepth, -checkmate, checkmate,  1 if gs.whiteToMove else -1)
-    print(counter)
-    returnQueue.put(nextMove)
+    principalVariation = [] # Results of the last finished depth, only reset here since a search is made of several startSearch jobs
+    searchScore = 0
+    timeLimit = searchTimeLimit if timeLimit is None else timeLimit
+    nodeLimit = searchNodeLimit if nodeLimit is None else nodeLimit
+    startSearch(timeLimit, nodeLimit)
+    stats = searchStats
+    book = getOpeningBook() if useOpeningBook else None
+    bookMove = book.pickMove(gs, validMoves) if book is not None else None # Weighted random, this is what makes the AI's games differ
+    if bookMove is not None:
+        nextMove = bookMove
+        principalVariation.append(bookMove)
+        returnQueue.put(nextMove)
+    else:
+        if searchBackend == "bitboard":
+            import ChessBitboard # Imported here so the array backend never pays for building the bitboard tables
+            gs = ChessBitboard.GameState.fromGameState(gs)
+            validMoves = gs.getValidMoves()
+        if len(validMoves) <= 1: # Nothing to think about, no move at all on checkmate or stalemate
+            nextMove = validMoves[0] if validMoves else None
+            returnQueue.put(nextMove)
+        elif searchWorkers > 1:
+            findBestMoveParallel(gs, validMoves, returnQueue, timeLimit, nodeLimit, stats)
+        else:
+            findBestMoveSerial(gs, validMoves, returnQueue)
+    if stats is not None:
+        stats.finish(nextMove, searchNodes)
+        if searchStatsFile is not None:
+            stats.writeJSONLine(searchStatsFile)
+    return stats
+
+def findBestMoveSerial(gs, validMoves, returnQueue):
+    global nextMove, searchDepth, searchRootPly, principalVariation, searchScore
+    searchRootPly = len(gs.moveLog)
+    bestMove = None
+    score = 0
+    for searchDepth in range(1, maxSearchDepth + 1):
+        if bestMove is not None: # Previous iteration's best move goes first
+            validMoves.remove(bestMove)
+            validMoves.insert(0, bestMove)
+        # findMoveNegaMax(gs, validMoves, maxDepth, 1 if gs.whiteToMove else -1)
+        score = searchRoot(gs, validMoves, score)
+        if searchAborted: # Out of budget part way, keep the move from the last finished depth
+            break
+        bestMove = nextMove
+        searchScore = score
+        principalVariation = pvTable[0] if pvTable[0] and pvTable[0][0] == bestMove else [bestMove]
+        returnQueue.put(bestMove)
+        if searchStats is not None:
+            searchStats.finishDepth(searchDepth, bestMove, score, searchNodes, principalVariation)
+        if abs(score) >= checkmate or searchOutOfBudget(): # Forced mate found or no budget left to finish another depth
+            break
+    nextMove = bestMove
+    if bestMove is None:
+        returnQueue.put(nextMove)
+
+# Searches the root at searchDepth, in a window around lastScore when aspiration windows are on
+# A score on or outside the window only bounds the real score, so the window is widened on that side and the depth searched again
+def searchRoot(gs, validMoves, lastScore):
+    turnMultipler = 1 if gs.whiteToMove else -1
+    if not useAspirationWindows or searchDepth == 1 or abs(lastScore) >= checkmate:
+        return findMoveNegaMaxAplhaBeta(gs, validMoves, searchDepth, -checkmate, checkmate, turnMultipler)
+    delta = aspirationWindow
+    alpha = lastScore - delta
+    beta = lastScore + delta
+    while True:
+        score = findMoveNegaMaxAplhaBeta(gs, validMoves, searchDepth, alpha, beta, turnMultipler)
+        if searchAborted:
+            return score
+        delta *= 2
+        if score <= alpha and alpha > -checkmate: # Fail low
+            alpha = max(score - delta, -checkmate)
+        elif score >= beta and beta < checkmate: # Fail high
+            beta = min(score + delta, checkmate)
+        else:
+            return score
+
+# Reset the budget, counters and tables for a new search
+def startSearch(timeLimit, nodeLimit):
+    global searchNodes, searchStats, transpositionTable, searchDeadline, searchNodeBudget, searchAborted, pvTable
+    searchDeadline = time.perf_counter() + timeLimit if timeLimit is not None else None
+    searchNodeBudget = nodeLimit
+    searchAborted = False
+    if useTranspositionTable:
+        if transpositionTable is None or transpositionTable.sizeMB != hashSizeMB:
+            transpositionTable = TranspositionTable(hashSizeMB)
+        transpositionTable.newSearch()
+        transpositionTable.resetStats()
+    searchNodes = 0
+    searchStats = SearchStats() if collectSearchStats else None
+    pvTable = [[] for i in range(maxSearchDepth + 2)]
+    resetMoveOrdering()
+
+# The book at openingBookFile, opened again only when the setting changes, None if there is no book there
+def getOpeningBook():
+    global openingBook, openingBookPath
+    if openingBookPath != openingBookFile:
+        if openingBook is not None:
+            openingBook.close()
+        openingBookPath = openingBookFile
+        try:
+            openingBook = ChessBook.OpeningBook(openingBookFile)
+        except (OSError, ValueError):
+            openingBook = None
+    return openingBook
+
+# Settings copied to the pool processes, they may not share this module's globals (spawn start method)
+def getSearchSettings():
+    return {name: globals()[name] for name in ("maxSearchDepth", "searchTimeLimit", "searchNodeLimit", "searchBackend", "searchWorkers",
+                                               "useOpeningBook", "openingBookFile", "useTranspositionTable", "hashSizeMB", "useMoveOrdering", "useQuiescence", "maxQuiescenceDepth",
+                                               "useNullMove", "nullMoveReduction", "nullMoveMinDepth",
+                                               "useLateMoveReductions", "lateMoveIndex", "lateMoveMinDepth", "lateMoveReduction",
+                                               "usePrincipalVariationSearch", "useAspirationWindows", "aspirationWindow",
+                                               "collectSearchStats", "searchStatsFile")}
+
+def getSearchPool(workers):
+    global searchPool, searchPoolSize, searchStopEvent
+    if searchPool is None or searchPoolSize != workers:
+        if searchPool is not None:
+            searchPool.terminate()
+        searchStopEvent = multiprocessing.Event()
+        searchPool = multiprocessing.Pool(workers, initializer=initSearchPoolProcess, initargs=(searchStopEvent,))
+        searchPoolSize = workers
+    return searchPool
+
+# Pool process setup, replaces whatever stopRequested the process inherited (a forked copy of a closure only knows the search it was made for)
+def initSearchPoolProcess(stopEvent):
+    global stopRequested
+    stopRequested = stopEvent.is_set
+
+# Runs in a pool process, searches some of the root moves to depth with the window (alpha, checkmate)
+# Returns [(moveID, score)...], nodes searched, whether the budget ran out and the SearchStats counters (None without stats)
+def searchRootMoves(gs, moveIDs, depth, alpha, settings, timeLimit, nodeLimit):
+    globals().update(settings)
+    startSearch(timeLimit, nodeLimit)
+    results = searchMoves(gs, moveIDs, depth, alpha)
+    return results, searchNodes, searchAborted, searchStats.getCounters() if searchStats is not None else None
+
+# Searches the root moves to depth with the window (alpha, checkmate) on the current budget, tables and counters, nothing is reset
+# Returns [(moveID, score)...] of the moves finished before the budget ran out
+def searchMoves(gs, moveIDs, depth, alpha):
+    global searchDepth, searchRootPly
+    searchDepth = depth
+    searchRootPly = len(gs.moveLog)
+    turnMultipler = 1 if gs.whiteToMove else -1
+    movesByID = {move.moveID: move for move in gs.getValidMoves()}
+    results = []
+    for moveID in moveIDs:
+        gs.makeMove(movesByID[moveID])
+        score = -findMoveNegaMaxAplhaBeta(gs, None, depth - 1, -checkmate, -alpha, -turnMultipler)
+        gs.undoMove()
+        if searchAborted:
+            break
+        results.append((moveID, score))
+    return results
+
+# Same iterations as findBestMove with the root moves split between searchWorkers processes
+# Every depth searches the previous best move here first, then the rest in parallel against its score (young brothers wait)
+# Moves are dealt to the workers round robin and the merge keeps the earliest move on equal scores, so the choice doesn't depend on timing
+def findBestMoveParallel(gs, validMoves, returnQueue, timeLimit, nodeLimit, stats):
+    global nextMove, searchNodes, principalVariation, searchScore, searchNodeBudget
+    pool = getSearchPool(searchWorkers)
+    searchStopEvent.clear()
+    settings = getSearchSettings()
+    searchStart = time.perf_counter()
+    poolNodes = 0
+    bestMove = None
+    for depth in range(1, maxSearchDepth + 1):
+        if bestMove is not None: # Previous iteration's best move goes first
+            validMoves.remove(bestMove)
+            validMoves.insert(0, bestMove)
+        if nodeLimit is not None:
+            searchNodeBudget = nodeLimit - poolNodes # The pool's nodes count against the budget too
+        # Here on the search findBestMove started, its tables and counters carry on from the last depth
+        scores = dict(searchMoves(gs, [validMoves[0].moveID], depth, -checkmate))
+        if searchAborted:
+            break
+        firstLine = [validMoves[0]] + pvTable[1]
+        alpha = scores[validMoves[0].moveID]
+        totalNodes = searchNodes + poolNodes
+        restIDs = [move.moveID for move in validMoves[1:]]
+        timeLeft = timeLimit - (time.perf_counter() - searchStart) if timeLimit is not None else None
+        nodesLeft = (nodeLimit - totalNodes) // searchWorkers if nodeLimit is not None else None
+        jobs = [(gs, restIDs[k::searchWorkers], depth, alpha, settings, timeLeft, nodesLeft) for k in range(min(searchWorkers, len(restIDs)))]
+        pending = pool.starmap_async(searchRootMoves, jobs)
+        while not pending.ready():
+            pending.wait(stopPollSeconds)
+            if stopRequested is not None and stopRequested():
+                searchStopEvent.set() # Passed on to the pool processes, they stop within a few hundred nodes
+        aborted = False
+        for results, nodes, workerAborted, counters in pending.get():
+            scores.update(results)
+            poolNodes += nodes
+            if stats is not None:
+                stats.addCounters(counters)
+            aborted = aborted or workerAborted
+        totalNodes = searchNodes + poolNodes
+        if aborted: # Out of budget part way, keep the move from the last finished depth
+            break
+        score = alpha
+        bestMove = validMoves[0]
+        for move in validMoves[1:]:
+            if scores[move.moveID] > score:
+                score = scores[move.moveID]
+                bestMove = move
+        searchScore = score
+        principalVariation = firstLine if bestMove == validMoves[0] else [bestMove] # The rest of a pool move's line is in the pool process
+        returnQueue.put(bestMove)
+        if stats is not None:
+            stats.finishDepth(depth, bestMove, score, totalNodes, principalVariation)
+        outOfTime = timeLimit is not None and time.perf_counter() - searchStart >= timeLimit
+        outOfNodes = nodeLimit is not None and totalNodes >= nodeLimit
+        if abs(score) >= checkmate or outOfTime or outOfNodes:
+            break
+    nextMove = bestMove
+    searchNodes += poolNodes
+    if bestMove is None:
+        returnQueue.put(nextMove)
+
+def searchOutOfBudget():
+    return ((searchDeadline is not None and time.perf_counter() >= searchDeadline) or
+            (searchNodeBudget is not None and searchNodes >= searchNodeBudget) or
+            (stopRequested is not None and stopRequested()))
 
 def findMoveMinMax(gs, validMoves, depth, whiteToMove):
     global nextMove
@@ -108,8 +513,8 @@ def findMoveMinMax(gs, validMoves, depth, whiteToMove):
 
 # Same as MinMax but only 1 for loop
 def findMoveNegaMax(gs, validMoves, depth, turnMultipler):
-    global nextMove, counter
-    counter += 1
+    global nextMove, searchNodes
+    searchNodes += 1
     if depth == 0:
         return turnMultipler * scoreBoard(gs)
 
@@ -126,31 +531,187 @@ def findMoveNegaMax(gs, validMoves, depth, turnMultipler):
     return maxScore
 
 # Alpha is current max so we start at lowest possible score, Beta is current min so we start at the highest score possible
-def findMoveNegaMaxAplhaBeta(gs, validMoves, depth, alpha, beta, turnMultipler):
-    global nextMove, counter
-    counter += 1
-    if depth == 0:
+# validMoves is None below the root, the moves are only generated if the transposition table can't answer first
+# nullMoveAllowed is False right after a null move so the search never passes twice in a row
+def findMoveNegaMaxAplhaBeta(gs, validMoves, depth, alpha, beta, turnMultipler, nullMoveAllowed=True):
+    global nextMove, searchNodes, searchAborted
+    searchNodes += 1
+    ply = len(gs.moveLog) - searchRootPly
+    pvTable[ply] = [] # Cleared before any return so the parent never picks up an old line
+    if searchNodes % 128 == 0 and searchOutOfBudget(): # Checking the clock every node is too slow
+        searchAborted = True
+    if searchAborted:
+        return 0 # Thrown away by findBestMove
+    if depth <= 0: # Reductions can take the depth past 0
+        if useQuiescence:
+            return quiescenceSearch(gs, alpha, beta, turnMultipler, 0)
+        if searchStats is not None:
+            searchStats.leafNodes += 1
+        if validMoves is None:
+            gs.getValidMoves() # Sets checkmate and stalemate for scoreBoard
         return turnMultipler * scoreBoard(gs)
 
-    # Move Ordering - Implement Later
+    alphaOriginal = alpha
+    hashMoveID = 0
+    if useTranspositionTable:
+        entry = transpositionTable.probe(gs.zobristKey)
+        if entry is not None:
+            entryDepth, bound, entryScore, hashMoveID = entry
+            if entryDepth >= depth and depth != searchDepth: # Root is always searched so nextMove gets set
+                if bound == exactBound:
+                    transpositionTable.cutoffs += 1
+                    return entryScore
+                elif bound == lowerBound:
+                    alpha = max(alpha, entryScore)
+                else:
+                    beta = min(beta, entryScore)
+                if alpha >= beta:
+                    transpositionTable.cutoffs += 1
+                    return entryScore
+
+    if validMoves is not None: # Root
+        if useMoveOrdering:
+            if not hashMoveID and validMoves: # findBestMove already put the previous best move first
+                hashMoveID = validMoves[0].moveID
+            orderMoves(validMoves, ply, hashMoveID)
+        elif hashMoveID: # Best move from last time this position was searched goes first
+            for i in range(len(validMoves)):
+                if validMoves[i].moveID == hashMoveID:
+                    validMoves.insert(0, validMoves.pop(i))
+                    break
+        moves = validMoves
+        inCheck = False # Nothing is pruned or reduced at the root
+    else:
+        if useMoveOrdering: # Stages are only generated as far as the search gets before a cutoff
+            moves = gs.generateMoves(hashMoveID, killerMoves[ply], captureOrderKey, historyOrder)
+        else:
+            moves = gs.generateMoves(hashMoveID)
+        inCheck = gs.inCheck # The moves searched below overwrite it
+        # Null move, skipped in check (passing would be illegal), near mate scores, when the board score is already under beta
+        # and when the side to move has only pawns left since there passing is often better than every real move (zugzwang)
+        if (useNullMove and nullMoveAllowed and not inCheck and depth >= nullMoveMinDepth and abs(beta) < checkmate and
+                turnMultipler * gs.boardScore / 10 >= beta and gs.hasNonPawnMaterial(gs.allyColor)):
+            gs.makeNullMove()
+            score = -findMoveNegaMaxAplhaBeta(gs, None, depth - 1 - nullMoveReduction, -beta, -beta + nullWindow, -turnMultipler, False)
+            gs.undoNullMove()
+            pvTable[ply] = [] # The null move search ran at this ply too
+            if searchAborted:
+                return 0
+            if score >= beta:
+                if searchStats is not None:
+                    searchStats.nullMoveCutoffs += 1
+                return beta
+
     maxScore = -checkmate
-    for move in validMoves:
+    bestMove = None
+    for i, move in enumerate(moves):
         gs.makeMove(move)
-        nextMoves = gs.getValidMoves()
-        score = -findMoveNegaMaxAplhaBeta(gs, nextMoves, depth - 1, -beta, -alpha, -turnMultipler) # Opp best score is worse score for us so we put - to negate
-        if score > maxScore:
+        reduce = (useLateMoveReductions and validMoves is None and i >= lateMoveIndex and depth >= lateMoveMinDepth and not inCheck and
+                  not move.isCapture and not move.pawnPromotion and not givesCheck(gs))
+        if i == 0 or not (usePrincipalVariationSearch or reduce):
+            score = -findMoveNegaMaxAplhaBeta(gs, None, depth - 1, -beta, -alpha, -turnMultipler) # Opp best score is worse score for us so we put - to negate
+        else:
+            # Null window, at reduced depth for a late move, only tells if the move beats alpha
+            # If it does it is searched again with the full window at full depth, a reduced search's fail high isn't trusted for a cutoff
+            if reduce and searchStats is not None:
+                searchStats.reductions += 1
+            score = -findMoveNegaMaxAplhaBeta(gs, None, depth - 1 - (lateMoveReduction if reduce else 0), -alpha - nullWindow, -alpha, -turnMultipler)
+            if score > alpha and (reduce or score < beta) and not searchAborted:
+                if searchStats is not None:
+                    searchStats.researches += 1
+                score = -findMoveNegaMaxAplhaBeta(gs, None, depth - 1, -beta, -alpha, -turnMultipler)
+        gs.undoMove()
+        if searchAborted:
+            return 0
+        if score > maxScore or bestMove is None:
             maxScore = score
-            if depth == maxDepth:
+            bestMove = move
+            if depth == searchDepth:
                 nextMove = move
-                print(move,score)
-        gs.undoMove()
         if maxScore > alpha: #Pruning happens
             alpha = maxScore
+            pvTable[ply] = [move] + pvTable[ply + 1]
+        if alpha >= beta:
+            if searchStats is not None:
+                searchStats.betaCutoffs += 1
+                if i == 0:
+                    searchStats.firstMoveCutoffs += 1
+            if useMoveOrdering and not move.isCapture and not move.pawnPromotion:
+                updateMoveOrdering(move, ply, depth)
+            break
+    if bestMove is None: # No legal moves
+        return -checkmate if inCheck else stalemate
+
+    if useTranspositionTable:
+        if maxScore <= alphaOriginal:
+            bound = upperBound
+        elif maxScore >= beta:
+            bound = lowerBound
+        else:
+            bound = exactBound
+        transpositionTable.store(gs.zobristKey, depth, bound, maxScore, bestMove.moveID if bestMove and bound != upperBound else 0) # Fail low has no real best move
+    return maxScore
+
+# Called after a move is made, True if it checks the side now to move
+def givesCheck(gs):
+    return gs.squareUnderAttack(*(gs.whiteKingLocation if gs.whiteToMove else gs.blackKingLocation))
+
+# Searches only captures and promotions until the position is quiet, so depth 0 never scores a board with a piece hanging
+# The side to move can stand pat on the board score since it doesn't have to capture, except in check where every evasion is searched
+# Captures that lose material by static exchange and underpromotions are skipped, and no more than maxQuiescenceDepth plies are searched
+def quiescenceSearch(gs, alpha, beta, turnMultipler, qDepth):
+    global searchNodes, searchAborted
+    if qDepth:
+        searchNodes += 1
+        if searchNodes % 128 == 0 and searchOutOfBudget():
+            searchAborted = True
+        if searchAborted:
+            return 0
+    if searchStats is not None:
+        searchStats.leafNodes += 1
+        if qDepth:
+            searchStats.quiescenceNodes += 1
+    moves = gs.generateMoves(captureKey=captureOrderKey, quiets=False) # Every evasion when in check
+    inCheck = gs.inCheck # The moves searched below overwrite it
+    standPat = turnMultipler * scoreBoard(gs)
+    if gs.checkmate or gs.stalemate or qDepth >= maxQuiescenceDepth:
+        return standPat
+
+    if inCheck:
+        maxScore = -checkmate # Stays that way if there is no evasion
+    else:
+        if standPat >= beta:
+            return standPat
+        maxScore = standPat
+        alpha = max(alpha, standPat)
+
+    for move in moves:
+        if not inCheck and (gs.staticExchange(move) < 0 or move.promotionPiece not in ("", "Q")):
+            continue
+        gs.makeMove(move)
+        score = -quiescenceSearch(gs, -beta, -alpha, -turnMultipler, qDepth + 1)
+        gs.undoMove()
+        if searchAborted:
+            return 0
+        if score > maxScore:
+            maxScore = score
+        if maxScore > alpha:
+            alpha = maxScore
         if alpha >= beta:
             break
     return maxScore
 
+# Most valuable victim / least valuable attacker, a promotion counts as winning the piece promoted to, quiet moves last
+def captureOrderKey(move):
+    order = 0
+    if move.isCapture:
+        order += 10 * ChessEvaluation.pieceScore[move.pieceCaptured[1]] - attackerOrder[move.pieceMoved[1]]
+    if move.pawnPromotion:
+        order += 10 * ChessEvaluation.pieceScore[move.promotionPiece]
+    return order if order else -10
+
 # Positive is good for white, negative is good for black
+# Material and position come from the running total GameState updates every move
 def scoreBoard(gs):
     if gs.checkmate:
         if gs.whiteToMove:
@@ -160,6 +721,38 @@ def scoreBoard(gs):
     elif gs.stalemate:
         return stalemate
 
+    if debugIncrementalScore and abs(gs.boardScore / 10 - scoreBoardFull(gs)) > 1e-9:
+        raise AssertionError("Running score " + str(gs.boardScore / 10) + " does not match the board " + str(scoreBoardFull(gs)) +
+                             " after " + " ".join(str(move) for move in gs.moveLog))
+    return gs.boardScore / 10
+
+def encodeBoard(board):
+    return np.array([ChessEvaluation.pieceCodes[square] for row in board for square in row], dtype=np.int8)
+
+# Stack the boards of many GameStates (or string boards) into the N x 64 array scoreBoards takes
+def encodeBoards(positions):
+    return np.array([encodeBoard(position.board if hasattr(position, "board") else position) for position in positions], dtype=np.int8).reshape(-1, 64)
+
+# Material and position score of N encoded boards at once, same numbers as scoreBoard gives for positions that are not checkmate or stalemate
+def scoreBoards(encodedBoards):
+    encodedBoards = np.asarray(encodedBoards, dtype=np.int8).reshape(-1, 64)
+    scores = np.empty(len(encodedBoards), dtype=np.float64)
+    squares = np.arange(64)
+    for start in range(0, len(encodedBoards), batchChunkSize):
+        chunk = encodedBoards[start:start + batchChunkSize].astype(np.intp) + 6
+        scores[start:start + len(chunk)] = ChessEvaluation.pieceSquareTable[chunk, squares].sum(axis=1) / 10 # Same tenths / 10 as the running total
+    return scores
+
+# Same score from scanning the whole board, used to check the running total
+def scoreBoardFull(gs):
+    if gs.checkmate:
+        if gs.whiteToMove:
+            return -checkmate # Black wins
+        else:
+            return checkmate # White wins
+    elif gs.stalemate:
+        return stalemate
+
     score = 0
     for row in range(len(gs.board)):
         for col in range(len(gs.board[row])):
@@ -169,12 +762,12 @@ def scoreBoard(gs):
                 piecePositionScore = 0
                 if square[1] != "K": # No position table for king
                     if square[1] == "P": # For pawns
-                        piecePositionScore = piecePositionScores[square][row][col]
+                        piecePositionScore = ChessEvaluation.piecePositionScores[square][row][col]
                     else: # For other piece
-                        piecePositionScore = piecePositionScores[square[1]][row][col]
+                        piecePositionScore = ChessEvaluation.piecePositionScores[square[1]][row][col]
                 if square[0] == 'w':
-                    score += pieceScore[square[1]] + piecePositionScore * .1 # Scores the white pieces as +
+                    score += ChessEvaluation.pieceScore[square[1]] + piecePositionScore * .1 # Scores the white pieces as +
                 elif square[0] == 'b':
-                    score -= pieceScore[square[1]] + piecePositionScore * .1 # Scores the black pieces as -
+                    score -= ChessEvaluation.pieceScore[square[1]] + piecePositionScore * .1 # Scores the black pieces as -
 
     return score
\ No newline at end of file
@@ -0,0 +1,723 @@
+"""
+Benchmarks for the engine and the AI search.
+Run: python ChessBenchmark.py parallel [--depth N] [--workers 1,2,4]
+     python ChessBenchmark.py moves [--count N]
+     python ChessBenchmark.py worker [--moves N] [--nodes N]
+     python ChessBenchmark.py checks [--positions N]
+     python ChessBenchmark.py stats [--depth N] [--output FILE]
+     python ChessBenchmark.py depth [--time SECONDS]
+     python ChessBenchmark.py pvs [--depth N]
+     python ChessBenchmark.py ponder [--moves N] [--time SECONDS] [--think SECONDS]
+     python ChessBenchmark.py render [--frames N]
+     python ChessBenchmark.py imports [--repeat N]
+     python ChessBenchmark.py pgn [--file FILE | --size MB] [--workers 1,2,4]
+     python ChessBenchmark.py book [--entries N] [--probes N]
+"""
+
+import argparse
+import itertools
+import multiprocessing
+import os
+import queue
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import ChessAI
+import ChessEngine
+import ChessPerft
+import ChessWorker
+
+pygame = ChessMain = None # GUI modules, imported by the render benchmark only so the others run headless
+
+# Middlegame positions with plenty of root moves, searched by the search benchmarks
+benchmarkPositions = [
+    "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+    "rnbqkb1r/ppp2ppp/4pn2/3p2B1/2PP4/2N5/PP2PPPP/R2QKBNR b KQkq - 3 4",
+    "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+]
+
+# Fixed depth search of every benchmark position, returns (seconds, nodes, best moves)
+def timeSearch(depth):
+    ChessAI.transpositionTable = None # Every run starts from an empty table
+    ChessAI.maxSearchDepth = depth
+    ChessAI.searchTimeLimit = None
+    ChessAI.searchNodeLimit = None
+    seconds = 0.0
+    nodes = 0
+    bestMoves = []
+    for fen in benchmarkPositions:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(fen)
+        returnQueue = queue.Queue()
+        start = time.perf_counter()
+        ChessAI.findBestMove(gs, gs.getValidMoves(), returnQueue)
+        seconds += time.perf_counter() - start
+        nodes += ChessAI.searchNodes
+        while not returnQueue.empty():
+            bestMove = returnQueue.get()
+        bestMoves.append(str(bestMove))
+    return seconds, nodes, bestMoves
+
+# Same searches with 1, 2, 4... worker processes, speedup is against 1 worker
+def benchmarkParallel(depth, workerCounts):
+    print("CPU cores:", os.cpu_count())
+    baseline = None
+    for workers in workerCounts:
+        ChessAI.searchWorkers = workers
+        timeSearch(1) # Start the pool outside the timing
+        seconds, nodes, bestMoves = timeSearch(depth)
+        baseline = baseline or seconds
+        print(f"{workers:2} workers  {seconds:7.2f}s  {nodes:>9} nodes  {nodes / seconds:>7.0f} nps  speedup {baseline / seconds:4.2f}  " + " ".join(bestMoves))
+    if ChessAI.searchPool is not None:
+        ChessAI.searchPool.terminate()
+        ChessAI.searchPool = None
+
+# The Move class before __slots__ and the packed moveID, kept to measure against
+class LegacyMove():
+    def __init__(self, startSquare, endSquare, board, enPassant = False, castleMove = False):
+        self.startRow = startSquare[0]
+        self.startCol = startSquare[1]
+        self.endRow = endSquare[0]
+        self.endCol = endSquare[1]
+        self.pieceMoved = board[self.startRow][self.startCol]
+        self.pieceCaptured = board[self.endRow][self.endCol]
+        self.pawnPromotion = (self.pieceMoved == 'wP' and self.endRow == 0) or (self.pieceMoved == 'bP' and self.endRow == 7)
+        self.castleMove = castleMove
+        self.enPassant = enPassant
+        if enPassant:
+            self.pieceCaptured = 'bP' if self.pieceMoved == 'wP' else 'wP'
+        self.isCapture = self.pieceCaptured != "--"
+        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+
+# Memory per move and moves built per second for the legacy and current Move classes, then perft throughput with the current one
+def benchmarkMoves(count):
+    board = [[str(square) for square in row] for row in ChessEngine.GameState().board]
+    squares = [((r, c), (7 - r, 7 - c)) for r in range(8) for c in range(8)]
+    squares = (squares * (count // len(squares) + 1))[:count]
+    for moveClass in (LegacyMove, ChessEngine.Move):
+        tracemalloc.start()
+        moves = [moveClass(start, end, board) for start, end in squares]
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del moves
+        seconds = float("inf")
+        for repeat in range(5): # Best of 5 to take out timer noise
+            start = time.perf_counter()
+            for startSquare, endSquare in squares:
+                moveClass(startSquare, endSquare, board)
+            seconds = min(seconds, time.perf_counter() - start)
+        print(f"{moveClass.__name__:10} {memory / count:6.1f} bytes/move  {count / seconds:>9.0f} moves/s")
+    for backend in ("array", "bitboard"):
+        gs = ChessPerft.newGameState(backend)
+        gs.loadFEN(ChessPerft.standardPositions[1][1])
+        nodes, seconds, nps = ChessPerft.timedPerft(gs, 3)
+        print(f"perft Kiwipete depth 3 {backend:8} {nps:>9.0f} nps")
+
+# GameState with the check, pin and attack detection from before the precomputed tables, kept to measure against
+class LegacyGameState(ChessEngine.GameState):
+    def getKingMoves(self, r, c, moves):
+        rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1)
+        colMoves = (-1, 0, 1, -1, 1, -1, 0, 1)
+        restrictedDirs = set()
+        for check in self.checks:
+            checkDirRow, checkDirCol = check[2], check[3]
+            checkingPiece = self.board[check[0]][check[1]]
+            if checkingPiece[1] != 'P':
+                restrictedDirs.add((-checkDirRow, -checkDirCol))  # Opposite direction of check
+
+        for i in range(8):
+            endRow = r + rowMoves[i]
+            endCol = c + colMoves[i]
+            if 0 <= endRow < 8 and 0 <= endCol < 8:  # Check if the move is within the board bounds
+                if (rowMoves[i], colMoves[i]) in restrictedDirs:
+                    continue
+                endPiece = self.board[endRow][endCol]
+                if endPiece[0] != self.allyColor:  # Not an ally piece (empty or enemy piece)
+                    if not self.squareUnderAttack(endRow, endCol):
+                        moves.append(ChessEngine.Move((r, c), (endRow, endCol), self.board))
+        self.getCastleMoves(r, c, moves)
+
+    def squareUnderAttack(self, r, c):
+        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+        for j in range(len(directions)):
+            d = directions[j]
+            for i in range(1, 8):
+                endRow = r + d[0] * i
+                endCol = c + d[1] * i
+                if 0 <= endRow < 8 and 0 <= endCol < 8:
+                    endPiece = self.board[endRow][endCol]
+                    if endPiece[0] == self.allyColor:
+                        break
+                    elif endPiece[0] == self.enemyColor:
+                        pType = endPiece[1]
+                        # 5 possibilities here in this complex conditional hits enemy that can check
+                        # 1.) orthogonally away from king and piece is a rook
+                        # 2.) diagonally away from king and piece is a bishop
+                        # 3.) any direction and piece 1  is a queen
+                        # 4.) any direction 1 square away and piece is a king (this is necessary to prevent a king move to a square controlled by another king)
+                        # 5.) 1 square away diagonally from king and piece is a pawn (it will check from the direction of the king, so if pawn is white (attack by -1), king will check +1)
+                        if ((0 <= j <= 3 and pType == 'R') or
+                                (4 <= j <= 7 and pType == 'B') or
+                                (i == 1 and pType == 'P' and ((self.enemyColor == 'w' and 6 <= j <= 7) or (self.enemyColor == 'b' and 4 <= j <= 5))) or
+                                (pType == 'Q') or (i == 1 and pType == 'K')):
+                            return True
+                        else:  # Enemy no applying attack
+                            break
+                else:  # Not on board
+                    break
+        # Knight Checks
+        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+        for m in knightMoves:
+            endRow = r + m[0]
+            endCol = c + m[1]
+            if 0 <= endRow < 8 and 0 <= endCol < 8:
+                endPiece = self.board[endRow][endCol]
+                if endPiece[0] == self.enemyColor and endPiece[1] == 'N':  # enemy knight attack king
+                    return True
+
+    def checkForPinsAndChecks(self):
+        pins = [] # Store location of allied pinned piece and the direction of the pinned from
+        inCheck = False
+        self.checks = []
+        if self.whiteToMove:
+            startRow = self.whiteKingLocation[0]
+            startCol = self.whiteKingLocation[1]
+        else:
+            startRow = self.blackKingLocation[0]
+            startCol = self.blackKingLocation[1]
+        directions = ((-1,0), (0,-1), (1, 0), (0,1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+        for j in range(len(directions)):
+            d = directions[j]
+            possiblePin = () # Store Possible Pin Reset pin
+            for i in range(1, 8):
+                nRow = startRow + d[0] * i
+                nCol = startCol + d[1] * i
+                if 0 <= nRow < 8 and 0 <= nCol < 8:
+                    endPiece = self.board[nRow][nCol]
+                    if endPiece[0] == self.allyColor:
+                        if possiblePin == ():
+                            possiblePin = (nRow, nCol, d[0], d[1])
+                        else: # Second pin
+                            break
+                    elif endPiece[0] == self.enemyColor:
+                        pType = endPiece[1]
+                        # 5 possibilities here in this complex conditional hits enemy that can check
+                        # 1.) orthogonally away from king and piece is a rook
+                        # 2.) diagonally away from king and piece is a bishop
+                        # 3.) any direction and piece 1  is a queen
+                        # 4.) any direction 1 square away and piece is a king (this is necessary to prevent a king move to a square controlled by another king)
+                        # 5.) 1 square away diagonally from king and piece is a pawn (it will check from the direction of the king, so if pawn is white (attack by -1), king will check +1)
+                        if ((0 <= j <= 3 and pType == 'R') or
+                                (4 <= j <= 7 and pType == 'B') or
+                                (i == 1 and pType == 'P' and ((self.enemyColor == 'w' and 6 <= j <= 7) or (self.enemyColor == 'b' and 4 <= j <= 5))) or
+                                (pType == 'Q') or (i == 1 and pType == 'K')):
+                            if possiblePin == (): # No piece blocking
+                                inCheck = True
+                                self.checks.append((nRow, nCol, d[0], d[1])) if (nRow, nCol, d[0], d[1]) not in self.checks else None
+                                break
+                            else: # Ally is blocking so pin
+                                pins.append(possiblePin)
+                                break
+                        else: # Enemy no applying check or pin
+                            break
+                else: # Not on board
+                    break
+        # Knight Checks
+        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+        for m in knightMoves:
+            nRow = startRow + m[0]
+            nCol = startCol + m[1]
+            if 0 <= nRow < 8 and 0 <= nCol < 8:
+                endPiece = self.board[nRow][nCol]
+                if endPiece[0] == self.enemyColor and endPiece[1] == 'N': #enemy knight attack king
+                    inCheck = True
+                    self.checks.append((nRow, nCol, m[0], m[1])) if (nRow, nCol, m[0], m[1]) not in self.checks else None
+        # Uses self.checks because we don't want to reset the checks everytime this method is called, only reset check when a move is made
+        return inCheck, pins, self.checks
+
+# Per call time of check and pin detection, attack tests on every square and full move generation, legacy against current
+# Positions come from seeded random games from the benchmark positions so both classes see the same boards
+def benchmarkChecks(positionCount):
+    rng = random.Random(0)
+    positions = []
+    while len(positions) < positionCount:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(rng.choice(benchmarkPositions))
+        for ply in range(rng.randint(0, 40)):
+            moves = gs.getValidMoves()
+            if not moves:
+                break
+            gs.makeMove(rng.choice(moves))
+        if gs.getValidMoves():
+            positions.append(gs)
+    for gsClass in (LegacyGameState, ChessEngine.GameState):
+        states = []
+        for position in positions:
+            gs = gsClass()
+            for name, value in vars(position).items():
+                if name != "moveFunctions": # Keep the methods bound to the new object
+                    setattr(gs, name, value)
+            states.append(gs)
+        timings = []
+        for name, test, callsPerState in (("checkForPinsAndChecks", lambda gs: gs.checkForPinsAndChecks(), 1),
+                                          ("squareUnderAttack", lambda gs: [gs.squareUnderAttack(r, c) for r in range(8) for c in range(8)], 64),
+                                          ("getValidMoves", lambda gs: gs.getValidMoves(), 1)):
+            seconds = float("inf")
+            for repeat in range(5): # Best of 5 to take out timer noise
+                start = time.perf_counter()
+                for gs in states:
+                    test(gs)
+                seconds = min(seconds, time.perf_counter() - start)
+            timings.append(f"{name} {seconds / (len(states) * callsPerState) * 1e6:6.2f} us")
+        print(f"{gsClass.__name__:15} " + "  ".join(timings))
+
+# Same fixed depth searches with and without SearchStats to show what collecting them costs, then the stats of every search
+# output appends them as JSON lines as well
+def benchmarkStats(depth, output):
+    for collect in (False, True):
+        ChessAI.collectSearchStats = collect
+        seconds, nodes, bestMoves = timeSearch(depth)
+        print(f"stats {'on ' if collect else 'off'}  {seconds:7.2f}s  {nodes:>9} nodes  {nodes / seconds:>7.0f} nps")
+    ChessAI.searchStatsFile = output
+    for fen in benchmarkPositions:
+        gs = ChessEngine.GameState()
+        gs.loadFEN(fen)
+        ChessAI.transpositionTable = None
+        stats = ChessAI.findBestMove(gs, gs.getValidMoves(), queue.Queue())
+        print(f"{str(stats.bestMove):8} depth {len(stats.depths)}  {stats.nodes:>7} nodes ({stats.leafNodes} leaves, {stats.quiescenceNodes} quiescence)  "
+              f"{stats.getNPS():>6.0f} nps  first move cutoffs {stats.getFirstMoveCutoffRate():4.0%}  branching {stats.getBranchingFactor():4.1f}  "
+              f"hash hits {stats.transpositionTable['hitRate'] if stats.transpositionTable else 0:4.0%}")
+    ChessAI.collectSearchStats = False
+    ChessAI.searchStatsFile = None
+
+# Depth reached in the time budget on every benchmark position with the selective search features off, each one alone and all on
+def benchmarkDepth(timeLimit):
+    ChessAI.maxSearchDepth = 32
+    ChessAI.searchTimeLimit = timeLimit
+    ChessAI.searchNodeLimit = None
+    ChessAI.collectSearchStats = True
+    for name, nullMove, reductions in (("plain", False, False), ("null move", True, False), ("reductions", False, True), ("both", True, True)):
+        ChessAI.useNullMove = nullMove
+        ChessAI.useLateMoveReductions = reductions
+        results = []
+        for fen in benchmarkPositions:
+            gs = ChessEngine.GameState()
+            gs.loadFEN(fen)
+            ChessAI.transpositionTable = None
+            stats = ChessAI.findBestMove(gs, gs.getValidMoves(), queue.Queue())
+            results.append(f"{len(stats.depths)} {str(stats.bestMove):6}")
+        print(f"{name:10} depth " + "  ".join(results))
+    ChessAI.collectSearchStats = False
+
+# Nodes to a fixed depth with full window alpha-beta, principal variation search and PVS with aspiration windows
+# The root moves are searched in the same order every run so the trees only differ by the windows
+def benchmarkWindows(depth):
+    for name, pvs, aspiration in (("alpha-beta", False, False), ("PVS", True, False), ("PVS + aspiration", True, True)):
+        ChessAI.usePrincipalVariationSearch = pvs
+        ChessAI.useAspirationWindows = aspiration
+        seconds, nodes, bestMoves = timeSearch(depth)
+        print(f"{name:16} {seconds:7.2f}s  {nodes:>9} nodes  " + " ".join(bestMoves))
+
+# Time from asking for a move to having it, with a new Process per move (the GameState is pickled every time) and with the persistent worker
+# The searches are cut to a few nodes so the time measured is the process and transfer overhead
+def benchmarkWorker(moveCount, nodeLimit):
+    ChessAI.searchNodeLimit = nodeLimit
+    ChessAI.searchTimeLimit = None
+    gs = ChessEngine.GameState() # Start position, where the worker starts too
+    validMoves = gs.getValidMoves()
+    spawnSeconds = 0.0
+    for i in range(moveCount):
+        start = time.perf_counter()
+        returnQueue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=ChessAI.findBestMove, args=(gs, validMoves, returnQueue))
+        process.start()
+        process.join()
+        while not returnQueue.empty():
+            returnQueue.get()
+        spawnSeconds += time.perf_counter() - start
+
+    results = queue.Queue()
+    worker = ChessWorker.SearchWorker(onResult=lambda searchID, moveID, final, pv, ponderMoveID: final and results.put(searchID))
+    workerSeconds = 0.0
+    for i in range(moveCount):
+        start = time.perf_counter()
+        searchID = worker.go(nodeLimit=nodeLimit)
+        while results.get() != searchID:
+            pass
+        workerSeconds += time.perf_counter() - start
+    worker.close()
+    print(f"Process per move  {spawnSeconds / moveCount * 1000:7.1f} ms/move")
+    print(f"Persistent worker {workerSeconds / moveCount * 1000:7.1f} ms/move  {spawnSeconds / workerSeconds:5.1f}x faster")
+
+# Time from the human's move to the AI's answer without pondering, on a ponder hit and on a ponder miss
+# The AI plays both sides from the start position, the "human" thinks for thinkTime and then plays the move the AI expected (hit) or another one (miss)
+def benchmarkPonder(moveCount, timeLimit, thinkTime):
+    results = queue.Queue()
+    worker = ChessWorker.SearchWorker(onResult=lambda searchID, moveID, final, pv, ponderMoveID: final and results.put((searchID, moveID, ponderMoveID)))
+
+    def waitFor(searchID):
+        while True:
+            result = results.get()
+            if result[0] == searchID:
+                return result
+
+    def playMove(gs, moveID):
+        for move in gs.getValidMoves():
+            if move.moveID == moveID:
+                gs.makeMove(move)
+                worker.makeMove(move)
+                return True
+        return False
+
+    for name in ("no pondering", "ponder hit", "ponder miss"):
+        worker.newGame()
+        gs = ChessEngine.GameState()
+        latencies = []
+        searchID, moveID, ponderMoveID = waitFor(worker.go(timeLimit))
+        while len(latencies) < moveCount and moveID and playMove(gs, moveID):
+            humanMoves = gs.getValidMoves()
+            if not humanMoves:
+                break
+            if name == "no pondering" or not ponderMoveID:
+                time.sleep(thinkTime)
+                humanMove = next((move for move in humanMoves if move.moveID == ponderMoveID), humanMoves[0])
+                start = time.perf_counter()
+                gs.makeMove(humanMove)
+                worker.makeMove(humanMove)
+                searchID = worker.go(timeLimit)
+            else:
+                worker.ponder(ponderMoveID)
+                time.sleep(thinkTime)
+                if name == "ponder hit":
+                    humanMove = next(move for move in humanMoves if move.moveID == ponderMoveID)
+                    start = time.perf_counter()
+                    gs.makeMove(humanMove)
+                    searchID = worker.ponderHit(timeLimit)
+                else:
+                    humanMove = next(move for move in humanMoves if move.moveID != ponderMoveID) if len(humanMoves) > 1 else humanMoves[0]
+                    start = time.perf_counter()
+                    gs.makeMove(humanMove)
+                    worker.ponderMiss()
+                    worker.makeMove(humanMove)
+                    searchID = worker.go(timeLimit)
+            searchID, moveID, ponderMoveID = waitFor(searchID)
+            latencies.append(time.perf_counter() - start)
+        print(f"{name:12} {sum(latencies) / max(len(latencies), 1) * 1000:7.0f} ms average  {max(latencies, default=0) * 1000:7.0f} ms worst  over {len(latencies)} moves")
+    worker.close()
+
+# The pygame drawing from before the cached renderer, every frame redraws all the squares, highlights, pieces and the move log and flips the display
+class LegacyRenderer():
+    def __init__(self, screen, font):
+        self.screen = screen
+        self.font = font
+
+    def drawGameState(self, gs, validMoves, squareSelected):
+        self.drawBoard()
+        self.highlightSquares(gs, validMoves, squareSelected)
+        self.drawPieces(gs.board)
+        self.drawMoveLog(gs)
+
+    def update(self):
+        pygame.display.flip()
+
+    def drawBoard(self):
+        self.colors = [pygame.Color("white"), pygame.Color("gray")]
+        for r in range(8):
+            for c in range(8):
+                color = self.colors[(r+c) % 2]
+                pygame.draw.rect(self.screen, color, pygame.Rect(c*ChessMain.squareSize, r*ChessMain.squareSize, ChessMain.squareSize, ChessMain.squareSize))
+
+    def highlightSquares(self, gs, validMoves, squareSelected):
+        squareSize = ChessMain.squareSize
+        if gs.moveLog:
+            lastMove = gs.moveLog[-1]
+            s = pygame.Surface((squareSize, squareSize))
+            s.set_alpha(200)
+            s.fill(pygame.Color("lightblue"))
+            self.screen.blit(s, pygame.Rect(lastMove.startCol * squareSize, lastMove.startRow * squareSize, squareSize, squareSize))
+            self.screen.blit(s, pygame.Rect(lastMove.endCol * squareSize, lastMove.endRow * squareSize, squareSize, squareSize))
+        if squareSelected != ():
+            r, c = squareSelected
+            if gs.board[r][c][0] == ('w' if gs.whiteToMove else 'b'):
+                s = pygame.Surface((squareSize, squareSize))
+                s.set_alpha(100)
+                s.fill(pygame.Color("blue"))
+                self.screen.blit(s, (c*squareSize, r*squareSize))
+                s.fill(pygame.Color("yellow"))
+                for move in validMoves:
+                    if move.startRow == r and move.startCol == c:
+                        self.screen.blit(s, (move.endCol*squareSize, move.endRow*squareSize))
+        if gs.inCheck:
+            s = pygame.Surface((squareSize, squareSize))
+            s.set_alpha(150)
+            s.fill(pygame.Color("red"))
+            kingLocation = gs.whiteKingLocation if gs.whiteToMove else gs.blackKingLocation
+            self.screen.blit(s, pygame.Rect(kingLocation[1] * squareSize, kingLocation[0] * squareSize, squareSize, squareSize))
+            for check in gs.checks:
+                self.screen.blit(s, pygame.Rect(check[1] * squareSize, check[0] * squareSize, squareSize, squareSize))
+
+    def drawPieces(self, board):
+        squareSize = ChessMain.squareSize
+        for r in range(8):
+            for c in range(8):
+                piece = board[r, c]
+                if piece != "--":
+                    self.screen.blit(ChessMain.images[piece], pygame.Rect(c*squareSize, r*squareSize, squareSize, squareSize))
+
+    def drawMoveLog(self, gs):
+        moveLogRect = pygame.Rect(ChessMain.boardWidth, 0, ChessMain.moveLogPanelWidth, ChessMain.moveLogPanelHeight)
+        pygame.draw.rect(self.screen, pygame.Color("Black"), moveLogRect)
+        moveLog = gs.moveLog
+        moveTexts = []
+        for i in range(0, len(moveLog), 2):
+            moveString = str(i//2 + 1) + ". " + str(moveLog[i]) + " "
+            if i + 1 < len(moveLog):
+                moveString += str(moveLog[i+1])
+            moveTexts.append(moveString)
+        textY = 5
+        for i in range(0, len(moveTexts), 3):
+            text = ""
+            for j in range(3):
+                if i + j < len(moveTexts):
+                    text += moveTexts[i+j] + "  "
+            textObject = self.font.render(text, True, pygame.Color("White"))
+            self.screen.blit(textObject, moveLogRect.move(5, textY))
+            textY += textObject.get_height() + 2
+
+    def animateMove(self, move, board, clock):
+        squareSize = ChessMain.squareSize
+        dR = move.endRow - move.startRow
+        dC = move.endCol - move.startCol
+        frameCount = (abs(dR) + abs(dC)) * 10
+        for frame in range(frameCount+1):
+            r, c = (move.startRow + dR*frame/frameCount, move.startCol + dC*frame/frameCount)
+            self.drawBoard()
+            self.drawPieces(board)
+            color = self.colors[(move.endRow + move.endCol) % 2]
+            endSquare = pygame.Rect(move.endCol*squareSize, move.endRow*squareSize, squareSize, squareSize)
+            pygame.draw.rect(self.screen, color, endSquare)
+            if move.pieceCaptured != '--':
+                if move.enPassant:
+                    enPassantRow = move.endRow + 1 if move.pieceCaptured == 'bP' else move.endRow - 1
+                    endSquare = pygame.Rect(move.endCol * squareSize, enPassantRow * squareSize, squareSize, squareSize)
+                self.screen.blit(ChessMain.images[move.pieceCaptured], endSquare)
+            self.screen.blit(ChessMain.images[move.pieceMoved], pygame.Rect(c*squareSize, r*squareSize, squareSize, squareSize))
+            pygame.display.flip()
+            clock.tick(120)
+
+# GUI CPU time per frame, legacy drawing against the cached renderer, on a position 40 random moves into a game
+# Idle frames only change the selected square every second (15 frames), move frames undo or redo the last move every frame,
+# animation is the CPU time of animating the last few moves (the time spent waiting on the clock is not CPU time)
+# Runs on SDL's dummy video driver unless SDL_VIDEODRIVER is set, a real display makes the full window flips cost more
+def benchmarkRender(frameCount):
+    global pygame, ChessMain
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+    import ChessMain
+    pygame.init()
+    screen = pygame.display.set_mode((ChessMain.boardWidth + ChessMain.moveLogPanelWidth, ChessMain.boardHeight))
+    ChessMain.loadImages()
+    font = pygame.font.SysFont("Arial", 14, False, False)
+    clock = pygame.time.Clock()
+    rng = random.Random(0)
+    gs = ChessEngine.GameState()
+    for ply in range(40):
+        gs.makeMove(rng.choice(gs.getValidMoves()))
+    validMoves = gs.getValidMoves()
+    selections = sorted({(move.startRow, move.startCol) for move in validMoves})
+    for renderer in (LegacyRenderer(screen, font), ChessMain.Renderer(screen, font)):
+        start = time.process_time()
+        for frame in range(frameCount):
+            second = frame // ChessMain.maxFps
+            renderer.drawGameState(gs, validMoves, selections[second % len(selections)] if second % 2 else ())
+            renderer.update()
+        idleSeconds = time.process_time() - start
+        start = time.process_time()
+        for frame in range(frameCount):
+            if frame % 2:
+                gs.makeMove(lastMove)
+            else:
+                lastMove = gs.moveLog[-1]
+                gs.undoMove()
+            renderer.drawGameState(gs, gs.getValidMoves(), ())
+            renderer.update()
+        moveSeconds = time.process_time() - start
+        start = time.process_time()
+        for move in gs.moveLog[-4:]:
+            renderer.animateMove(move, gs.board, clock)
+        animateSeconds = time.process_time() - start
+        print(f"{type(renderer).__name__:14} idle {idleSeconds / frameCount * 1000:6.2f} ms/frame  move {moveSeconds / frameCount * 1000:6.2f} ms/frame  "
+              f"animation {animateSeconds * 1000:6.1f} ms CPU for 4 moves")
+    pygame.quit()
+
+# Time for a new interpreter to import each module, best of repeat runs, which is the startup every worker process and command line tool pays
+# Importing ChessMain is what importing the engine cost when ChessEngine imported the GUI (and pygame) for promotions
+def benchmarkImports(repeat):
+    def startupSeconds(code):
+        seconds = float("inf")
+        for i in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)), check=True, stdout=subprocess.DEVNULL)
+            seconds = min(seconds, time.perf_counter() - start)
+        return seconds
+    interpreterSeconds = startupSeconds("pass")
+    print(f"{'interpreter':24} {interpreterSeconds * 1000:6.1f} ms")
+    for name, code in (("ChessEngine", "import ChessEngine"), ("ChessAI", "import ChessAI"), ("ChessWorker", "import ChessWorker"),
+                       ("ChessPerft", "import ChessPerft"), ("ChessMain (engine + GUI)", "import ChessMain")):
+        seconds = startupSeconds(code)
+        print(f"{name:24} {seconds * 1000:6.1f} ms  {(seconds - interpreterSeconds) * 1000:6.1f} ms importing")
+
+# Random games with getSAN, repeated with new round numbers until the file is megabytes long, replaying doesn't get cheaper for a repeat
+def writeBenchmarkPGN(path, megabytes, distinctGames=200, maxPlies=160, seed=0):
+    import ChessBitboard, ChessTournament
+    rng = random.Random(seed)
+    games = []
+    for i in range(distinctGames):
+        gs = ChessBitboard.GameState()
+        moves = []
+        validMoves = gs.getValidMoves()
+        while validMoves and len(moves) < maxPlies:
+            move = rng.choice(validMoves)
+            moves.append(gs.getSAN(move, validMoves))
+            gs.makeMove(move)
+            validMoves = gs.getValidMoves()
+        result = ("0-1" if gs.whiteToMove else "1-0") if gs.checkmate else "1/2-1/2" if gs.stalemate else "*"
+        games.append({"white": "random", "black": "random", "result": result, "termination": "benchmark", "moves": moves})
+    with open(path, "w") as file:
+        for index in itertools.count():
+            file.write(ChessTournament.formatPGN(dict(games[index % distinctGames], index=index), "PGN benchmark", "????.??.??"))
+            if file.tell() >= megabytes * 1e6:
+                break
+
+# Games per second replaying a PGN file on both backends and with more processes
+def benchmarkPGN(path, megabytes, workerCounts):
+    import ChessPGN
+    with tempfile.TemporaryDirectory() as directory:
+        if path is None:
+            path = os.path.join(directory, "benchmark.pgn")
+            writeBenchmarkPGN(path, megabytes)
+        size = os.path.getsize(path) / 1e6
+        for backend, workers in [("array", 1)] + [("bitboard", workers) for workers in workerCounts]:
+            start = time.perf_counter()
+            games, flagged, plies = ChessPGN.replayFile(path, open(os.devnull, "w"), workers, backend)
+            seconds = time.perf_counter() - start
+            print(f"{backend:8} {workers:2d} processes  {size:.1f} MB  {games} games  {flagged} flagged  {seconds:6.1f}s  "
+                  f"{games / seconds:7.1f} games/s  {plies / seconds:8.0f} plies/s  {size / seconds:.2f} MB/s")
+
+# Resident memory of this process in MB, from /proc so the pages of a memory-mapped file count as soon as they are read
+def getResidentMB():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+# Lookup time and memory of a big memory-mapped book, and the time of the first AI moves with and without the real book
+def benchmarkBook(entryCount, probeCount):
+    import ChessBook
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "benchmark.bin")
+        keys = [rng.getrandbits(64) for i in range(entryCount // 4)] # 4 moves per position
+        ChessBook.writeBook(path, {(key, rng.getrandbits(12)): rng.randint(1, 100) for key in keys for move in range(4)})
+        residentBefore = getResidentMB()
+        start = time.perf_counter()
+        book = ChessBook.OpeningBook(path)
+        openSeconds = time.perf_counter() - start
+        probes = [rng.choice(keys) for i in range(probeCount)]
+        start = time.perf_counter()
+        found = sum(len(book.getEntries(key)) > 0 for key in probes)
+        hitSeconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(probeCount):
+            book.getEntries(rng.getrandbits(64))
+        missSeconds = time.perf_counter() - start
+        print(f"{book.entryCount} entries  {os.path.getsize(path) / 1e6:.1f} MB file  open {openSeconds * 1000:.2f} ms  "
+              f"resident +{getResidentMB() - residentBefore:.1f} MB after {probeCount} probes")
+        print(f"lookup found {found}/{probeCount}  {hitSeconds / probeCount * 1e6:.1f} us  missing key {missSeconds / probeCount * 1e6:.1f} us")
+        book.close()
+    for useBook in (False, True):
+        ChessAI.useOpeningBook = useBook
+        gs = ChessEngine.GameState()
+        start = time.perf_counter()
+        for ply in range(6):
+            ChessAI.findBestMove(gs, gs.getValidMoves(), queue.Queue())
+            gs.makeMove(next(move for move in gs.getValidMoves() if move.moveID == ChessAI.nextMove.moveID))
+        print(f"{'book' if useBook else 'search':6} first 6 AI moves in {time.perf_counter() - start:6.2f}s  {' '.join(str(move) for move in gs.moveLog)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Engine and search benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    parallelParser = subparsers.add_parser("parallel", help="parallel root search speedup against worker count")
+    parallelParser.add_argument("--depth", type=int, default=4)
+    parallelParser.add_argument("--workers", default=None, help="comma separated worker counts, default 1, 2, 4... up to the core count")
+    movesParser = subparsers.add_parser("moves", help="Move memory and construction speed against the legacy class")
+    movesParser.add_argument("--count", type=int, default=200000)
+    workerParser = subparsers.add_parser("worker", help="per move process spawn against the persistent search worker")
+    workerParser.add_argument("--moves", type=int, default=20)
+    workerParser.add_argument("--nodes", type=int, default=200)
+    checksParser = subparsers.add_parser("checks", help="check, pin and attack detection per call against the legacy scans")
+    checksParser.add_argument("--positions", type=int, default=500)
+    statsParser = subparsers.add_parser("stats", help="search stats collection overhead and the stats of the benchmark positions")
+    statsParser.add_argument("--depth", type=int, default=4)
+    statsParser.add_argument("--output", default=None, help="append the stats to this file as JSON lines")
+    depthParser = subparsers.add_parser("depth", help="depth reached in a time budget with and without null move pruning and late move reductions")
+    depthParser.add_argument("--time", type=float, default=ChessAI.searchTimeLimit)
+    pvsParser = subparsers.add_parser("pvs", help="nodes with and without principal variation search and aspiration windows")
+    pvsParser.add_argument("--depth", type=int, default=5)
+    ponderParser = subparsers.add_parser("ponder", help="AI answer latency without pondering, on a ponder hit and on a ponder miss")
+    ponderParser.add_argument("--moves", type=int, default=6)
+    ponderParser.add_argument("--time", type=float, default=1.0, help="AI time per move")
+    ponderParser.add_argument("--think", type=float, default=1.0, help="human think time per move")
+    renderParser = subparsers.add_parser("render", help="GUI CPU time per frame, legacy drawing against the cached renderer")
+    renderParser.add_argument("--frames", type=int, default=300)
+    importsParser = subparsers.add_parser("imports", help="startup time of a new process importing the engine, AI and tools against the GUI")
+    importsParser.add_argument("--repeat", type=int, default=10)
+    pgnParser = subparsers.add_parser("pgn", help="PGN replay speed in games per second by backend and process count")
+    pgnParser.add_argument("--file", default=None, help="PGN file to replay, a file of random games is written if not given")
+    pgnParser.add_argument("--size", type=float, default=4.0, help="megabytes of random games to write")
+    pgnParser.add_argument("--workers", default=None, help="comma separated process counts, default 1 and the core count")
+    bookParser = subparsers.add_parser("book", help="opening book lookup time and memory, first moves with and without the book")
+    bookParser.add_argument("--entries", type=int, default=2000000)
+    bookParser.add_argument("--probes", type=int, default=20000)
+    args = parser.parse_args()
+    ChessAI.useOpeningBook = False # The benchmarks measure the search, a book move would skip it
+
+    if args.benchmark == "parallel":
+        if args.workers:
+            workerCounts = [int(workers) for workers in args.workers.split(",")]
+        else:
+            workerCounts = [1]
+            while workerCounts[-1] * 2 <= (os.cpu_count() or 1):
+                workerCounts.append(workerCounts[-1] * 2)
+        benchmarkParallel(args.depth, workerCounts)
+    elif args.benchmark == "moves":
+        benchmarkMoves(args.count)
+    elif args.benchmark == "worker":
+        benchmarkWorker(args.moves, args.nodes)
+    elif args.benchmark == "checks":
+        benchmarkChecks(args.positions)
+    elif args.benchmark == "stats":
+        benchmarkStats(args.depth, args.output)
+    elif args.benchmark == "depth":
+        benchmarkDepth(args.time)
+    elif args.benchmark == "pvs":
+        benchmarkWindows(args.depth)
+    elif args.benchmark == "ponder":
+        benchmarkPonder(args.moves, args.time, args.think)
+    elif args.benchmark == "render":
+        benchmarkRender(args.frames)
+    elif args.benchmark == "imports":
+        benchmarkImports(args.repeat)
+    elif args.benchmark == "pgn":
+        workerCounts = [int(workers) for workers in args.workers.split(",")] if args.workers else sorted({1, os.cpu_count() or 1})
+        benchmarkPGN(args.file, args.size, workerCounts)
+    elif args.benchmark == "book":
+        benchmarkBook(args.entries, args.probes)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Bitboard backend for the GameState.
+Keeps one 64-bit integer per piece so move generation, checks and pins use bit operations instead of walking the board square by square.
+The string board is still kept up to date so Move objects, the move log and the GUI work the same as with ChessEngine.GameState.
+Square index is row * 8 + col, so a8 = 0 and h1 = 63.
+"""
+
+import ChessEvaluation
+import ChessEngine
+
+# Same order as ChessEngine, first 4 are orthogonal and last 4 are diagonal
+directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+rookDirections = (0, 1, 2, 3)
+bishopDirections = (4, 5, 6, 7)
+allDirections = rookDirections + bishopDirections
+positiveDirections = (False, False, True, True, False, False, True, True) # Direction walks toward higher square indexes
+knightOffsets = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+fullBoard = (1 << 64) - 1
+
+squareRowCol = [(sq // 8, sq % 8) for sq in range(64)]
+
+def buildStepAttacks(offsets):
+    attacks = []
+    for sq in range(64):
+        r, c = squareRowCol[sq]
+        mask = 0
+        for dr, dc in offsets:
+            if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                mask |= 1 << ((r + dr) * 8 + c + dc)
+        attacks.append(mask)
+    return attacks
+
+knightAttacks = buildStepAttacks(knightOffsets)
+kingAttacks = buildStepAttacks(directions)
+pawnAttacks = {"w": buildStepAttacks(((-1, -1), (-1, 1))), "b": buildStepAttacks(((1, -1), (1, 1)))} # Squares a pawn of that color attacks
+
+# rays[d][sq] is every square from sq (not included) to the edge of the board in direction d
+rays = []
+for dr, dc in directions:
+    dirRays = []
+    for sq in range(64):
+        r, c = squareRowCol[sq]
+        mask = 0
+        for i in range(1, 8):
+            if not (0 <= r + dr * i < 8 and 0 <= c + dc * i < 8):
+                break
+            mask |= 1 << ((r + dr * i) * 8 + c + dc * i)
+        dirRays.append(mask)
+    rays.append(dirRays)
+
+# between[sq1][sq2] is the squares strictly between two squares on the same line, 0 if they are not on a line
+between = [[0] * 64 for _ in range(64)]
+for d in range(8):
+    for sq in range(64):
+        ray = rays[d][sq]
+        while ray:
+            bit = ray & -ray
+            target = bit.bit_length() - 1
+            between[sq][target] = rays[d][sq] & ~rays[d][target] & ~bit
+            ray ^= bit
+
+def firstBlocker(d, blockers):
+    if positiveDirections[d]:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+def slidingAttacks(sq, occupied, dirIndexes):
+    attacks = 0
+    for d in dirIndexes:
+        ray = rays[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            ray ^= rays[d][firstBlocker(d, blockers)] # Cut the ray behind the first piece hit
+        attacks |= ray
+    return attacks
+
+class GameState(ChessEngine.GameState):
+    def __init__(self, fen=None):
+        super().__init__()
+        self.board = [[str(square) for square in row] for row in self.board] # Plain lists are quicker to index than the numpy array
+        self.buildBitboards()
+        if fen is not None:
+            self.loadFEN(fen)
+
+    # Make a bitboard copy of any GameState so the search can run on it while the GUI keeps the original
+    @classmethod
+    def fromGameState(cls, gs):
+        bitboardState = cls()
+        for name, value in vars(gs).items():
+            if name != "moveFunctions": # Keep the methods bound to the new object
+                setattr(bitboardState, name, value.copy() if isinstance(value, list) else value)
+        bitboardState.board = [[str(square) for square in row] for row in gs.board]
+        bitboardState.buildBitboards()
+        return bitboardState
+
+    def loadFEN(self, fen):
+        super().loadFEN(fen)
+        self.buildBitboards()
+
+    def buildBitboards(self):
+        self.pieceBitboards = {color + piece: 0 for color in "wb" for piece in "PNBRQK"}
+        self.colorBitboards = {"w": 0, "b": 0}
+        self.pinMasks = {}
+        self.checkers = 0
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] != "--":
+                    self.toggleBit(self.board[r][c], r * 8 + c)
+
+    def toggleBit(self, piece, sq):
+        bit = 1 << sq
+        self.pieceBitboards[piece] ^= bit
+        self.colorBitboards[piece[0]] ^= bit
+
+    # XOR the move in or out of the bitboards, landedPiece is what stands on the end square after the move (promoted piece)
+    def toggleMoveBits(self, move, landedPiece):
+        self.toggleBit(move.pieceMoved, move.startRow * 8 + move.startCol)
+        self.toggleBit(landedPiece, move.endRow * 8 + move.endCol)
+        if move.enPassant:
+            self.toggleBit(move.pieceCaptured, move.startRow * 8 + move.endCol)
+        elif move.isCapture:
+            self.toggleBit(move.pieceCaptured, move.endRow * 8 + move.endCol)
+        if move.castleMove:
+            rook = move.pieceMoved[0] + "R"
+            if move.endCol == move.startCol + 2: # KingSide castle
+                self.toggleBit(rook, move.endRow * 8 + move.endCol + 1)
+                self.toggleBit(rook, move.endRow * 8 + move.endCol - 1)
+            else: # QueenSide castle
+                self.toggleBit(rook, move.endRow * 8 + move.endCol - 2)
+                self.toggleBit(rook, move.endRow * 8 + move.endCol + 1)
+
+    def makeMove(self, move):
+        super().makeMove(move)
+        self.toggleMoveBits(move, self.board[move.endRow][move.endCol])
+
+    def undoMove(self):
+        if len(self.moveLog) != 0:
+            move = self.moveLog[-1]
+            self.toggleMoveBits(move, self.board[move.endRow][move.endCol])
+            super().undoMove()
+
+    def hasNonPawnMaterial(self, color):
+        pieces = self.pieceBitboards
+        return (pieces[color + "N"] | pieces[color + "B"] | pieces[color + "R"] | pieces[color + "Q"]) != 0
+
+    # Bitboard of the pieces of color attacking sq
+    def attackersTo(self, sq, color, occupied):
+        pieces = self.pieceBitboards
+        queens = pieces[color + "Q"]
+        return ((knightAttacks[sq] & pieces[color + "N"]) |
+                (kingAttacks[sq] & pieces[color + "K"]) |
+                (pawnAttacks["b" if color == "w" else "w"][sq] & pieces[color + "P"]) | # A pawn attacks sq from where the other color's pawn on sq would attack
+                (slidingAttacks(sq, occupied, rookDirections) & (pieces[color + "R"] | queens)) |
+                (slidingAttacks(sq, occupied, bishopDirections) & (pieces[color + "B"] | queens)))
+
+    # Static exchange score of a move for the side to move, in ChessEvaluation.exchangeValues
+    # Both sides keep recapturing on the end square with their least valuable attacker and may stop whenever that is better for them
+    # Sliders behind a capturing piece join in as it leaves, pins are ignored
+    def staticExchange(self, move):
+        values = ChessEvaluation.exchangeValues
+        pieces = self.pieceBitboards
+        sq = move.endRow * 8 + move.endCol
+        occupied = (self.colorBitboards["w"] | self.colorBitboards["b"]) ^ (1 << (move.startRow * 8 + move.startCol))
+        gains = [values[move.pieceCaptured[1]] if move.isCapture else 0]
+        onSquare = move.pieceMoved[1]
+        if move.enPassant:
+            occupied ^= 1 << (move.startRow * 8 + move.endCol)
+        if move.pawnPromotion:
+            gains[0] += values[move.promotionPiece] - values["P"]
+            onSquare = move.promotionPiece
+        color = self.enemyColor
+        while True:
+            attackers = self.attackersTo(sq, color, occupied) & occupied
+            if not attackers:
+                break
+            for piece in "PNBRQK": # Least valuable attacker
+                attacker = attackers & pieces[color + piece]
+                if attacker:
+                    break
+            gains.append(values[onSquare] - gains[-1]) # Score for the side capturing now if the exchange stops after this capture
+            if max(-gains[-2], gains[-1]) < 0: # Neither side wants to go on
+                break
+            occupied ^= attacker & -attacker
+            onSquare = piece
+            color = "b" if color == "w" else "w"
+        while len(gains) > 1: # Back up the choices, every side either stops or takes the score of carrying on
+            gain = gains.pop()
+            gains[-1] = -max(-gains[-1], gain)
+        return gains[0]
+
+    #  Returns if square under attack
+    def squareUnderAttack(self, r, c):
+        occupied = self.colorBitboards["w"] | self.colorBitboards["b"]
+        return self.attackersTo(r * 8 + c, self.enemyColor, occupied) != 0
+
+    # Same results as ChessEngine, also stores the pin masks and checkers bitboard used by getValidMoves
+    def checkForPinsAndChecks(self):
+        pieces = self.pieceBitboards
+        ours = self.colorBitboards[self.allyColor]
+        occupied = ours | self.colorBitboards[self.enemyColor]
+        kingSq = pieces[self.allyColor + "K"].bit_length() - 1
+        kingRow, kingCol = squareRowCol[kingSq]
+        enemyQueens = pieces[self.enemyColor + "Q"]
+        pins = []
+        self.pinMasks = {}
+        for d in range(8):
+            blockers = rays[d][kingSq] & occupied
+            if not blockers:
+                continue
+            pinnedSq = firstBlocker(d, blockers)
+            if not (ours >> pinnedSq) & 1:
+                continue
+            blockers = rays[d][pinnedSq] & occupied
+            if not blockers:
+                continue
+            pinnerSq = firstBlocker(d, blockers)
+            sliders = enemyQueens | pieces[self.enemyColor + ("R" if d < 4 else "B")]
+            if (sliders >> pinnerSq) & 1:
+                self.pinMasks[pinnedSq] = rays[d][kingSq]
+                pins.append(squareRowCol[pinnedSq] + directions[d])
+
+        self.checkers = self.attackersTo(kingSq, self.enemyColor, occupied)
+        self.checks = []
+        checkers = self.checkers
+        while checkers:
+            bit = checkers & -checkers
+            checkers ^= bit
+            checkRow, checkCol = squareRowCol[bit.bit_length() - 1]
+            dRow, dCol = checkRow - kingRow, checkCol - kingCol
+            if dRow == 0 or dCol == 0 or abs(dRow) == abs(dCol): # On a line, store the direction like ChessEngine, knights keep their offset
+                step = max(abs(dRow), abs(dCol))
+                dRow, dCol = dRow // step, dCol // step
+            self.checks.append((checkRow, checkCol, dRow, dCol))
+        return self.checkers != 0, pins, self.checks
+
+    # Get all valid moves considering checks
+    def getValidMoves(self):
+        moves = []
+        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        self.getStageMoves(None, self.pinMasks, self.checkers, moves)
+        if len(moves) == 0:
+            if self.inCheck:
+                self.checkmate = True
+            else:
+                self.stalemate = True
+        else:
+            self.checkmate = False
+            self.stalemate = False
+        return moves
+
+    # Legal moves to one square, only the pieces (of one type if piece is given) that reach it are looked at
+    def getMovesTo(self, r, c, piece=None):
+        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        moves = []
+        fromMask = self.pieceBitboards[self.allyColor + piece] if piece is not None else fullBoard
+        self.getStageMoves(None, self.pinMasks, self.checkers, moves, fromMask, 1 << (r * 8 + c))
+        return moves
+
+    # Same order as ChessEngine.generateMoves but every stage is only generated when the search gets to it
+    # Sets inCheck straight away, checkmate and stalemate are left to the caller since the moves aren't all known yet
+    def generateMoves(self, hashMoveID=0, killerIDs=(), captureKey=None, quietKey=None, quiets=True):
+        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        self.checkmate = False
+        self.stalemate = False
+        return self.stagedMoves(self.pinMasks, self.checkers, hashMoveID, killerIDs, captureKey, quietKey, quiets or self.inCheck)
+
+    # The pins and checkers are passed in because searching the moves already yielded overwrites the ones on self
+    def stagedMoves(self, pinMasks, checkers, hashMoveID, killerIDs, captureKey, quietKey, quiets):
+        if hashMoveID:
+            hashMove = self.getStageMove(hashMoveID, pinMasks, checkers)
+            if hashMove is not None and (quiets or hashMove.isCapture or hashMove.pawnPromotion):
+                yield hashMove
+        moves = []
+        self.getStageMoves(True, pinMasks, checkers, moves)
+        if captureKey is not None:
+            moves.sort(key=captureKey, reverse=True)
+        for move in moves:
+            if move.moveID != hashMoveID:
+                yield move
+        if not quiets:
+            return
+        for killerID in killerIDs:
+            if killerID and killerID != hashMoveID:
+                killer = self.getStageMove(killerID, pinMasks, checkers)
+                if killer is not None and not killer.isCapture and not killer.pawnPromotion: # Captures were already searched
+                    yield killer
+        moves = []
+        self.getStageMoves(False, pinMasks, checkers, moves)
+        if quietKey is not None:
+            moves.sort(key=quietKey, reverse=True)
+        for move in moves:
+            if move.moveID != hashMoveID and move.moveID not in killerIDs:
+                yield move
+
+    # The legal move with moveID if there is one, generated only from its start square to its end square
+    def getStageMove(self, moveID, pinMasks, checkers):
+        moves = []
+        self.getStageMoves(None, pinMasks, checkers, moves, 1 << ((moveID >> 6) & 63), 1 << (moveID & 63))
+        for move in moves: # Several if it is a promotion
+            if move.moveID == moveID:
+                return move
+        return None
+
+    # Legal moves from fromMask to toMask, stage True is captures and promotions, False the other moves and None both
+    # Checks are answered with targets that capture or block the checking piece, so no evasion has to be filtered out afterwards
+    def getStageMoves(self, stage, pinMasks, checkers, moves, fromMask=fullBoard, toMask=fullBoard):
+        pieces = self.pieceBitboards
+        us = self.allyColor
+        them = self.enemyColor
+        ours = self.colorBitboards[us]
+        theirs = self.colorBitboards[them]
+        occupied = ours | theirs
+        kingSq = pieces[us + "K"].bit_length() - 1
+        stageMask = theirs if stage else (fullBoard & ~occupied if stage is False else fullBoard & ~ours)
+
+        if checkers.bit_count() < 2: # Double check only allows king moves
+            targetMask = toMask & ~ours
+            if checkers: # 1 Check, capture the checking piece or block
+                targetMask &= checkers | between[kingSq][checkers.bit_length() - 1]
+            if pieces[us + "P"] & fromMask:
+                self.getPawnBitboardMoves(kingSq, targetMask, occupied, moves, stage, pinMasks, fromMask, toMask)
+            for piece, dirIndexes in (("N", None), ("B", bishopDirections), ("R", rookDirections), ("Q", allDirections)):
+                bitboard = pieces[us + piece] & fromMask
+                while bitboard:
+                    bit = bitboard & -bitboard
+                    bitboard ^= bit
+                    sq = bit.bit_length() - 1
+                    if dirIndexes is None:
+                        if sq in pinMasks: # Pinned knight can never move
+                            continue
+                        targets = knightAttacks[sq]
+                    else:
+                        targets = slidingAttacks(sq, occupied, dirIndexes)
+                    self.addMoves(sq, targets & targetMask & stageMask & pinMasks.get(sq, fullBoard), moves)
+            if not checkers and stage is not True and (fromMask >> kingSq) & 1:
+                self.getCastleBitboardMoves(kingSq, occupied, moves, toMask)
+
+        # King moves, look at attacks with the king removed so it can't hide behind itself
+        if (fromMask >> kingSq) & 1:
+            targets = kingAttacks[kingSq] & stageMask & toMask
+            withoutKing = occupied ^ (1 << kingSq)
+            while targets:
+                bit = targets & -targets
+                targets ^= bit
+                if not self.attackersTo(bit.bit_length() - 1, them, withoutKing):
+                    moves.append(ChessEngine.Move(squareRowCol[kingSq], squareRowCol[bit.bit_length() - 1], self.board))
+
+    def addMoves(self, sq, targets, moves):
+        start = squareRowCol[sq]
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            moves.append(ChessEngine.Move(start, squareRowCol[bit.bit_length() - 1], self.board))
+
+    # Pushes onto the last rank count as captures for the stages (stage True), the other pushes as quiet moves (stage False)
+    def getPawnBitboardMoves(self, kingSq, targetMask, occupied, moves, stage, pinMasks, fromMask, toMask):
+        us = self.allyColor
+        theirs = self.colorBitboards[self.enemyColor]
+        step, startRow, lastRank = (-8, 6, 0) if self.whiteToMove else (8, 1, 7)
+        epSq = self.enPassantPossible[0] * 8 + self.enPassantPossible[1] if self.enPassantPossible else -1
+        pawns = self.pieceBitboards[us + "P"] & fromMask
+        while pawns:
+            bit = pawns & -pawns
+            pawns ^= bit
+            sq = bit.bit_length() - 1
+            allowed = targetMask & pinMasks.get(sq, fullBoard)
+            start = squareRowCol[sq]
+            forward = sq + step
+            if not (occupied >> forward) & 1 and (stage is None or stage == (forward // 8 == lastRank)): # Move 1 square up
+                if (allowed >> forward) & 1:
+                    self.addPawnMoves(start, squareRowCol[forward], moves)
+                if start[0] == startRow and not (occupied >> (forward + step)) & 1 and (allowed >> (forward + step)) & 1: # Move 2 square up
+                    moves.append(ChessEngine.Move(start, squareRowCol[forward + step], self.board))
+            if stage is False:
+                continue
+            captures = pawnAttacks[us][sq] & theirs & allowed
+            while captures:
+                capture = captures & -captures
+                captures ^= capture
+                self.addPawnMoves(start, squareRowCol[capture.bit_length() - 1], moves)
+            if epSq != -1 and (pawnAttacks[us][sq] >> epSq) & 1 and (toMask >> epSq) & 1:
+                # Play the capture on the occupancy and make sure nothing attacks the king afterwards, this covers pins, checks and the rank discovery
+                capturedBit = 1 << (start[0] * 8 + self.enPassantPossible[1])
+                afterCapture = (occupied ^ bit ^ capturedBit) | (1 << epSq)
+                if not (self.attackersTo(kingSq, self.enemyColor, afterCapture) & ~capturedBit):
+                    moves.append(ChessEngine.Move(start, squareRowCol[epSq], self.board, enPassant=True))
+
+    def getCastleBitboardMoves(self, kingSq, occupied, moves, toMask=fullBoard):
+        r, c = squareRowCol[kingSq]
+        kingSide = self.castlingwKs if self.whiteToMove else self.castlingbKs
+        queenSide = self.castlingwQs if self.whiteToMove else self.castlingbQs
+        if kingSide and (toMask >> (kingSq + 2)) & 1 and not (occupied >> (kingSq + 1)) & 1 and not (occupied >> (kingSq + 2)) & 1:
+            if not self.attackersTo(kingSq + 1, self.enemyColor, occupied) and not self.attackersTo(kingSq + 2, self.enemyColor, occupied):
+                moves.append(ChessEngine.Move((r, c), (r, c + 2), self.board, castleMove=True))
+        if queenSide and (toMask >> (kingSq - 2)) & 1 and not occupied & ((1 << (kingSq - 1)) | (1 << (kingSq - 2)) | (1 << (kingSq - 3))):
+            if not self.attackersTo(kingSq - 1, self.enemyColor, occupied) and not self.attackersTo(kingSq - 2, self.enemyColor, occupied):
+                moves.append(ChessEngine.Move((r, c), (r, c - 2), self.board, castleMove=True))
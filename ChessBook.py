@@ -0,0 +1,147 @@
+"""
+Opening book, a sorted binary file of (position key, moveID, weight) entries that is memory-mapped and binary searched,
+so a lookup reads a few pages of the file instead of loading the book into memory. ChessAI.findBestMove plays a book move
+chosen at random in proportion to its weight before it searches.
+Keys are GameState.zobristKey, so a book only works with the Zobrist keys it was built with (they come from a fixed seed).
+Run: python ChessBook.py build SOURCE [SOURCE...] [--out FILE] [--plies N] [--min-weight N]
+     python ChessBook.py probe [--book FILE] [--fen FEN]
+
+A source is a PGN file (.pgn), moves by the winner count 2, draws 1 and by the loser 0, or a text file with a line of
+SAN moves per opening (move numbers allowed), every move counts 1.
+"""
+
+import argparse
+import mmap
+import os
+import random
+import struct
+import ChessEngine
+import ChessPGN
+
+bookMagic = b"CHSBOOK1"
+entryStruct = struct.Struct(">QHH") # Key, moveID, weight, big-endian so the file doesn't depend on the machine
+keyStruct = struct.Struct(">Q")
+defaultBookPlies = 24 # Moves deeper into a game than this don't go into the book
+maxWeight = 65535
+defaultBookFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), "openingbook.bin")
+
+class OpeningBook():
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            if self.file.read(len(bookMagic)) != bookMagic:
+                raise ValueError(path + " is not an opening book")
+            size = os.fstat(self.file.fileno()).st_size
+            self.entryCount = (size - len(bookMagic)) // entryStruct.size
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size > len(bookMagic) else b""
+        except Exception:
+            self.file.close()
+            raise
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def getKey(self, index):
+        return keyStruct.unpack_from(self.data, len(bookMagic) + index * entryStruct.size)[0]
+
+    # [(moveID, weight)...] of the position key, heaviest first, O(log n) entries read to find the first
+    def getEntries(self, key):
+        low, high = 0, self.entryCount
+        while low < high: # First entry with a key not below key
+            middle = (low + high) // 2
+            if self.getKey(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.entryCount:
+            entryKey, moveID, weight = entryStruct.unpack_from(self.data, len(bookMagic) + low * entryStruct.size)
+            if entryKey != key:
+                break
+            entries.append((moveID, weight))
+            low += 1
+        return entries
+
+    # A valid move of the book for the position, picked at random in proportion to the weights, None if the book has none
+    # Entries whose move isn't valid (a key collision or a book built with other keys) are left out
+    def pickMove(self, gs, validMoves, rng=random):
+        movesByID = {move.moveID: move for move in validMoves}
+        entries = [(movesByID[moveID], weight) for moveID, weight in self.getEntries(gs.zobristKey) if moveID in movesByID and weight > 0]
+        if not entries:
+            return None
+        return rng.choices([move for move, weight in entries], weights=[weight for move, weight in entries])[0]
+
+# Writes the weights, {(key, moveID): weight}, as a book, scaled down if the heaviest doesn't fit in 16 bits
+def writeBook(path, weights, minWeight=1):
+    scale = max(weights.values(), default=0) / maxWeight
+    entries = []
+    for (key, moveID), weight in weights.items():
+        if weight >= minWeight:
+            entries.append((key, moveID, max(int(weight / scale), 1) if scale > 1 else weight))
+    entries.sort(key=lambda entry: (entry[0], -entry[2], entry[1]))
+    with open(path, "wb") as file:
+        file.write(bookMagic)
+        for entry in entries:
+            file.write(entryStruct.pack(*entry))
+    return len(entries)
+
+# Adds the moves of one game, SAN strings from the start position, to the weights, stops at the first move that isn't valid
+def addGame(weights, sans, result, plies):
+    gs = ChessPGN.newGameState("bitboard") # Same keys as the array backend, quicker to find the moves
+    for san in sans[:plies]:
+        move = gs.getMoveFromSAN(san)
+        if move is None:
+            break
+        # Polyglot style: the winner's moves count 2, a draw or an unknown result 1, the loser's 0
+        winner = {"1-0": "w", "0-1": "b"}.get(result)
+        weight = 1 if winner is None else 2 if winner == move.pieceMoved[0] else 0
+        weights[(gs.zobristKey, move.moveID)] = weights.get((gs.zobristKey, move.moveID), 0) + weight
+        gs.makeMove(move)
+
+def buildBook(sources, path, plies=defaultBookPlies, minWeight=1):
+    weights = {}
+    for source in sources:
+        with open(source, encoding="utf-8", errors="replace") as file:
+            if source.lower().endswith(".pgn"):
+                for number, tags, movetext in ChessPGN.readGames(file):
+                    if "FEN" not in tags:
+                        moves, resultToken = ChessPGN.getMoveTokens(movetext)
+                        addGame(weights, moves, tags.get("Result", resultToken), plies)
+            else:
+                for line in file:
+                    if line.strip() and not line.startswith("#"):
+                        addGame(weights, ChessPGN.getMoveTokens(line)[0], None, plies)
+    return writeBook(path, weights, minWeight)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or look up the opening book")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    buildParser = subparsers.add_parser("build", help="build a book from PGN files and text files of SAN lines")
+    buildParser.add_argument("sources", nargs="+")
+    buildParser.add_argument("--out", default=defaultBookFile)
+    buildParser.add_argument("--plies", type=int, default=defaultBookPlies, help="plies of every game that go into the book")
+    buildParser.add_argument("--min-weight", type=int, default=1, help="leave out moves that weigh less")
+    probeParser = subparsers.add_parser("probe", help="list the book moves of a position")
+    probeParser.add_argument("--book", default=defaultBookFile)
+    probeParser.add_argument("--fen", default=None, help="position, the start position if not given")
+    args = parser.parse_args()
+    if args.command == "build":
+        entryCount = buildBook(args.sources, args.out, args.plies, args.min_weight)
+        print(f"{entryCount} entries written to {args.out}")
+        return
+    book = OpeningBook(args.book)
+    gs = ChessEngine.GameState(args.fen)
+    movesByID = {move.moveID: move for move in gs.getValidMoves()}
+    entries = book.getEntries(gs.zobristKey)
+    total = sum(weight for moveID, weight in entries) or 1
+    for moveID, weight in entries:
+        move = movesByID.get(moveID)
+        print(f"{gs.getSAN(move) if move is not None else 'invalid ' + str(moveID):8} {weight:6d}  {weight / total * 100:5.1f}%")
+    if not entries:
+        print("No book moves")
+    book.close()
+
+if __name__ == "__main__":
+    main()
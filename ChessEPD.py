@@ -0,0 +1,184 @@
+"""
+EPD batch analysis: reads positions lazily from an EPD (or FEN per line) file, searches them with ChessAI in a process pool
+under a per position budget and writes one JSON line per position as soon as it is done, in the order of the file.
+Only a bounded number of positions is read ahead of the results written, so memory stays the same however long the file is.
+Run: python ChessEPD.py positions.epd [--out results.jsonl] [--time SECONDS] [--nodes N] [--depth N] [--workers N]
+
+EPD lines are the first 4 FEN fields and operations, e.g. r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - bm Bb5; id "test.001";
+The hmvc and fmvn operations give the move clocks, a line with the 6 FEN fields is read as a FEN.
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import signal
+import sys
+import time
+import ChessAI
+import ChessEngine
+
+analysisProcesses = os.cpu_count() or 1
+positionTimeLimit = 1.0 # Seconds of search per position
+inFlightPerProcess = 4 # Positions handed to the pool per process before the oldest result is waited for
+
+# Splits an EPD line into a FEN (with the clocks when the line has them) and its operations, opcode -> operand text
+# String operands keep their quotes so formatEPD writes them back the same, getOperandString takes them off
+def parseEPD(line):
+    fields = line.split(None, 4)
+    if len(fields) < 4:
+        raise ValueError("EPD needs at least 4 fields: " + line.strip())
+    fen = " ".join(fields[:4])
+    rest = fields[4].strip() if len(fields) > 4 else ""
+    clocks = rest.split()
+    if len(clocks) == 2 and clocks[0].isdigit() and clocks[1].isdigit(): # A FEN, the last 2 fields are the clocks
+        return fen + " " + rest, {}
+    operations = {}
+    for operation in splitOperations(rest):
+        tokens = operation.split(None, 1)
+        operations[tokens[0]] = tokens[1].strip() if len(tokens) > 1 else ""
+    if "hmvc" in operations or "fmvn" in operations:
+        fen += " " + operations.get("hmvc", "0") + " " + operations.get("fmvn", "1")
+    return fen, operations
+
+# Operations are separated by ; outside of quoted strings
+def splitOperations(text):
+    operations = []
+    start = 0
+    quoted = False
+    for i, char in enumerate(text):
+        if char == '"':
+            quoted = not quoted
+        elif char == ";" and not quoted:
+            if text[start:i].strip():
+                operations.append(text[start:i].strip())
+            start = i + 1
+    if text[start:].strip():
+        operations.append(text[start:].strip())
+    return operations
+
+def getOperandString(operand):
+    return operand[1:-1] if len(operand) >= 2 and operand[0] == operand[-1] == '"' else operand
+
+# EPD line of the position with the operations after it, the move clocks go in as hmvc and fmvn
+def formatEPD(gs, operations=None):
+    fields = gs.getFEN().split()
+    operations = dict(operations or {})
+    operations["hmvc"] = fields[4]
+    operations["fmvn"] = fields[5]
+    return " ".join(fields[:4] + [f"{opcode} {operand};" if operand else f"{opcode};" for opcode, operand in operations.items()])
+
+# (lineNumber, line) for every line with a position, blank lines and # comments are skipped, reads one line at a time
+def readPositions(path):
+    with open(path) as file:
+        for lineNumber, line in enumerate(file, 1):
+            if line.strip() and not line.lstrip().startswith("#"):
+                yield lineNumber, line
+
+# Stands in for the returnQueue findBestMove puts every finished depth's move on, counts the depths
+class DepthCounter():
+    def __init__(self):
+        self.depth = 0
+
+    def put(self, move):
+        if move is not None:
+            self.depth += 1
+
+# Searches the position on one line, returns its result as a dict for the JSON line, a line that can't be read gives an error instead
+def analyseLine(lineNumber, line, timeLimit, nodeLimit):
+    result = {"line": lineNumber}
+    try:
+        fen, operations = parseEPD(line)
+        gs = ChessEngine.GameState(fen)
+    except (ValueError, KeyError, IndexError) as error:
+        result["error"] = str(error)
+        return result
+    if "id" in operations:
+        result["id"] = getOperandString(operations["id"])
+    result["fen"] = gs.getFEN()
+    if operations:
+        result["operations"] = operations
+    try:
+        searchLine(gs, result, timeLimit, nodeLimit)
+    except Exception as error: # One position the search fails on is reported on its line instead of ending the whole batch
+        result["error"] = "search failed: " + repr(error)
+    return result
+
+# Searches the position and adds the move, score, depth, nodes, time and line to result
+def searchLine(gs, result, timeLimit, nodeLimit):
+    validMoves = gs.getValidMoves()
+    if not validMoves:
+        result["status"] = "checkmate" if gs.checkmate else "stalemate"
+        return
+    start = time.perf_counter()
+    depths = DepthCounter()
+    ChessAI.findBestMove(gs, validMoves, depths, timeLimit, nodeLimit)
+    move = ChessAI.nextMove if ChessAI.nextMove is not None else ChessAI.findRandomMove(validMoves) # Budget ran out inside depth 1
+    result["bestMove"] = move.getUCINotation()
+    if depths.depth:
+        result["score"] = ChessAI.searchScore if gs.whiteToMove else -ChessAI.searchScore # White's point of view
+    result["depth"] = depths.depth
+    result["nodes"] = ChessAI.searchNodes
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    result["pv"] = [move.getUCINotation() for move in ChessAI.principalVariation]
+
+# Pool process setup, the settings come from the parent since the pool may not share its globals (spawn start method)
+def initAnalysisProcess(settings):
+    vars(ChessAI).update(settings)
+    ChessAI.searchWorkers = 1 # The pool already uses every core
+    if ChessAI.searchBackend == "bitboard":
+        import ChessBitboard # Build the bitboard tables now instead of on the budget of the first position
+
+# Yields the results of positions ((lineNumber, line) pairs) in their order
+# With more than one process at most processes * inFlightPerProcess positions are submitted and not yet yielded
+def analysePositions(positions, processes=analysisProcesses, timeLimit=positionTimeLimit, nodeLimit=None):
+    if processes <= 1:
+        initAnalysisProcess(ChessAI.getSearchSettings())
+        for lineNumber, line in positions:
+            yield analyseLine(lineNumber, line, timeLimit, nodeLimit)
+        return
+    pool = concurrent.futures.ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"),
+                                                  initializer=initAnalysisProcess, initargs=(ChessAI.getSearchSettings(),))
+    try:
+        pending = collections.deque()
+        for lineNumber, line in positions:
+            pending.append(pool.submit(analyseLine, lineNumber, line, timeLimit, nodeLimit))
+            if len(pending) >= processes * inFlightPerProcess:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True) # Stopped early (closed, interrupted) the positions not started yet are dropped
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse every position of an EPD file")
+    parser.add_argument("path", help="EPD or FEN file, one position per line")
+    parser.add_argument("--out", default=None, help="JSON lines file for the results, standard output if not given")
+    parser.add_argument("--time", type=float, default=positionTimeLimit, help="seconds per position")
+    parser.add_argument("--nodes", type=int, default=None, help="nodes per position")
+    parser.add_argument("--depth", type=int, default=None, help="deepest iteration per position")
+    parser.add_argument("--workers", type=int, default=analysisProcesses, help="analysis processes")
+    args = parser.parse_args()
+    ChessAI.useOpeningBook = False # Every position is searched for its score, a book move has none
+    if args.depth is not None:
+        ChessAI.maxSearchDepth = args.depth
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1)) # Unwind so the pool is shut down instead of left running
+    timeLimit = args.time if args.time > 0 else float("inf") # 0 for only the depth or the nodes
+    out = open(args.out, "w") if args.out is not None else sys.stdout
+    start = time.perf_counter()
+    count = 0
+    try:
+        for result in analysePositions(readPositions(args.path), args.workers, timeLimit, args.nodes):
+            out.write(json.dumps(result) + "\n")
+            out.flush() # Every result is in the file as soon as it is known
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - start
+    print(f"{count} positions in {seconds:.1f}s  {count / seconds if seconds > 0 else 0:.1f} positions/s", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
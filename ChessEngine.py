@@ -4,11 +4,47 @@ Responsible for determining the valid moves  at the current state of the chess g
 Keep a move log.
 """
 
+import random
 import numpy as np
-import ChessMain as cm
+import ChessEvaluation
+
+# Zobrist keys, a random 64-bit number for every piece on every square, each castling rights combination, each enPassant file and the side to move
+# XORing together the keys that apply gives the position key, fixed seed so keys are the same in every process
+zobristRandom = random.Random(20240601)
+zobristPieces = {color + piece: [[zobristRandom.getrandbits(64) for c in range(8)] for r in range(8)] for color in "wb" for piece in "PNBRQK"}
+zobristCastling = [zobristRandom.getrandbits(64) for i in range(16)]
+zobristEnPassant = [zobristRandom.getrandbits(64) for c in range(8)]
+zobristBlackToMove = zobristRandom.getrandbits(64)
+
+# Tables built once for every square so attack, check and pin detection don't walk offsets with bounds checks, square index is row * 8 + col
+# First 4 directions are orthogonal and last 4 are diagonal
+directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
+knightOffsets = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+# (row, col, rowDir, colDir) of every square a knight or king on the square reaches
+knightTargets = [[(sq // 8 + dr, sq % 8 + dc, dr, dc) for dr, dc in knightOffsets if 0 <= sq // 8 + dr < 8 and 0 <= sq % 8 + dc < 8] for sq in range(64)]
+kingTargets = [[(sq // 8 + dr, sq % 8 + dc, dr, dc) for dr, dc in directions if 0 <= sq // 8 + dr < 8 and 0 <= sq % 8 + dc < 8] for sq in range(64)]
+allSquares = [(r, c) for r in range(8) for c in range(8)] # Board order, the order getAllPossibleMoves visits the squares in
+# rayLists[sq][j] is the (row, col) squares from sq to the edge of the board in direction j, nearest first
+rayLists = [[tuple((sq // 8 + dr * i, sq % 8 + dc * i) for i in range(1, 8) if 0 <= sq // 8 + dr * i < 8 and 0 <= sq % 8 + dc * i < 8)
+             for dr, dc in directions] for sq in range(64)]
+# betweenSquares[sq1][sq2] is the squares after sq1 up to and including sq2 if they share a rank, file or diagonal, otherwise just sq2
+# From the king to a checking piece these are the squares a move can go to to block or capture
+betweenSquares = [[frozenset([(sq2 // 8, sq2 % 8)]) for sq2 in range(64)] for sq1 in range(64)]
+for sq1 in range(64):
+    for ray in rayLists[sq1]:
+        for i, (r, c) in enumerate(ray):
+            betweenSquares[sq1][r * 8 + c] = frozenset(ray[:i + 1])
+# Pieces of a color that attack along direction j from further than 1 square, and from 1 square where the king and pawns join in
+# Pawns attack toward the other side, so a white pawn reaches a square from the directions (1, -1) and (1, 1) counted from that square
+rayAttackers = {color: [frozenset([color + "R", color + "Q"])] * 4 + [frozenset([color + "B", color + "Q"])] * 4 for color in "wb"}
+adjacentAttackers = {color: [rayAttackers[color][j] | {color + "K"} | ({color + "P"} if j in ((6, 7) if color == "w" else (4, 5)) else set())
+                             for j in range(8)] for color in "wb"}
+promotionPieces = ("Q", "N", "R", "B") # Every pawn move onto the last rank is generated once per piece, queen first
+promotionIDs = {"Q": 0, "N": 1, "R": 2, "B": 3} # Bits 12-13 of the moveID
 
 class GameState():
-    def __init__(self):
+    # fen sets up that position instead of the starting one
+    def __init__(self, fen=None):
         # 8x8 2D List
         # First Char: b = Black, w = White
         # Second Char: type of piece
@@ -45,12 +81,166 @@ class GameState():
         self.castlingbKs = True
         self.castlingbQs = True
         self.castleRightsLog = [CastleRights(self.castlingwKs, self.castlingbKs, self.castlingwQs, self.castlingbQs)]
-        # Can try saving positions
+        # Position key, updated on every move so positions can be saved and looked up
+        self.zobristKey = self.computeZobristKey()
+        self.zobristLog = [] # Keys before each move to undo
+        # Running material and position score in tenths of a pawn, see ChessEvaluation.pieceSquareTenths
+        self.boardScore = self.computeBoardScore()
+        self.boardScoreLog = []
+        # Move clocks as in FEN: plies since the last capture or pawn move, and the move number that goes up after black moves
+        self.halfmoveClock = 0
+        self.fullmoveNumber = 1
+        self.halfmoveClockLog = []
+        if fen is not None:
+            self.loadFEN(fen)
+
+    # Set up the position from a FEN string: board, side to move, castling rights, enPassant square and move clocks
+    # The clocks may be left out like in EPD, they then start at 0 and 1
+    def loadFEN(self, fen):
+        fields = fen.split()
+        ranks = fields[0].split("/") if fields else []
+        if len(ranks) != 8:
+            raise ValueError("FEN needs 8 ranks: " + fen)
+        for r in range(8):
+            row = []
+            for char in ranks[r]:
+                if char.isdigit():
+                    row += ["--"] * int(char)
+                elif char.upper() in self.moveFunctions:
+                    row.append(("w" if char.isupper() else "b") + char.upper())
+                else:
+                    raise ValueError("Unknown piece " + char + " in FEN: " + fen)
+            if len(row) != 8:
+                raise ValueError("FEN rank " + ranks[r] + " is not 8 squares: " + fen)
+            for c in range(8):
+                self.board[r][c] = row[c]
+                if row[c] == "wK":
+                    self.whiteKingLocation = (r, c)
+                elif row[c] == "bK":
+                    self.blackKingLocation = (r, c)
+
+        self.whiteToMove = len(fields) < 2 or fields[1] == "w"
+        self.enemyColor = "b" if self.whiteToMove else "w"
+        self.allyColor = "w" if self.whiteToMove else "b"
+        castling = fields[2] if len(fields) > 2 else "-"
+        self.castlingwKs = "K" in castling
+        self.castlingwQs = "Q" in castling
+        self.castlingbKs = "k" in castling
+        self.castlingbQs = "q" in castling
+
+        # Like makeMove only keep the enPassant square if a pawn is next to the pawn that moved
+        self.enPassantPossible = ()
+        if len(fields) > 3 and fields[3] != "-":
+            epRow, epCol = Move.ranksToRows[fields[3][1]], Move.filesToCols[fields[3][0]]
+            pawnRow = epRow + 1 if self.whiteToMove else epRow - 1
+            if ((epCol > 0 and self.board[pawnRow][epCol - 1] == self.allyColor + "P") or
+                    (epCol < 7 and self.board[pawnRow][epCol + 1] == self.allyColor + "P")):
+                self.enPassantPossible = (epRow, epCol)
+        try:
+            self.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+            self.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+        except ValueError:
+            raise ValueError("FEN move clocks must be numbers: " + fen) from None
+
+        self.moveLog = []
+        self.enPassantLog = [self.enPassantPossible]
+        self.castleRightsLog = [CastleRights(self.castlingwKs, self.castlingbKs, self.castlingwQs, self.castlingbQs)]
+        self.inCheck = False
+        self.pins = []
+        self.checks = []
+        self.checkmate = False
+        self.stalemate = False
+        self.zobristKey = self.computeZobristKey()
+        self.zobristLog = []
+        self.boardScore = self.computeBoardScore()
+        self.boardScoreLog = []
+        self.halfmoveClockLog = []
+
+    # FEN string of the position, the enPassant square is only written when a capture there is possible (like loadFEN keeps it)
+    def getFEN(self):
+        ranks = []
+        for row in self.board:
+            rank = ""
+            empty = 0
+            for square in row:
+                if square == "--":
+                    empty += 1
+                    continue
+                if empty:
+                    rank += str(empty)
+                    empty = 0
+                rank += square[1] if square[0] == "w" else square[1].lower()
+            ranks.append(rank + (str(empty) if empty else ""))
+        castling = (("K" if self.castlingwKs else "") + ("Q" if self.castlingwQs else "") +
+                    ("k" if self.castlingbKs else "") + ("q" if self.castlingbQs else "")) or "-"
+        enPassant = Move.colsToFiles[self.enPassantPossible[1]] + Move.rowsToRanks[self.enPassantPossible[0]] if self.enPassantPossible else "-"
+        return " ".join(("/".join(ranks), "w" if self.whiteToMove else "b", castling, enPassant, str(self.halfmoveClock), str(self.fullmoveNumber)))
+
+    # Standard algebraic notation of a valid move in this position (Nbd2, exd5, e8=Q+, O-O#)
+    # str(move) plus the file and/or rank when another piece of the same type can go to the same square, and + or # after it
+    def getSAN(self, move, validMoves=None):
+        validMoves = self.getValidMoves() if validMoves is None else validMoves
+        san = str(move)
+        if move.pieceMoved[1] not in "PK":
+            others = [other for other in validMoves if other.pieceMoved == move.pieceMoved and other.endRow == move.endRow and
+                      other.endCol == move.endCol and (other.startRow, other.startCol) != (move.startRow, move.startCol)]
+            if others:
+                if all(other.startCol != move.startCol for other in others):
+                    disambiguation = Move.colsToFiles[move.startCol]
+                elif all(other.startRow != move.startRow for other in others):
+                    disambiguation = Move.rowsToRanks[move.startRow]
+                else:
+                    disambiguation = move.getRankFile(move.startRow, move.startCol)
+                san = san[0] + disambiguation + san[1:]
+        inCheck, pins, checks = self.inCheck, self.pins, self.checks # Left as getValidMoves set them for this position
+        self.makeMove(move)
+        replies = self.getValidMoves()
+        if self.inCheck:
+            san += "#" if not replies else "+"
+        self.undoMove()
+        self.inCheck, self.pins, self.checks = inCheck, pins, checks
+        return san
+
+    # Valid moves ending on (r, c), only of one type of piece if piece is given, ChessBitboard generates only these
+    def getMovesTo(self, r, c, piece=None):
+        return [move for move in self.getValidMoves() if move.endRow == r and move.endCol == c and (piece is None or move.pieceMoved[1] == piece)]
+
+    # The valid move a SAN string stands for, None if no move or more than one matches
+    # Check marks and annotations are ignored, and 0-0, e8Q and Ng1-f3 are read too since they turn up in PGN files
+    # Without validMoves only the moves of the SAN's piece to its end square are generated, which leaves checkmate and stalemate unset
+    def getMoveFromSAN(self, san, validMoves=None):
+        san = san.rstrip("+#!?")
+        if san in ("O-O", "0-0", "O-O-O", "0-0-0"):
+            endCol = 6 if len(san) == 3 else 2
+            if validMoves is None:
+                validMoves = self.getMovesTo(self.whiteKingLocation[0] if self.whiteToMove else self.blackKingLocation[0], endCol, "K")
+            return next((move for move in validMoves if move.castleMove and move.endCol == endCol), None)
+        promotionPiece = ""
+        if "=" in san:
+            san, promotionPiece = san.split("=", 1)
+        elif len(san) > 2 and san[-1] in "QRBNqrbn" and san[-2] in "18":
+            san, promotionPiece = san[:-1], san[-1]
+        promotionPiece = promotionPiece.upper() # Some exports write e8=q
+        piece = san[0] if san[:1] in ("K", "Q", "R", "B", "N") else "P"
+        squares = (san[1:] if piece != "P" else san).replace("x", "").replace("-", "")
+        if len(squares) < 2 or squares[-2] not in Move.filesToCols or squares[-1] not in Move.ranksToRows:
+            return None
+        endRow, endCol = Move.ranksToRows[squares[-1]], Move.filesToCols[squares[-2]]
+        startCol = Move.filesToCols.get(squares[0]) if len(squares) > 2 and squares[0] in Move.filesToCols else None
+        startRow = Move.ranksToRows.get(squares[-3]) if len(squares) > 2 and squares[-3] in Move.ranksToRows else None
+        found = None
+        for move in validMoves if validMoves is not None else self.getMovesTo(endRow, endCol, piece):
+            if (move.endRow == endRow and move.endCol == endCol and move.pieceMoved[1] == piece and move.promotionPiece == promotionPiece and
+                    (startCol is None or move.startCol == startCol) and (startRow is None or move.startRow == startRow)):
+                if found is not None:
+                    return None # Ambiguous
+                found = move
+        return found
 
     # Takes a Move and executes it (castling, en-passant, and pawn promotion is not included)
     def makeMove(self, move):
-        self.board[move.startRow, move.startCol] = "--"
-        self.board[move.endRow, move.endCol] = move.pieceMoved
+        self.board[move.startRow][move.startCol] = "--"
+        self.board[move.endRow][move.endCol] = move.pieceMoved
         self.moveLog.append(move) # Log the move to undo later
         self.whiteToMove = not self.whiteToMove # Swap players
         self.enemyColor = "b" if self.whiteToMove else "w"
@@ -61,23 +251,18 @@ class GameState():
         elif move.pieceMoved == "bK":
             self.blackKingLocation = (move.endRow, move.endCol)
 
-        # Pawn Promotion
+        # Pawn Promotion, the piece is chosen when the move is made (the GUI asks the player)
         if move.pawnPromotion:
-            global promotedPiece
-            if cm.humanTurn:
-                promotedPiece = input("Promote to Q, R, B, or N: ")
-                self.board[move.endRow][move.endCol] = move.pieceMoved[0] + promotedPiece
-            else:
-                self.board[move.endRow][move.endCol] = move.pieceMoved[0] + "Q"
+            self.board[move.endRow][move.endCol] = move.pieceMoved[0] + move.promotionPiece
 
         # Update enPassantPossible only if pieceMoved is pawn and it moved by 2 squares and left or right have allyColor
         if (move.pieceMoved[1] == 'P' and abs(move.startRow - move.endRow) == 2 and
                 ((move.endCol > 0 and self.board[move.endRow][move.endCol - 1] == self.allyColor + 'P') or
                  (move.endCol < 7 and self.board[move.endRow][move.endCol + 1] == self.allyColor + 'P'))):
             self.enPassantPossible = ((move.startRow + move.endRow) // 2, move.endCol) # Start col also works
-            self.enPassantLog = [self.enPassantPossible]
         else: # Making sure if any other move it removes the possible enPassant
             self.enPassantPossible = ()
+        self.enPassantLog.append(self.enPassantPossible)
 
         # Enpassant, it removes the pawn on the same starting row but to the end row
         if move.enPassant:
@@ -94,6 +279,12 @@ class GameState():
 
         # Update castling rights when a king or rook moves
         self.updateCastleRights(move)
+        self.updateZobristKey(move)
+        self.updateBoardScore(move)
+        self.halfmoveClockLog.append(self.halfmoveClock)
+        self.halfmoveClock = 0 if move.pieceMoved[1] == "P" or move.pieceCaptured != "--" else self.halfmoveClock + 1
+        if move.pieceMoved[0] == "b":
+            self.fullmoveNumber += 1
         self.checks = [] # Reset check
 
      # Undo last move
@@ -101,8 +292,8 @@ class GameState():
         if len(self.moveLog) != 0:
             move = self.moveLog.pop()
 
-            self.board[move.startRow, move.startCol] = move.pieceMoved
-            self.board[move.endRow, move.endCol] = move.pieceCaptured
+            self.board[move.startRow][move.startCol] = move.pieceMoved
+            self.board[move.endRow][move.endCol] = move.pieceCaptured
             self.whiteToMove = not self.whiteToMove  # Switch turn players
             self.enemyColor = "b" if self.whiteToMove else "w"
             self.allyColor = "w" if self.whiteToMove else "b"
@@ -119,6 +310,7 @@ class GameState():
                 self.board[move.startRow][move.endCol] = move.pieceCaptured # Puts the pawn back on the square it was capture from
 
             # Allow enPassant back again no matter what
+            self.enPassantLog.pop()
             self.enPassantPossible = self.enPassantLog[-1]
 
             # Undo castling rights
@@ -138,50 +330,51 @@ class GameState():
                     self.board[move.endRow][move.endCol - 2] = self.board[move.endRow][move.endCol + 1]  # Moves rook
                     self.board[move.endRow][move.endCol + 1] = '--'  # Erase old rook
 
+            self.zobristKey = self.zobristLog.pop()
+            self.boardScore = self.boardScoreLog.pop()
+            self.halfmoveClock = self.halfmoveClockLog.pop()
+            if move.pieceMoved[0] == "b":
+                self.fullmoveNumber -= 1
             self.checks = []
             self.checkmate = False
             self.stalemate = False
 
-    # Get all valid moves considering checks
-    def getValidMoves(self):
-        moves = []
-        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
-        if self.whiteToMove:
-            kingRow = self.whiteKingLocation[0]
-            kingCol = self.whiteKingLocation[1]
-        else:
-            kingRow = self.blackKingLocation[0]
-            kingCol = self.blackKingLocation[1]
-        if self.inCheck:
-            if len(self.checks) == 1: # 1 Check, block or move king
-                moves = self.getAllPossibleMoves()
-
-                check = self.checks[0]
-                checkRow = check[0]
-                checkCol = check[1]
+    # Pass the turn without moving for null move pruning, the enPassant chance is lost like after any other move
+    def makeNullMove(self):
+        self.zobristLog.append(self.zobristKey)
+        if self.enPassantPossible:
+            self.zobristKey ^= zobristEnPassant[self.enPassantPossible[1]]
+        self.zobristKey ^= zobristBlackToMove
+        self.enPassantPossible = ()
+        self.enPassantLog.append(self.enPassantPossible)
+        self.whiteToMove = not self.whiteToMove
+        self.enemyColor = "b" if self.whiteToMove else "w"
+        self.allyColor = "w" if self.whiteToMove else "b"
+        self.checks = []
 
-                pieceChecking = self.board[checkRow][checkCol] #Enemy causing the check
-                validSquares = [] # Square that pieces can move to
+    def undoNullMove(self):
+        self.zobristKey = self.zobristLog.pop()
+        self.enPassantLog.pop()
+        self.enPassantPossible = self.enPassantLog[-1]
+        self.whiteToMove = not self.whiteToMove
+        self.enemyColor = "b" if self.whiteToMove else "w"
+        self.allyColor = "w" if self.whiteToMove else "b"
+        self.checks = []
+        self.checkmate = False
+        self.stalemate = False
 
-                # If knight, must capture or move
-                if pieceChecking[1] == 'N':
-                    validSquares = [(checkRow, checkCol)]
-                else:
-                    for i in range(1, 8): #Give valid square where a piece need to move to
-                        validSquare = (kingRow + check[2] * i, kingCol + check[3] * i)
-                        validSquares.append(validSquare)
-                        if validSquare[0] == checkRow and validSquare[1] == checkCol: # Once you reach the piece that checks stop
-                            break
-                # Remove all moves that don't block check or move king
-                for i in range(len(moves)-1, -1, -1):
-                    if moves[i].pieceMoved[1] != 'K': # Not King
-                        if not (moves[i].endRow, moves[i].endCol) in validSquares: # Move don't block check or capture piece
-                            moves.remove(moves[i])
-            else: # Double Check
-                self.getKingMoves(kingRow, kingCol, moves)
-        else:
-            moves = self.getAllPossibleMoves()
+    # True if color has a knight, bishop, rook or queen, with only king and pawns zugzwang is common so the search shouldn't pass
+    def hasNonPawnMaterial(self, color):
+        for row in self.board:
+            for square in row:
+                if square[0] == color and square[1] in "NBRQ":
+                    return True
+        return False
 
+    # Get all valid moves considering checks
+    def getValidMoves(self):
+        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        moves = self.getSquareMoves(self.inCheck, self.pins, self.checks)
         if len(moves) == 0:
             if self.inCheck:
                 self.checkmate = True
@@ -192,6 +385,81 @@ class GameState():
             self.stalemate = False
         return moves
 
+    # Valid moves of the pieces on squares (every square if None) with the pins and checks found for this position
+    # The pins are copied since the move functions take the pins they use off the list
+    def getSquareMoves(self, inCheck, pins, checks, squares=None):
+        self.inCheck, self.pins, self.checks = inCheck, list(pins), checks
+        if self.whiteToMove:
+            kingRow = self.whiteKingLocation[0]
+            kingCol = self.whiteKingLocation[1]
+        else:
+            kingRow = self.blackKingLocation[0]
+            kingCol = self.blackKingLocation[1]
+        moves = []
+        if len(checks) > 1: # Double Check, only the king can move
+            if squares is None or (kingRow, kingCol) in squares:
+                self.getKingMoves(kingRow, kingCol, moves)
+            return moves
+        for r, c in squares if squares is not None else allSquares:
+            turn = self.board[r][c][0]
+            if (turn == 'w' and self.whiteToMove) or (turn == 'b' and not self.whiteToMove):
+                self.moveFunctions[self.board[r][c][1]](r, c, moves)
+        if inCheck: # 1 Check, block or move king
+            checkRow, checkCol = checks[0][0], checks[0][1]
+            # Square that pieces can move to, the checking piece and the squares between it and the king (just the piece for a knight)
+            validSquares = betweenSquares[kingRow * 8 + kingCol][checkRow * 8 + checkCol]
+            # Keep the king moves and the moves that block the check or capture the piece, one pass instead of removing moves one by one
+            moves = [move for move in moves if move.pieceMoved[1] == 'K' or (move.endRow, move.endCol) in validSquares or
+                     (move.enPassant and (move.startRow, move.endCol) == (checkRow, checkCol))] # EnPassant capturing the checking pawn
+        return moves
+
+    # Moves in the order the search wants them: the hash move, captures and promotions, the killer moves, then the rest
+    # captureKey and quietKey sort the captures and the other moves, quiets=False leaves the other moves out unless in check
+    # Returns a generator so the search can stop taking moves at a cutoff, inCheck is set straight away,
+    # checkmate and stalemate are left to the caller since the moves aren't all known yet
+    # Only the hash move's start square is looked at until the search gets past the hash move, a cutoff on it saves generating the rest
+    def generateMoves(self, hashMoveID=0, killerIDs=(), captureKey=None, quietKey=None, quiets=True):
+        self.inCheck, self.pins, self.checks = self.checkForPinsAndChecks()
+        self.checkmate = False
+        self.stalemate = False
+        return self.stagedMoves(self.inCheck, self.pins, self.checks, hashMoveID, killerIDs, captureKey, quietKey, quiets or self.inCheck)
+
+    # The pins and checks are passed in because searching the moves already yielded overwrites the ones on self
+    def stagedMoves(self, inCheck, pins, checks, hashMoveID, killerIDs, captureKey, quietKey, quiets):
+        if hashMoveID:
+            hashMove = self.getStageMove(hashMoveID, inCheck, pins, checks)
+            if hashMove is not None and (quiets or hashMove.isCapture or hashMove.pawnPromotion):
+                yield hashMove
+        captures = []
+        others = []
+        for move in self.getSquareMoves(inCheck, pins, checks): # The move functions make captures and quiet moves together
+            if move.moveID == hashMoveID:
+                continue
+            elif move.isCapture or move.pawnPromotion:
+                captures.append(move)
+            else:
+                others.append(move)
+        if captureKey is not None:
+            captures.sort(key=captureKey, reverse=True)
+        yield from captures
+        if not quiets:
+            return
+        killers = [move for killerID in killerIDs for move in others if move.moveID == killerID]
+        yield from killers
+        if quietKey is not None:
+            others.sort(key=quietKey, reverse=True)
+        for move in others:
+            if move.moveID not in killerIDs:
+                yield move
+
+    # The valid move with moveID if there is one, generated only from its start square
+    def getStageMove(self, moveID, inCheck, pins, checks):
+        startSquare = (moveID >> 6) & 63
+        for move in self.getSquareMoves(inCheck, pins, checks, ((startSquare // 8, startSquare % 8),)):
+            if move.moveID == moveID:
+                return move
+        return None
+
     # Get all moves without considering checks
     def getAllPossibleMoves(self):
         moves = []
@@ -203,6 +471,14 @@ class GameState():
                     self.moveFunctions[piece](r, c, moves) # Calls the correct function base of what piece it is using a dictionary
         return moves
 
+    # Pawn move, one move for every promotion piece if it reaches the last rank
+    def addPawnMoves(self, startSquare, endSquare, moves):
+        if endSquare[0] == 0 or endSquare[0] == 7:
+            for piece in promotionPieces:
+                moves.append(Move(startSquare, endSquare, self.board, promotionPiece=piece))
+        else:
+            moves.append(Move(startSquare, endSquare, self.board))
+
     # Get all the pawn moves for pawn located at row, col, and add to move list
     def getPawnMoves(self, r, c, moves):
         piecePinned = False
@@ -224,16 +500,16 @@ class GameState():
             kingRow, kingCol = self.blackKingLocation
 
         if self.board[r + rowDir][c] == "--": # Move 1 square up
-            if not piecePinned or pinDirection == (rowDir, 0):
-                moves.append(Move((r, c), (r + rowDir, c), self.board))
+            if not piecePinned or pinDirection == (rowDir, 0) or pinDirection == (-rowDir, 0):
+                self.addPawnMoves((r, c), (r + rowDir, c), moves)
                 if r == startRow and self.board[r + 2*rowDir][c] == "--": # Move 2 square up
                     moves.append(Move((r, c), (r + 2*rowDir, c), self.board))
 
         if c-1 >= 0: # Captures left
             if self.board[r + rowDir][c-1][0] == self.enemyColor: # Enemy piece on left
-                if not piecePinned or pinDirection == (-1, -1):
-                    moves.append(Move((r, c), (r + rowDir, c-1), self.board))
-            elif (r + rowDir, c-1) == self.enPassantPossible:
+                if not piecePinned or pinDirection == (rowDir, -1) or pinDirection == (-rowDir, 1):
+                    self.addPawnMoves((r, c), (r + rowDir, c-1), moves)
+            elif (r + rowDir, c-1) == self.enPassantPossible and (not piecePinned or pinDirection == (rowDir, -1) or pinDirection == (-rowDir, 1)):
                 attackingPiece = blockingPiece = False
                 if kingRow == r:
                     if kingCol < c: # King is left of the pawn
@@ -250,16 +526,17 @@ class GameState():
                         square = self.board[r][i]
                         if square[0] == self.enemyColor and (square[1] == 'R' or square[1] == 'Q'): # Attacking piece
                             attackingPiece = True
-                        elif square != '--':
-                            blockingPiece = True
+                            break
+                        elif square != '--': # Nearest piece on the outside is not attacking
+                            break
                 if not attackingPiece or blockingPiece: # if there's no attacking piece or there is a blocking piece
                     moves.append(Move((r, c), (r + rowDir, c-1), self.board, enPassant=True))
 
         if c+1 <= 7: # Captures right
             if self.board[r + rowDir][c+1][0] == self.enemyColor:  # Enemy piece on left
-                if not piecePinned or pinDirection == (-1, 1):
-                    moves.append(Move((r, c), (r + rowDir, c+1), self.board))
-            elif (r + rowDir, c + 1) == self.enPassantPossible:
+                if not piecePinned or pinDirection == (rowDir, 1) or pinDirection == (-rowDir, -1):
+                    self.addPawnMoves((r, c), (r + rowDir, c+1), moves)
+            elif (r + rowDir, c + 1) == self.enPassantPossible and (not piecePinned or pinDirection == (rowDir, 1) or pinDirection == (-rowDir, -1)):
                 attackingPiece = blockingPiece = False
                 if kingRow == r:
                     if kingCol < c:  # King is left of the pawn
@@ -276,8 +553,9 @@ class GameState():
                          square = self.board[r][i]
                          if square[0] == self.enemyColor and (square[1] == 'R' or square[1] == 'Q'):  # Attacking piece
                              attackingPiece = True
-                         elif square != '--':
-                             blockingPiece = True
+                             break
+                         elif square != '--':  # Nearest piece on the outside is not attacking
+                             break
                 if not attackingPiece or blockingPiece:  # if there's no attacking piece or there is a blocking piece
                     moves.append(Move((r, c), (r + rowDir, c+1), self.board, enPassant=True))
 
@@ -365,8 +643,6 @@ class GameState():
 
     # Same but king
     def getKingMoves(self, r, c, moves):
-        rowMoves = (-1, -1, -1, 0, 0, 1, 1, 1)
-        colMoves = (-1, 0, 1, -1, 1, -1, 0, 1)
         restrictedDirs = set()
         for check in self.checks:
             checkDirRow, checkDirCol = check[2], check[3]
@@ -374,16 +650,13 @@ class GameState():
             if checkingPiece[1] != 'P':
                 restrictedDirs.add((-checkDirRow, -checkDirCol))  # Opposite direction of check
 
-        for i in range(8):
-            endRow = r + rowMoves[i]
-            endCol = c + colMoves[i]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:  # Check if the move is within the board bounds
-                if (rowMoves[i], colMoves[i]) in restrictedDirs:
-                    continue
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] != self.allyColor:  # Not an ally piece (empty or enemy piece)
-                    if not self.squareUnderAttack(endRow, endCol):
-                        moves.append(Move((r, c), (endRow, endCol), self.board))
+        for endRow, endCol, dRow, dCol in kingTargets[r * 8 + c]:
+            if (dRow, dCol) in restrictedDirs:
+                continue
+            endPiece = self.board[endRow][endCol]
+            if endPiece[0] != self.allyColor:  # Not an ally piece (empty or enemy piece)
+                if not self.squareUnderAttack(endRow, endCol):
+                    moves.append(Move((r, c), (endRow, endCol), self.board))
         self.getCastleMoves(r, c, moves)
 
     # Generate all the valid castling moves for the current king at r, c and add them to move list
@@ -404,43 +677,35 @@ class GameState():
                 moves.append(Move((r, c), (r, c-2), self.board, castleMove=True))
 
     #  Returns if square under attack
+    # The first piece on every ray from the square attacks it if it is in the attacker set for that direction and distance, see rayAttackers
     def squareUnderAttack(self, r, c):
-        directions = ((-1, 0), (0, -1), (1, 0), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
-            d = directions[j]
-            for i in range(1, 8):
-                endRow = r + d[0] * i
-                endCol = c + d[1] * i
-                if 0 <= endRow < 8 and 0 <= endCol < 8:
-                    endPiece = self.board[endRow][endCol]
-                    if endPiece[0] == self.allyColor:
-                        break
-                    elif endPiece[0] == self.enemyColor:
-                        pType = endPiece[1]
-                        # 5 possibilities here in this complex conditional hits enemy that can check
-                        # 1.) orthogonally away from king and piece is a rook
-                        # 2.) diagonally away from king and piece is a bishop
-                        # 3.) any direction and piece 1  is a queen
-                        # 4.) any direction 1 square away and piece is a king (this is necessary to prevent a king move to a square controlled by another king)
-                        # 5.) 1 square away diagonally from king and piece is a pawn (it will check from the direction of the king, so if pawn is white (attack by -1), king will check +1)
-                        if ((0 <= j <= 3 and pType == 'R') or
-                                (4 <= j <= 7 and pType == 'B') or
-                                (i == 1 and pType == 'P' and ((self.enemyColor == 'w' and 6 <= j <= 7) or (self.enemyColor == 'b' and 4 <= j <= 5))) or
-                                (pType == 'Q') or (i == 1 and pType == 'K')):
-                            return True
-                        else:  # Enemy no applying attack
-                            break
-                else:  # Not on board
+        board = self.board
+        nearAttackers = adjacentAttackers[self.enemyColor]
+        farAttackers = rayAttackers[self.enemyColor]
+        for j, ray in enumerate(rayLists[r * 8 + c]):
+            for i, (endRow, endCol) in enumerate(ray):
+                endPiece = board[endRow][endCol]
+                if endPiece != "--":
+                    if endPiece in (farAttackers[j] if i else nearAttackers[j]):
+                        return True
                     break
         # Knight Checks
-        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        for m in knightMoves:
-            endRow = r + m[0]
-            endCol = c + m[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                endPiece = self.board[endRow][endCol]
-                if endPiece[0] == self.enemyColor and endPiece[1] == 'N':  # enemy knight attack king
-                    return True
+        enemyKnight = self.enemyColor + "N"
+        for endRow, endCol, dRow, dCol in knightTargets[r * 8 + c]:
+            if board[endRow][endCol] == enemyKnight:
+                return True
+        return False
+
+    # Rough static exchange score of a capture for the side to move, in ChessEvaluation.exchangeValues
+    # Only checks whether the end square is defended, the bitboard backend plays out the whole exchange
+    def staticExchange(self, move):
+        values = ChessEvaluation.exchangeValues
+        gain = values[move.pieceCaptured[1]] if move.isCapture else 0
+        if move.pawnPromotion:
+            gain += values[move.promotionPiece] - values["P"]
+        if self.squareUnderAttack(move.endRow, move.endCol):
+            gain -= values[move.promotionPiece] if move.pawnPromotion else values[move.pieceMoved[1]]
+        return gain
 
     def checkForPinsAndChecks(self):
         pins = [] # Store location of allied pinned piece and the direction of the pinned from
@@ -452,53 +717,35 @@ class GameState():
         else:
             startRow = self.blackKingLocation[0]
             startCol = self.blackKingLocation[1]
-        directions = ((-1,0), (0,-1), (1, 0), (0,1), (-1, -1), (-1, 1), (1, -1), (1, 1))
-        for j in range(len(directions)):
+        board = self.board
+        nearAttackers = adjacentAttackers[self.enemyColor]
+        farAttackers = rayAttackers[self.enemyColor]
+        for j, ray in enumerate(rayLists[startRow * 8 + startCol]):
             d = directions[j]
             possiblePin = () # Store Possible Pin Reset pin
-            for i in range(1, 8):
-                nRow = startRow + d[0] * i
-                nCol = startCol + d[1] * i
-                if 0 <= nRow < 8 and 0 <= nCol < 8:
-                    endPiece = self.board[nRow][nCol]
-                    if endPiece[0] == self.allyColor:
-                        if possiblePin == ():
-                            possiblePin = (nRow, nCol, d[0], d[1])
-                        else: # Second pin
-                            break
-                    elif endPiece[0] == self.enemyColor:
-                        pType = endPiece[1]
-                        # 5 possibilities here in this complex conditional hits enemy that can check
-                        # 1.) orthogonally away from king and piece is a rook
-                        # 2.) diagonally away from king and piece is a bishop
-                        # 3.) any direction and piece 1  is a queen
-                        # 4.) any direction 1 square away and piece is a king (this is necessary to prevent a king move to a square controlled by another king)
-                        # 5.) 1 square away diagonally from king and piece is a pawn (it will check from the direction of the king, so if pawn is white (attack by -1), king will check +1)
-                        if ((0 <= j <= 3 and pType == 'R') or
-                                (4 <= j <= 7 and pType == 'B') or
-                                (i == 1 and pType == 'P' and ((self.enemyColor == 'w' and 6 <= j <= 7) or (self.enemyColor == 'b' and 4 <= j <= 5))) or
-                                (pType == 'Q') or (i == 1 and pType == 'K')):
-                            if possiblePin == (): # No piece blocking
-                                inCheck = True
-                                self.checks.append((nRow, nCol, d[0], d[1])) if (nRow, nCol, d[0], d[1]) not in self.checks else None
-                                break
-                            else: # Ally is blocking so pin
-                                pins.append(possiblePin)
-                                break
-                        else: # Enemy no applying check or pin
-                            break
-                else: # Not on board
-                    break
+            for i, (nRow, nCol) in enumerate(ray):
+                endPiece = board[nRow][nCol]
+                if endPiece == "--":
+                    continue
+                if endPiece[0] == self.allyColor:
+                    if possiblePin == ():
+                        possiblePin = (nRow, nCol, d[0], d[1])
+                    else: # Second pin
+                        break
+                else:
+                    if endPiece in (farAttackers[j] if i else nearAttackers[j]):
+                        if possiblePin == (): # No piece blocking
+                            inCheck = True
+                            self.checks.append((nRow, nCol, d[0], d[1]))
+                        else: # Ally is blocking so pin
+                            pins.append(possiblePin)
+                    break # Enemy piece ends the ray whether it checks, pins or neither
         # Knight Checks
-        knightMoves = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
-        for m in knightMoves:
-            nRow = startRow + m[0]
-            nCol = startCol + m[1]
-            if 0 <= nRow < 8 and 0 <= nCol < 8:
-                endPiece = self.board[nRow][nCol]
-                if endPiece[0] == self.enemyColor and endPiece[1] == 'N': #enemy knight attack king
-                    inCheck = True
-                    self.checks.append((nRow, nCol, m[0], m[1])) if (nRow, nCol, m[0], m[1]) not in self.checks else None
+        enemyKnight = self.enemyColor + "N"
+        for nRow, nCol, dRow, dCol in knightTargets[startRow * 8 + startCol]:
+            if board[nRow][nCol] == enemyKnight:
+                inCheck = True
+                self.checks.append((nRow, nCol, dRow, dCol))
         # Uses self.checks because we don't want to reset the checks everytime this method is called, only reset check when a move is made
         return inCheck, pins, self.checks
 
@@ -537,6 +784,70 @@ class GameState():
 
         self.castleRightsLog.append(CastleRights(self.castlingwKs, self.castlingbKs, self.castlingwQs, self.castlingbQs))
 
+    # Full position key from scratch, only needed when the position is set up
+    def computeZobristKey(self):
+        key = 0
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] != "--":
+                    key ^= zobristPieces[self.board[r][c]][r][c]
+        key ^= zobristCastling[self.castleRightsLog[-1].getIndex()]
+        if self.enPassantPossible:
+            key ^= zobristEnPassant[self.enPassantPossible[1]]
+        if not self.whiteToMove:
+            key ^= zobristBlackToMove
+        return key
+
+    # XOR the changes of the move into the position key, called at the end of makeMove once the board, rights and enPassant are updated
+    def updateZobristKey(self, move):
+        self.zobristLog.append(self.zobristKey)
+        key = self.zobristKey ^ zobristBlackToMove
+        key ^= zobristPieces[move.pieceMoved][move.startRow][move.startCol]
+        key ^= zobristPieces[self.board[move.endRow][move.endCol]][move.endRow][move.endCol] # Promoted piece if it was a promotion
+        if move.enPassant:
+            key ^= zobristPieces[move.pieceCaptured][move.startRow][move.endCol]
+        elif move.isCapture:
+            key ^= zobristPieces[move.pieceCaptured][move.endRow][move.endCol]
+        if move.castleMove:
+            rookKeys = zobristPieces[move.pieceMoved[0] + "R"][move.endRow]
+            if move.endCol == move.startCol + 2: # KingSide castle
+                key ^= rookKeys[move.endCol + 1] ^ rookKeys[move.endCol - 1]
+            else: # QueenSide castle
+                key ^= rookKeys[move.endCol - 2] ^ rookKeys[move.endCol + 1]
+        key ^= zobristCastling[self.castleRightsLog[-2].getIndex()] ^ zobristCastling[self.castleRightsLog[-1].getIndex()]
+        if self.enPassantLog[-2]:
+            key ^= zobristEnPassant[self.enPassantLog[-2][1]]
+        if self.enPassantPossible:
+            key ^= zobristEnPassant[self.enPassantPossible[1]]
+        self.zobristKey = key
+
+    # Full board score from scratch, only needed when the position is set up
+    def computeBoardScore(self):
+        score = 0
+        for r in range(8):
+            for c in range(8):
+                if self.board[r][c] != "--":
+                    score += ChessEvaluation.pieceSquareTenths[self.board[r][c]][r][c]
+        return score
+
+    # Add the changes of the move to the running score, same squares as updateZobristKey
+    def updateBoardScore(self, move):
+        self.boardScoreLog.append(self.boardScore)
+        values = ChessEvaluation.pieceSquareTenths
+        score = self.boardScore - values[move.pieceMoved][move.startRow][move.startCol]
+        score += values[self.board[move.endRow][move.endCol]][move.endRow][move.endCol] # Promoted piece if it was a promotion
+        if move.enPassant:
+            score -= values[move.pieceCaptured][move.startRow][move.endCol]
+        elif move.isCapture:
+            score -= values[move.pieceCaptured][move.endRow][move.endCol]
+        if move.castleMove:
+            rookValues = values[move.pieceMoved[0] + "R"][move.endRow]
+            if move.endCol == move.startCol + 2: # KingSide castle
+                score += rookValues[move.endCol - 1] - rookValues[move.endCol + 1]
+            else: # QueenSide castle
+                score += rookValues[move.endCol + 1] - rookValues[move.endCol - 2]
+        self.boardScore = score
+
 class CastleRights():
     def __init__(self, wKs, bKs, wQs, bQs):
         self.wKs = wKs
@@ -544,7 +855,14 @@ class CastleRights():
         self.wQs = wQs
         self.bQs = bQs
 
+    # Number from 0 to 15 for the combination of rights
+    def getIndex(self):
+        return self.wKs + 2 * self.bKs + 4 * self.wQs + 8 * self.bQs
+
 class Move():
+    # Thousands of moves are made per search node, __slots__ drops the per move __dict__ so they are smaller and quicker to build
+    __slots__ = ("startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured", "pawnPromotion", "promotionPiece", "castleMove", "enPassant", "isCapture", "moveID")
+
     # Map keys to Values
     # Change coordinates to chest notation
     rowsToRanks = {0: "8", 1: "7", 2: "6", 3: "5", 4: "4", 5: "3", 6: "2", 7: "1"}
@@ -552,23 +870,28 @@ class Move():
     colsToFiles = {0: "a", 1: "b", 2: "c", 3: "d", 4: "e", 5: "f", 6: "g", 7: "h"}
     filesToCols = {v: k for k, v in colsToFiles.items()}
 
-    # En Passant is optional default is empty
-    def __init__(self, startSquare, endSquare, board, enPassant = False, castleMove = False):
-        self.startRow = startSquare[0]
-        self.startCol = startSquare[1]
-        self.endRow = endSquare[0]
-        self.endCol = endSquare[1]
-        self.pieceMoved = board[self.startRow][self.startCol] # Select the piece moved/first click
-        self.pieceCaptured = board[self.endRow][self.endCol] # Select the target place/second click can be "--"
-
-        self.pawnPromotion = (self.pieceMoved == 'wP' and self.endRow == 0) or (self.pieceMoved == 'bP' and self.endRow == 7)
+    # En Passant is optional default is empty, promotionPiece is only used if the move is a promotion
+    def __init__(self, startSquare, endSquare, board, enPassant = False, castleMove = False, promotionPiece = "Q"):
+        self.startRow = startRow = startSquare[0]
+        self.startCol = startCol = startSquare[1]
+        self.endRow = endRow = endSquare[0]
+        self.endCol = endCol = endSquare[1]
+        self.pieceMoved = pieceMoved = board[startRow][startCol] # Select the piece moved/first click
+        self.pieceCaptured = board[endRow][endCol] # Select the target place/second click can be "--"
+
+        self.pawnPromotion = pawnPromotion = (pieceMoved == 'wP' and endRow == 0) or (pieceMoved == 'bP' and endRow == 7)
+        self.promotionPiece = promotionPiece if pawnPromotion else ""
         self.castleMove = castleMove
         self.enPassant = enPassant
         if enPassant:
-            self.pieceCaptured = 'bP' if self.pieceMoved == 'wP' else 'wP' # Store information of pieceCaptured to be covered later since previously we store it by end.Row and end.Col which is '--'
+            self.pieceCaptured = 'bP' if pieceMoved == 'wP' else 'wP' # Store information of pieceCaptured to be covered later since previously we store it by end.Row and end.Col which is '--'
 
         self.isCapture = self.pieceCaptured != "--"
-        self.moveID = self.startRow * 1000 + self.startCol * 100 + self.endRow * 10 + self.endCol
+        # End square in the low 6 bits, start square in the next 6 and an underpromotion above them, square is row * 8 + col
+        # A queen promotion keeps the plain ID so the move made by clicking the squares matches it
+        self.moveID = (startRow << 9) | (startCol << 6) | (endRow << 3) | endCol
+        if pawnPromotion:
+            self.moveID |= promotionIDs[promotionPiece] << 12
 
     # Overriding the equals method, to make a Move instance equal to each other if the ID is same
     def __eq__(self, other):
@@ -576,6 +899,9 @@ class Move():
             return self.moveID == other.moveID
         return False
 
+    def __hash__(self):
+        return self.moveID
+
     def getChessNotation(self):
         notation = None
         capture = "x" if self.pieceCaptured != "--" else ""
@@ -583,7 +909,7 @@ class Move():
         if self.pieceMoved[1] == "P":  # file of pawn + x + end or end
             notation = (self.colsToFiles[self.startCol] + capture + self.getRankFile(self.endRow,self.endCol)) if capture else self.getRankFile(self.endRow, self.endCol)
             if self.pawnPromotion:
-                notation = (self.colsToFiles[self.endCol] + self.rowsToRanks[self.endRow] + promotedPiece)
+                notation += self.promotionPiece
         else:
             notation = self.pieceMoved[1] + capture + self.getRankFile(self.endRow, self.endCol)
         return notation
@@ -591,6 +917,10 @@ class Move():
     def getRankFile(self, r, c):
         return self.colsToFiles[c] + self.rowsToRanks[r]
 
+    # Long algebraic notation used by UCI, start and end square and the promotion piece in lower case (e7e8q)
+    def getUCINotation(self):
+        return self.getRankFile(self.startRow, self.startCol) + self.getRankFile(self.endRow, self.endCol) + self.promotionPiece.lower()
+
         # Overiding the str() function
     def __str__(self):
         # Castle Move
@@ -605,8 +935,8 @@ class Move():
             else:
                 moveString = endSquare
             # Pawn promotion
-            if self.endRow == 0 or self.endRow == 7: # Reaching the last rank
-                moveString += "=Q"  # Assuming Queen promotion by default
+            if self.pawnPromotion:
+                moveString += "=" + self.promotionPiece
             return moveString
             # Two of the same type of piece moving to a square, Nbd2 if both knights can move to d2
             # 1. Check the board for another instance of the piece and save the location
@@ -0,0 +1,88 @@
+"""
+Evaluation tables: piece values, piece square tables and the per square tables built from them.
+Used by the rules modules (running board score, static exchange) and the search, so neither has to import the other.
+"""
+
+import numpy as np
+
+pieceScore = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 10, "K": 0}
+exchangeValues = {"P": 1, "N": 3, "B": 3, "R": 5, "Q": 10, "K": 100} # pieceScore for static exchange, the king can only be the last to capture
+knightScores = [[1, 1, 1, 1, 1, 1, 1, 1],
+                [1, 2, 2, 2, 2, 2, 2, 1],
+                [1, 2, 3, 3, 3, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 3, 3, 3, 2, 1],
+                [1, 2, 2, 2, 2, 2, 2, 1],
+                [1, 1, 1, 1, 1, 1, 1, 1]]
+
+bishopScores = [[4, 3, 2, 1, 1, 2, 3, 4],
+                [3, 4, 3, 2, 2, 3, 4, 3],
+                [2, 3, 4, 3, 3, 4, 3, 2],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [1, 2, 3, 4, 4, 3, 2, 1],
+                [2, 3, 4, 3, 3, 4, 3, 2],
+                [3, 4, 3, 2, 2, 3, 4, 3],
+                [4, 3, 2, 1, 1, 2, 3, 4]]
+
+queenScores = [[1, 1, 1, 3, 1, 1, 1, 1],
+               [1, 1, 2, 3, 3, 1, 1, 1],
+               [1, 4, 3, 3, 3, 4, 2, 1],
+               [1, 2, 3, 3, 3, 2, 2, 1],
+               [1, 2, 3, 3, 3, 2, 2, 1],
+               [1, 4, 3, 3, 3, 4, 2, 1],
+               [1, 1, 2, 3, 3, 1, 1, 1],
+               [1, 1, 1, 3, 1, 1, 1, 1]]
+
+# Can try rook with open files ++, rook on same file as queen or other rook
+rookScores = [[4, 3, 4, 4, 4, 4, 3, 4],
+              [4, 4, 4, 4, 4, 4, 4, 4],
+              [1, 1, 2, 3, 3, 2, 1, 1],
+              [1, 2, 3, 4, 4, 3, 2, 1],
+              [1, 2, 3, 4, 4, 3, 2, 1],
+              [1, 1, 2, 3, 3, 2, 1, 1],
+              [4, 4, 4, 4, 4, 4, 4, 4],
+              [4, 3, 4, 4, 4, 4, 3, 4]]
+
+whitePawnScores = [[100, 100, 100, 100, 100, 100, 100, 100],
+                   [8, 8, 8, 8, 8, 8, 8, 8],
+                   [5, 6, 6, 7, 7, 6, 6, 5],
+                   [3, 3, 3, 5, 5, 3, 3, 3],
+                   [2, 2, 3, 4, 4, 3, 2, 2],
+                   [1, 1, 2, 3, 3, 2, 1, 1],
+                   [1, 1, 1, 0, 0, 1, 1, 1],
+                   [0, 0, 0, 0, 0, 0, 0, 0]]
+
+blackPawnScores = [[0, 0, 0, 0, 0, 0, 0, 0],
+                   [1, 1, 1, 0, 0, 1, 1, 1],
+                   [1, 1, 2, 3, 3, 2, 1, 1],
+                   [2, 2, 3, 4, 4, 3, 2, 2],
+                   [3, 3, 3, 5, 5, 3, 3, 3],
+                   [5, 6, 6, 7, 7, 6, 6, 5],
+                   [8, 8, 8, 8, 8, 8, 8, 8],
+                   [100, 100, 100, 100, 100, 100, 100, 100]]
+
+piecePositionScores = {"wP": whitePawnScores, "bP": blackPawnScores, "N": knightScores, "B": bishopScores, "R": rookScores, "Q" : queenScores}
+
+# Boards for batch evaluation are N x 64 int8 arrays of these codes, square index is row * 8 + col
+pieceCodes = {"--": 0, "wP": 1, "wN": 2, "wB": 3, "wR": 4, "wQ": 5, "wK": 6, "bP": -1, "bN": -2, "bB": -3, "bR": -4, "bQ": -5, "bK": -6}
+
+# Builds the evaluation tables from pieceScore and piecePositionScores, called again after either is replaced
+# A GameState's running boardScore was summed with the old tables, computeBoardScore gives it again with the new ones
+def buildEvaluationTables():
+    global pieceSquareTenths, pieceSquareTable
+    # Piece value plus position value of every piece on every square in tenths of a pawn, positive for white and negative for black
+    # GameState keeps a running total of these, whole numbers so the total never drifts
+    pieceSquareTenths = {}
+    for color, sign in (("w", 1), ("b", -1)):
+        for piece in "PNBRQK":
+            positionScores = piecePositionScores.get(color + piece if piece == "P" else piece) # No position table for king
+            pieceSquareTenths[color + piece] = [[sign * (pieceScore[piece] * 10 + (positionScores[r][c] if positionScores else 0))
+                                                 for c in range(8)] for r in range(8)]
+    # pieceSquareTable[code + 6, square] is pieceSquareTenths as an array, the empty row (code 0) is all zeros
+    pieceSquareTable = np.zeros((13, 64), dtype=np.int32)
+    for piece, code in pieceCodes.items():
+        if piece != "--":
+            pieceSquareTable[code + 6] = np.array(pieceSquareTenths[piece]).reshape(64)
+
+buildEvaluationTables()
@@ -0,0 +1,115 @@
+"""
+Load generator for ChessServer, simulates many clients each playing random legal moves against the AI.
+Reports the latency of a move (sent until the AI's reply is back, busy retries included) as percentiles, and games and moves per second.
+Run: python ChessLoadTest.py [--clients N] [--games N] [--moves N] [--port N] [--start-server [--workers N] [--move-time SECONDS]]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import ChessServer
+
+busyRetryDelay = 0.05 # Seconds a client waits before sending a move the server was too busy for again, doubled on every retry
+maxBusyRetryDelay = 2.0
+
+class LoadResults():
+    def __init__(self):
+        self.latencies = [] # Seconds per move
+        self.games = 0
+        self.busyReplies = 0
+        self.errors = 0
+
+    def getPercentile(self, fraction):
+        latencies = sorted(self.latencies)
+        return latencies[int(fraction * (len(latencies) - 1))] if latencies else 0.0
+
+async def request(reader, writer, message):
+    writer.write((json.dumps(message) + "\n").encode())
+    await writer.drain()
+    return json.loads(await reader.readline())
+
+# One client, plays gameCount games of at most moveCount of its own moves, random legal moves as white or black
+async def runClient(host, port, gameCount, moveCount, rng, results):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for game in range(gameCount):
+            reply = await request(reader, writer, {"cmd": "new", "color": rng.choice("wb")})
+            if not reply["ok"]:
+                results.errors += 1
+                continue
+            gameID = reply["game"]
+            for move in range(moveCount):
+                if reply["status"] != "playing":
+                    break
+                name = rng.choice(reply["legalMoves"])
+                start = time.perf_counter()
+                retryDelay = busyRetryDelay
+                while True:
+                    moveReply = await request(reader, writer, {"cmd": "move", "game": gameID, "move": name})
+                    if moveReply["ok"] or moveReply["error"] != "busy":
+                        break
+                    results.busyReplies += 1
+                    await asyncio.sleep(retryDelay * rng.uniform(0.5, 1.5)) # Jitter so the clients don't all come back at once
+                    retryDelay = min(retryDelay * 2, maxBusyRetryDelay)
+                if not moveReply["ok"]:
+                    results.errors += 1
+                    break
+                results.latencies.append(time.perf_counter() - start)
+                reply = moveReply
+            await request(reader, writer, {"cmd": "close", "game": gameID})
+            results.games += 1
+    finally:
+        writer.close()
+
+async def runLoad(host, port, clientCount, gameCount, moveCount, seed):
+    results = LoadResults()
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    await asyncio.gather(*(runClient(host, port, gameCount, moveCount, random.Random(rng.random()), results) for i in range(clientCount)))
+    return results, time.perf_counter() - start
+
+# Starts ChessServer.py in a new process and waits until it accepts connections
+def startServer(host, port, workers, moveTime):
+    serverScript = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ChessServer.py") # Found from any working directory
+    command = [sys.executable, serverScript, "--host", host, "--port", str(port), "--move-time", str(moveTime)]
+    if workers is not None:
+        command += ["--workers", str(workers)]
+    server = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    if not server.stdout.readline().startswith("Serving"):
+        server.wait()
+        raise RuntimeError("ChessServer.py didn't start")
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for ChessServer")
+    parser.add_argument("--host", default=ChessServer.serverHost)
+    parser.add_argument("--port", type=int, default=ChessServer.serverPort)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--games", type=int, default=1, help="games per client")
+    parser.add_argument("--moves", type=int, default=10, help="moves per game for the client")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start-server", action="store_true", help="start a server for the test and stop it afterwards")
+    parser.add_argument("--workers", type=int, default=None, help="search processes of the started server")
+    parser.add_argument("--move-time", type=float, default=0.05, help="most AI seconds per move of the started server")
+    args = parser.parse_args()
+
+    server = startServer(args.host, args.port, args.workers, args.move_time) if args.start_server else None
+    try:
+        results, seconds = asyncio.run(runLoad(args.host, args.port, args.clients, args.games, args.moves, args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    moves = len(results.latencies)
+    print(f"{args.clients} clients  {results.games} games  {moves} moves in {seconds:.1f}s  "
+          f"{results.games / seconds:.2f} games/s  {moves / seconds:.1f} moves/s  {results.busyReplies} busy replies  {results.errors} errors")
+    print(f"Move latency  p50 {results.getPercentile(0.5) * 1000:.0f} ms  p90 {results.getPercentile(0.9) * 1000:.0f} ms  "
+          f"p99 {results.getPercentile(0.99) * 1000:.0f} ms  max {results.getPercentile(1.0) * 1000:.0f} ms")
+
+if __name__ == "__main__":
+    main()
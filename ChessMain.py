@@ -3,8 +3,7 @@ Main Driver File.
 Responsible for handling user input and displaying the current GameStaye object.
 """
 import pygame as p
-import ChessEngine, ChessAI
-from multiprocessing import Process, Queue
+import ChessEngine, ChessWorker
 
 boardWidth = boardHeight = 512
 moveLogPanelWidth = 250
@@ -13,7 +12,12 @@ dimension = 8
 squareSize = boardHeight // dimension # 64
 maxFps = 15
 images = {}
-humanTurn = None # Enables choosing promoted piece
+AIResultEvent = p.USEREVENT + 1 # Posted by the search worker's listener thread when a search sends a move
+pondering = True # Search the human's expected reply on their time so the AI can answer it straight away
+
+# Runs on the worker's listener thread, hand the result to the main loop as a pygame event
+def postAIResult(searchID, moveID, final, pv, ponderMoveID):
+    p.event.post(p.event.Event(AIResultEvent, searchID=searchID, moveID=moveID, final=final, pv=pv, ponderMoveID=ponderMoveID))
 
 def loadImages():
     pieces = ["wP", "wB", "wN", "wR", "wQ", "wK", "bP", "bB", "bN", "bR", "bQ", "bK"]
@@ -21,6 +25,7 @@ def loadImages():
         images[piece] = p.transform.scale(p.image.load("images/" + piece + ".png"), (squareSize, squareSize))
 
 def main():
+    AIWorker = ChessWorker.SearchWorker(onResult=postAIResult) # Started before pygame so the worker process doesn't carry the display
     p.init()
     p.display.set_caption("Chess")
     p.display.set_icon(p.image.load("images/wK.png"))
@@ -36,6 +41,7 @@ def main():
     animate = False # Flah variable for when we should animate a move
 
     loadImages()
+    renderer = Renderer(screen, moveLogFont)
 
     running = True
     squareSelected = () # Keep track of last click (tuple: (row, col))
@@ -44,8 +50,12 @@ def main():
     playerOne = True # If True then Human is playing white otherwise it is AI
     playerTwo = False  # Same but for Black
     AIThinking = False
-    moveFinderProcess = None
+    AISearchID = 0 # Search whose result the main loop is waiting for
+    ponderSearchID = 0 # Search running on the human's time, 0 if not pondering
+    ponderMoveID = 0 # Reply that search expects
+    ponderResult = None # Its final result if it finished before the human moved
     moveUndone = False
+    promotionChoices = [] # Promotion moves the player picks from with the next click, queen first
     while running:
         humanTurn = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
         for e in p.event.get():
@@ -57,7 +67,15 @@ def main():
                     location = p.mouse.get_pos(); # X,Y Location of mouse
                     col = location[0] // squareSize # / by int64 gives whole number
                     row = location[1] // squareSize
-                    if squareSelected == (row, col) or col >= 8: # The player clicks the same square (row, col) or user click mouse log
+                    humanMove = None
+                    if promotionChoices: # Click on a piece of the picker, anywhere else cancels the move
+                        for i, move in enumerate(promotionChoices):
+                            if getPromotionSquare(move, i) == (row, col):
+                                humanMove = move
+                        promotionChoices = []
+                        squareSelected = ()
+                        playerClicks = []
+                    elif squareSelected == (row, col) or col >= 8: # The player clicks the same square (row, col) or user click mouse log
                         squareSelected = () # Deselecting the square
                         playerClicks = [] # Clear player clicks
                     else:
@@ -68,24 +86,47 @@ def main():
                         move = ChessEngine.Move(playerClicks[0], playerClicks[1], gs.board)
                         for i in range(len(validMoves)):
                             if move == validMoves[i]:
-                                gs.makeMove(validMoves[i])
-                                animate = True
-                                moveMade = True
+                                if move.pawnPromotion: # Show the picker, the next click chooses the piece
+                                    promotionChoices = [validMove for validMove in validMoves if validMove.pawnPromotion and
+                                                        (validMove.startRow, validMove.startCol, validMove.endRow, validMove.endCol) == (move.startRow, move.startCol, move.endRow, move.endCol)]
+                                else:
+                                    humanMove = validMoves[i]
                                 squareSelected = ()  # Resets the squares
                                 playerClicks = []
-                        if not moveMade:
+                        if playerClicks:
                             playerClicks = [squareSelected]
+
+                    if humanMove is not None:
+                        gs.makeMove(humanMove)
+                        if ponderSearchID and humanMove.moveID == ponderMoveID: # Ponder hit, the worker already has this move made
+                            AISearchID = AIWorker.ponderHit()
+                            AIThinking = True
+                            if ponderResult is not None:
+                                p.event.post(ponderResult)
+                        else:
+                            if ponderSearchID:
+                                AIWorker.ponderMiss()
+                            AIWorker.makeMove(humanMove)
+                        ponderSearchID = 0
+                        animate = True
+                        moveMade = True
             # Key Handlers
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z and p.key.get_mods() & p.KMOD_CTRL: # Ctrl + Z
-                    gs.undoMove()
+                    if AIThinking:
+                        AIWorker.stop()
+                        AIThinking = False
+                    if ponderSearchID:
+                        AIWorker.ponderMiss()
+                        ponderSearchID = 0
+                    if gs.moveLog:
+                        gs.undoMove()
+                        AIWorker.undoMove()
                     moveMade = True # To recheck the validMoves can just hard code it but its easier
                     animate = False
                     gameOver = False
-                    if AIThinking:
-                        moveFinderProcess.terminate()
-                        AIThinking = False
                     moveUndone = True
+                    promotionChoices = []
 
                 if e.key == p.K_r: # Reset the board when R is press
                     gs = ChessEngine.GameState()
@@ -95,185 +136,257 @@ def main():
                     moveMade = False
                     animate = False
                     gameOver = False
-                    if AIThinking:
-                        moveFinderProcess.terminate()
-                        AIThinking = False
+                    AIWorker.newGame() # Also stops a search in progress
+                    AIThinking = False
+                    ponderSearchID = 0
                     moveUndone = True
+                    promotionChoices = []
+
+            # validMoves are still those from before a move made earlier in this batch (a ponder hit's result can come with the human's move),
+            # so the result waits for the next frame, after they are generated again
+            elif e.type == AIResultEvent and moveMade:
+                p.event.post(e)
+            # Search result, only the final result of the search we are waiting for is played
+            elif e.type == AIResultEvent:
+                if AIThinking and e.final and e.searchID == AISearchID:
+                    print("Done thinking, expected line:", e.pv)
+                    AIMove = None
+                    for move in validMoves:
+                        if move.moveID == e.moveID:
+                            AIMove = move
+                    if AIMove is None: # The worker's game is not the board's, give it the moves again and search once more
+                        print("Search result", e.moveID, "is not a valid move, resyncing the AI")
+                        AIWorker.newGame()
+                        for move in gs.moveLog:
+                            AIWorker.makeMove(move)
+                        ponderSearchID = 0
+                        AIThinking = False
+                        continue
+                    gs.makeMove(AIMove)
+                    AIWorker.makeMove(AIMove)
+                    moveMade = True
+                    animate = True
+                    AIThinking = False
+                    humanNext = (gs.whiteToMove and playerOne) or (not gs.whiteToMove and playerTwo)
+                    if pondering and humanNext and e.ponderMoveID and AIMove.moveID == e.moveID:
+                        ponderMoveID = e.ponderMoveID
+                        ponderResult = None
+                        ponderSearchID = AIWorker.ponder(ponderMoveID)
+                elif ponderSearchID and e.final and e.searchID == ponderSearchID: # Ponder search ended by itself, kept for a hit
+                    ponderResult = e
 
         # AI move finder
-        if not gameOver and not humanTurn and not moveUndone:
-            if not AIThinking:
-                AIThinking = True
-                print("Thinking...")
-                returnQueue = Queue() # Used to pass data between threads
-                moveFinderProcess = Process(target=ChessAI.findBestMove, args=(gs, validMoves, returnQueue))
-                moveFinderProcess.start() # Call findBestMove(gs, validMoves, returnQueue)
-
-            if not moveFinderProcess.is_alive():
-                print("Done thinking")
-                AIMove = returnQueue.get()
-                if AIMove is None:
-                    AIMove = ChessAI.findRandomMove(validMoves)
-                gs.makeMove(AIMove)
-                moveMade = True
-                animate = True
-                AIThinking = False
+        if not gameOver and not humanTurn and not moveUndone and not AIThinking:
+            AIThinking = True
+            print("Thinking...")
+            AISearchID = AIWorker.go()
 
         if moveMade:
             if animate:
-                animateMove(gs.moveLog[-1], screen, gs.board, clock)
+                renderer.animateMove(gs.moveLog[-1], gs.board, clock)
             validMoves = gs.getValidMoves()
             moveMade = False
             moveUndone = False
 
-        drawGameState(screen, gs, validMoves, squareSelected, moveLogFont)
-
+        endGameText = None
         if gs.checkmate or gs.stalemate:
             gameOver = True
-            drawEndGameText(screen, "Stalemate" if gs.stalemate else "Black Wins" if gs.whiteToMove else "White Wins")
+            endGameText = "Stalemate" if gs.stalemate else "Black Wins" if gs.whiteToMove else "White Wins"
+        renderer.drawGameState(gs, validMoves, squareSelected, endGameText, promotionChoices)
 
         clock.tick(maxFps)
-        p.display.flip() #Redraw the Display
-
-# Responsible for all the graphics within a current game state
-def drawGameState(screen, gs, validMoves, squareSelected, moveLogFont):
-    drawBoard(screen)
-    highlightSquares(screen, gs, validMoves, squareSelected)
-    drawPieces(screen, gs.board)
-    drawMoveLog(screen, gs, moveLogFont)
-
-# Draw the squares
-def drawBoard(screen):
-    global colors
+        renderer.update() # Redraw the changed parts of the Display
+
+    AIWorker.close()
+
+# Draws the game from cached surfaces, a frame only redraws the squares whose piece or highlights changed and the move log
+# when a move was made or undone, and only those rectangles are sent to the display
+class Renderer():
+    def __init__(self, screen, font):
+        self.screen = screen
+        self.font = font
+        self.endGameFont = p.font.SysFont("Helvitca", 32, True, False)
+        self.boardSurface = drawBoard()
+        self.overlays = { # Highlights in the order they are layered
+            "lastMove": makeOverlay("lightblue", 200),
+            "selected": makeOverlay("blue", 100),
+            "target": makeOverlay("yellow", 100),
+            "check": makeOverlay("red", 150),
+            "promotion": makeOverlay("lightgreen", 220),
+        }
+        self.squareStates = [None] * (dimension * dimension) # (piece, highlights) last drawn on every square
+        self.moveLogKey = None # (length, last move) of the move log last drawn
+        self.moveLogLines = [] # (text, surface) of every rendered move log row
+        self.endGameText = None
+        self.endGameSurfaces = None
+        self.dirtyRects = [p.Rect(0, 0, boardWidth + moveLogPanelWidth, boardHeight)] # First frame updates the whole window
+
+    # Responsible for all the graphics within a current game state
+    # promotionChoices are drawn as a picker over the promotion square and the squares next to it toward the middle of the board
+    def drawGameState(self, gs, validMoves, squareSelected, endGameText=None, promotionChoices=()):
+        if endGameText != self.endGameText: # The text covers the middle of the board, redraw it all
+            self.endGameText = endGameText
+            self.endGameSurfaces = self.renderEndGameText(endGameText) if endGameText is not None else None
+            self.invalidate()
+        highlights = self.highlightSquares(gs, validMoves, squareSelected)
+        board = gs.board.tolist() # Python strings, much faster to index than the numpy array
+        for i, move in enumerate(promotionChoices):
+            r, c = getPromotionSquare(move, i)
+            board[r][c] = move.pieceMoved[0] + move.promotionPiece
+            highlights[(r, c)] = ("promotion",)
+        boardChanged = False
+        for r in range(dimension):
+            for c in range(dimension):
+                state = (board[r][c], highlights.get((r, c), ()))
+                if state != self.squareStates[r*8 + c]:
+                    self.squareStates[r*8 + c] = state
+                    self.drawSquare(r, c, state)
+                    boardChanged = True
+        if boardChanged and self.endGameSurfaces is not None:
+            self.drawEndGameText()
+        self.drawMoveLog(gs)
+
+    # Sends the rectangles drawn since the last update to the display
+    def update(self):
+        if self.dirtyRects:
+            p.display.update(self.dirtyRects)
+            self.dirtyRects = []
+
+    # Every square is redrawn on the next frame
+    def invalidate(self):
+        self.squareStates = [None] * (dimension * dimension)
+
+    # Highlight names on every highlighted square: last move, square selected and moves for pieces selected, king in check and its attackers
+    def highlightSquares(self, gs, validMoves, squareSelected):
+        highlights = {}
+        if gs.moveLog:
+            lastMove = gs.moveLog[-1]
+            highlights[(lastMove.startRow, lastMove.startCol)] = ("lastMove",)
+            highlights[(lastMove.endRow, lastMove.endCol)] = ("lastMove",)
+        if squareSelected != ():
+            r, c = squareSelected
+            if gs.board[r, c][0] == ('w' if gs.whiteToMove else 'b'): # squareSelected is a piece that can be moved
+                highlights[(r, c)] = highlights.get((r, c), ()) + ("selected",)
+                for move in validMoves:
+                    if move.startRow == r and move.startCol == c:
+                        highlights[(move.endRow, move.endCol)] = highlights.get((move.endRow, move.endCol), ()) + ("target",)
+        # Potential bug if a discover check occurs because of phantom king
+        if gs.inCheck:
+            kingLocation = gs.whiteKingLocation if gs.whiteToMove else gs.blackKingLocation
+            for square in [kingLocation] + [(check[0], check[1]) for check in gs.checks]:
+                highlights[square] = highlights.get(square, ()) + ("check",)
+        return highlights
+
+    def drawSquare(self, r, c, state):
+        piece, highlights = state
+        square = p.Rect(c*squareSize, r*squareSize, squareSize, squareSize)
+        self.screen.blit(self.boardSurface, square, square)
+        for highlight in highlights:
+            self.screen.blit(self.overlays[highlight], square)
+        if piece != "--":
+            self.screen.blit(images[piece], square)
+        self.dirtyRects.append(square)
+
+    # Draw move log, rows whose text didn't change keep their rendered surface
+    def drawMoveLog(self, gs):
+        moveLog = gs.moveLog
+        moveLogKey = (len(moveLog), moveLog[-1] if moveLog else None)
+        if self.moveLogKey is not None and moveLogKey[0] == self.moveLogKey[0] and moveLogKey[1] is self.moveLogKey[1]:
+            return
+        self.moveLogKey = moveLogKey
+        moveTexts = []
+        for i in range(0, len(moveLog), 2):
+            moveString = str(i//2 + 1) + ". " + str(moveLog[i]) + " "
+            if i + 1 < len(moveLog): # Make sure black made a move
+                moveString += str(moveLog[i+1])
+            moveTexts.append(moveString)
+
+        movesPerRow = 3
+        padding = 5
+        lineSpacing = 2
+        lines = []
+        for i in range(0, len(moveTexts), movesPerRow):
+            text = "".join(moveText + "  " for moveText in moveTexts[i:i + movesPerRow])
+            row = len(lines)
+            if row < len(self.moveLogLines) and self.moveLogLines[row][0] == text:
+                lines.append(self.moveLogLines[row])
+            else:
+                lines.append((text, self.font.render(text, True, p.Color("White"))))
+        self.moveLogLines = lines
+
+        moveLogRect = p.Rect(boardWidth, 0, moveLogPanelWidth, moveLogPanelHeight)
+        p.draw.rect(self.screen, p.Color("Black"), moveLogRect)
+        textY = padding
+        for text, textObject in lines:
+            self.screen.blit(textObject, moveLogRect.move(padding, textY))
+            textY += textObject.get_height() + lineSpacing
+        self.dirtyRects.append(moveLogRect)
+
+    # Animating a move, the board without the moving piece is drawn once and every frame only restores and redraws the piece's old and new squares
+    def animateMove(self, move, board, clock):
+        dR = move.endRow - move.startRow
+        dC = move.endCol - move.startCol
+        fpSquare = 10 # Frames to move 1 square
+        frameCount = (abs(dR) + abs(dC)) * fpSquare
+        background = self.boardSurface.copy()
+        board = board.tolist()
+        for r in range(dimension):
+            for c in range(dimension):
+                piece = board[r][c]
+                if piece != "--" and (r, c) != (move.endRow, move.endCol): # Erase the piece moved from it's ending square
+                    background.blit(images[piece], (c*squareSize, r*squareSize))
+        # Draw captured piece onto the rectangle
+        if move.pieceCaptured != '--':
+            capturedRow = move.endRow
+            if move.enPassant:
+                capturedRow = move.endRow + 1 if move.pieceCaptured == 'bP' else move.endRow - 1
+            background.blit(images[move.pieceCaptured], (move.endCol*squareSize, capturedRow*squareSize))
+        boardRect = p.Rect(0, 0, boardWidth, boardHeight)
+        self.screen.blit(background, boardRect)
+        p.display.update(boardRect)
+        pieceRect = None
+        for frame in range(frameCount+1):
+            r, c = (move.startRow + dR*frame/frameCount, move.startCol + dC*frame/frameCount)
+            # Draw moving piece for each frame
+            newRect = p.Rect(round(c*squareSize), round(r*squareSize), squareSize, squareSize)
+            if pieceRect is not None:
+                self.screen.blit(background, pieceRect, pieceRect)
+            self.screen.blit(images[move.pieceMoved], newRect)
+            p.display.update(newRect.union(pieceRect) if pieceRect is not None else newRect)
+            pieceRect = newRect
+            clock.tick(120)
+        self.invalidate() # The highlights go back on with the next frame
+
+    def renderEndGameText(self, text):
+        return self.endGameFont.render(text, False, p.Color("Gray")), self.endGameFont.render(text, False, p.Color("Black"))
+
+    def drawEndGameText(self):
+        shadow, textObject = self.endGameSurfaces
+        textLocation = p.Rect(0, 0, boardWidth, boardHeight).move(boardWidth / 2 - textObject.get_width() / 2, boardHeight / 2 - textObject.get_height() / 2)
+        self.screen.blit(shadow, textLocation)
+        self.screen.blit(textObject, textLocation.move(-2,-2))
+        self.dirtyRects.append(textLocation.move(-2, -2).union(textLocation))
+
+# Draw the squares once onto a surface the renderer copies squares from
+def drawBoard():
     colors = [p.Color("white"), p.Color("gray")]
+    surface = p.Surface((boardWidth, boardHeight))
     for r in range(dimension):
         for c in range(dimension):
             color = colors[(r+c) % 2]
-            p.draw.rect(screen, color, p.Rect(c*squareSize, r*squareSize , squareSize, squareSize))
-
-# Highlight square selected and moves for pieces selected
-def highlightSquares(screen, gs, validMoves, squareSelected):
-    # Highlight last move made
-    if gs.moveLog:
-        lastMove = gs.moveLog[-1]
-        s = p.Surface((squareSize, squareSize))
-        s.set_alpha(200)  # Transperancy calue 0 is transparent 255 is opaque
-        s.fill(p.Color("lightblue"))  # Highlight color for last move
-        # Highlight start square
-        startSquare = p.Rect(lastMove.startCol * squareSize, lastMove.startRow * squareSize, squareSize, squareSize)
-        screen.blit(s, startSquare)
-        # Highlight end square
-        endSquare = p.Rect(lastMove.endCol * squareSize, lastMove.endRow * squareSize, squareSize, squareSize)
-        screen.blit(s, endSquare)
-
-    if squareSelected != ():
-        r, c = squareSelected
-        if gs.board[r][c][0] == ('w' if gs.whiteToMove else 'b'): # squareSelected is a piece that can be moved
-            # Highlight squareSelected
-            s = p.Surface((squareSize, squareSize))
-            s.set_alpha(100) # Transperancy calue 0 is transparent 255 is opaque
-            s.fill(p.Color("blue"))
-            screen.blit(s, (c*squareSize, r*squareSize))
-
-            # Highlight moves from that square
-            s.fill(p.Color("yellow"))
-            for move in validMoves:
-                if move.startRow == r and move.startCol == c:
-                    screen.blit(s, (move.endCol*squareSize, move.endRow*squareSize))
-
-    # Potential bug if a discover check occurs because of phantom king
-    if gs.inCheck:
-        s = p.Surface((squareSize, squareSize))
-        s.set_alpha(150)  # Slightly more opaque for emphasis
-        s.fill(p.Color("red"))  # Highlight color for the king in check
-
-        # Highlight the king in check
-        kingLocation = gs.whiteKingLocation if gs.whiteToMove else gs.blackKingLocation
-        kingSquare = p.Rect(kingLocation[1] * squareSize, kingLocation[0] * squareSize, squareSize, squareSize)
-        screen.blit(s, kingSquare)
-
-        # Highlight the attacker
-        for check in gs.checks:
-            checkRow = check[0]
-            checkCol = check[1]
-            attackerSquare = p.Rect(checkCol * squareSize, checkRow * squareSize, squareSize, squareSize)
-            screen.blit(s, attackerSquare)
-
-# Draw the pieces on the board using the current Gamestate.board
-def drawPieces(screen, board):
-    for r in range(dimension):
-        for c in range(dimension):
-            piece = board[r, c]
-            if piece != "--":
-                screen.blit(images[piece], p.Rect(c*squareSize, r*squareSize , squareSize, squareSize))
-
-# Draw move log
-def drawMoveLog(screen, gs, font):
-    moveLogRect = p.Rect(boardWidth, 0, moveLogPanelWidth, moveLogPanelHeight)
-    p.draw.rect(screen, p.Color("Black"), moveLogRect)
-    moveLog = gs.moveLog
-    moveTexts = []
-
-    for i in range(0, len(moveLog), 2):
-        moveString = str(i//2 + 1) + ". " + str(moveLog[i]) + " "
-        if i + 1 < len(moveLog): # Make sure black made a move
-            moveString += str(moveLog[i+1])
-        moveTexts.append(moveString)
-
-
-    movesPerRow = 3
-    padding = 5
-    lineSpacing = 2
-    textY = padding
-
-    for i in range(0, len(moveTexts), movesPerRow):
-        text = ""
-        for j in range(movesPerRow):
-            if i + j < len(moveTexts):
-                text += moveTexts[i+j] + "  "
-        textObject = font.render(text, True, p.Color("White"))
-        textLocation = moveLogRect.move(padding, textY)
-        screen.blit(textObject, textLocation)
-        textY += textObject.get_height() + lineSpacing
-
-# Animating a move
-def animateMove(move, screen, board, clock):
-    global colors
-    dR = move.endRow - move.startRow
-    dC = move.endCol - move.startCol
-    fpSquare = 10 # Frames to move 1 square
-    frameCount = (abs(dR) + abs(dC)) * fpSquare
-    for frame in range(frameCount+1):
-        r, c = (move.startRow + dR*frame/frameCount, move.startCol + dC*frame/frameCount)
-        drawBoard(screen)
-        drawPieces(screen, board)
-        # Erase the piece moved from it's ending square
-        color = colors[(move.endRow + move.endCol) % 2]
-        endSquare = p.Rect(move.endCol*squareSize, move.endRow*squareSize, squareSize, squareSize)
-        p.draw.rect(screen, color, endSquare)
-
-        # Draw captured piece onto the rectangle
-        if move.pieceCaptured != '--':
-            if move.enPassant:
-                enPassantRow = move.endRow + 1 if move.pieceCaptured == 'bP' else move.endRow - 1
-                endSquare = p.Rect(move.endCol * squareSize, enPassantRow * squareSize, squareSize, squareSize)
-            screen.blit(images[move.pieceCaptured], endSquare)
-
-        # Draw moving piece for each frame
-        screen.blit(images[move.pieceMoved], p.Rect(c*squareSize, r*squareSize , squareSize, squareSize))
-
-        # Highlight the last move made
-
-        p.display.flip()
-        clock.tick(120)
-
-def drawEndGameText(screen, text):
-    font = p.font.SysFont("Helvitca", 32, True, False)
-    textObject = font.render(text, False, p.Color("Gray"))
-    textLocation = p.Rect(0, 0, boardWidth, boardHeight).move(boardWidth / 2 - textObject.get_width() / 2, boardHeight / 2 - textObject.get_height() / 2)
-    screen.blit(textObject, textLocation)
-    textObject = font.render(text, False, p.Color("Black"))
-    screen.blit(textObject, textLocation.move(-2,-2))
+            p.draw.rect(surface, color, p.Rect(c*squareSize, r*squareSize , squareSize, squareSize))
+    return surface
+
+# Square the picker shows the i-th promotion choice on, counted from the promotion square toward the middle of the board
+def getPromotionSquare(move, i):
+    return (move.endRow + i if move.endRow == 0 else move.endRow - i, move.endCol)
+
+# Square sized highlight, alpha 0 is transparent 255 is opaque
+def makeOverlay(color, alpha):
+    s = p.Surface((squareSize, squareSize))
+    s.set_alpha(alpha)
+    s.fill(p.Color(color))
+    return s
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
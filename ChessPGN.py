@@ -0,0 +1,175 @@
+"""
+PGN reader and game replayer, for importing and checking large PGN archives.
+Games are read one at a time from the file and every SAN move is matched against the valid moves of its piece to its end square,
+a game with a move that doesn't match exactly one valid move, or whose result doesn't fit the final position, is flagged.
+With more than one worker the games are sent to a process pool in chunks, only a bounded number of chunks is read ahead.
+Run: python ChessPGN.py games.pgn [--workers N] [--chunk GAMES] [--backend array|bitboard] [--out FILE] [--all]
+"""
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import re
+import signal
+import sys
+import time
+import ChessEngine
+
+replayProcesses = os.cpu_count() or 1
+chunkGames = 200 # Games sent to a pool process at once, big enough that sending them costs little next to replaying them
+inFlightPerProcess = 4 # Chunks handed to the pool per process before the oldest result is waited for
+resultTokens = ("1-0", "0-1", "1/2-1/2", "*")
+
+tagPattern = re.compile(r'\[\s*(\w+)\s+"(.*)"\s*\]')
+commentPattern = re.compile(r"\{[^}]*\}|;[^\n]*")
+variationPattern = re.compile(r"\([^()]*\)") # Innermost variation, removed until none are left
+moveNumberPattern = re.compile(r"^\d+\.+")
+
+def newGameState(backend, fen=None):
+    if backend == "bitboard":
+        import ChessBitboard
+        return ChessBitboard.GameState(fen)
+    return ChessEngine.GameState(fen)
+
+# (gameNumber, tags, movetext) for every game in a PGN file, read line by line so the file is never in memory whole
+# The movetext keeps its line breaks, a ; comment only runs to the end of its line
+def readGames(file):
+    number = 0
+    tags = {}
+    movetext = []
+    lastLineBlank = False
+    for line in file:
+        line = line.strip()
+        if line.startswith("["):
+            if movetext or (tags and lastLineBlank): # Tags after the moves or a blank line start the next game
+                number += 1
+                yield number, tags, "\n".join(movetext)
+                tags, movetext = {}, []
+            match = tagPattern.match(line)
+            if match:
+                tags[match.group(1)] = match.group(2)
+        elif line and not line.startswith("%"): # % lines are escaped, for other programs
+            movetext.append(line)
+        lastLineBlank = not line
+    if tags or movetext:
+        number += 1
+        yield number, tags, "\n".join(movetext)
+
+# SAN moves of the movetext and its result token (None if it has none), comments, variations, move numbers and NAGs left out
+def getMoveTokens(movetext):
+    movetext = commentPattern.sub(" ", movetext)
+    while "(" in movetext:
+        stripped = variationPattern.sub(" ", movetext)
+        if stripped == movetext: # Unbalanced, drop the rest
+            stripped = movetext[:movetext.index("(")]
+        movetext = stripped
+    moves = []
+    for token in movetext.split():
+        token = moveNumberPattern.sub("", token) # 12.e4 as well as 12. e4 and 12... e5
+        if token in resultTokens:
+            return moves, token
+        if token and not token.startswith("$"):
+            moves.append(token)
+    return moves, None
+
+# Plays the game's moves from its start position, returns a dict with the game's number, players, plies and an error if it is flagged
+def replayGame(number, tags, movetext, backend="bitboard"):
+    result = {"game": number, "white": tags.get("White", "?"), "black": tags.get("Black", "?"), "result": tags.get("Result", "*"), "plies": 0}
+    try:
+        gs = newGameState(backend, tags.get("FEN"))
+    except (ValueError, KeyError, IndexError) as error:
+        result["error"] = "bad FEN tag: " + str(error)
+        return result
+    moves, resultToken = getMoveTokens(movetext)
+    for ply, san in enumerate(moves):
+        move = gs.getMoveFromSAN(san) # Generates only the moves to the SAN's end square
+        if move is None:
+            result["error"] = f"illegal move {san} at ply {ply + 1}"
+            result["fen"] = gs.getFEN()
+            return result
+        gs.makeMove(move)
+        result["plies"] = ply + 1
+    gs.getValidMoves() # Sets checkmate and stalemate for the result check
+    if resultToken is not None and "Result" in tags and resultToken != tags["Result"]:
+        result["error"] = f"result {resultToken} after the moves does not match the Result tag {tags['Result']}"
+    elif gs.checkmate and result["result"] != ("0-1" if gs.whiteToMove else "1-0"):
+        result["error"] = "result " + result["result"] + " after checkmate"
+    elif gs.stalemate and result["result"] != "1/2-1/2":
+        result["error"] = "result " + result["result"] + " after stalemate"
+    return result
+
+def replayChunk(games, backend):
+    return [replayGame(number, tags, movetext, backend) for number, tags, movetext in games]
+
+# Pool process setup, builds the bitboard tables once instead of in the first chunk
+def initReplayProcess(backend):
+    if backend == "bitboard":
+        import ChessBitboard
+
+# Yields the result of every game ((number, tags, movetext) triples) in order
+# With more than one process at most processes * inFlightPerProcess chunks are submitted and not yet yielded
+def replayGames(games, processes=replayProcesses, backend="bitboard", chunkSize=chunkGames):
+    if processes <= 1:
+        for number, tags, movetext in games:
+            yield replayGame(number, tags, movetext, backend)
+        return
+    pool = concurrent.futures.ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"),
+                                                  initializer=initReplayProcess, initargs=(backend,))
+    try:
+        pending = collections.deque()
+        games = iter(games)
+        while True:
+            chunk = list(itertools.islice(games, chunkSize))
+            if not chunk:
+                break
+            pending.append(pool.submit(replayChunk, chunk, backend))
+            if len(pending) >= processes * inFlightPerProcess:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True) # Stopped early (closed, interrupted) the chunks not started yet are dropped
+
+# Replays a whole file, writes the flagged games (every game with writeAll) to out as JSON lines
+# Returns the number of games, flagged games and plies
+def replayFile(path, out, processes=replayProcesses, backend="bitboard", chunkSize=chunkGames, writeAll=False):
+    games = flagged = plies = 0
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for result in replayGames(readGames(file), processes, backend, chunkSize):
+            games += 1
+            plies += result["plies"]
+            if "error" in result:
+                flagged += 1
+            if writeAll or "error" in result:
+                out.write(json.dumps(result) + "\n")
+    return games, flagged, plies
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay and check every game of a PGN file")
+    parser.add_argument("path", help="PGN file")
+    parser.add_argument("--workers", type=int, default=replayProcesses, help="replay processes")
+    parser.add_argument("--chunk", type=int, default=chunkGames, help="games per chunk sent to a process")
+    parser.add_argument("--backend", choices=("array", "bitboard"), default="bitboard")
+    parser.add_argument("--out", default=None, help="JSON lines file for the flagged games, standard output if not given")
+    parser.add_argument("--all", action="store_true", help="write every game, not only the flagged ones")
+    args = parser.parse_args()
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1)) # Unwind so the pool is shut down instead of left running
+    out = open(args.out, "w") if args.out is not None else sys.stdout
+    start = time.perf_counter()
+    try:
+        games, flagged, plies = replayFile(args.path, out, args.workers, args.backend, args.chunk, args.all)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    seconds = time.perf_counter() - start
+    megabytes = os.path.getsize(args.path) / 1e6
+    print(f"{games} games  {flagged} flagged  {plies} plies in {seconds:.1f}s  {games / seconds:.1f} games/s  "
+          f"{plies / seconds:.0f} plies/s  {megabytes / seconds:.2f} MB/s", file=sys.stderr)
+    sys.exit(1 if flagged else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Perft, counts the leaf nodes of the legal move tree to a fixed depth.
+Checked against known counts it is the regression test for getValidMoves, timed it is the move generator benchmark.
+Run: python ChessPerft.py [--backend array|bitboard] [--depth N] [--fen FEN [--divide]]
+"""
+
+import argparse
+import sys
+import time
+import ChessEngine
+
+# Standard positions with their known node counts per depth
+standardPositions = [
+    ("Start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     {1: 20, 2: 400, 3: 8902, 4: 197281, 5: 4865609}),
+    ("Kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1", # Castling, pins, enPassant
+     {1: 48, 2: 2039, 3: 97862, 4: 4085603}),
+    ("Rook endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", # EnPassant discovering a check along the rank
+     {1: 14, 2: 191, 3: 2812, 4: 43238, 5: 674624}),
+    ("Promotions", "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1", # Checks and pinned pieces, promotions from depth 2
+     {1: 6, 2: 264, 3: 9467, 4: 422333}),
+    ("Underpromotion", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8", # Promotions with capture at depth 1
+     {1: 44, 2: 1486, 3: 62379, 4: 2103487}),
+    ("Middlegame", "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+     {1: 46, 2: 2079, 3: 89890}),
+]
+
+def newGameState(backend):
+    if backend == "bitboard":
+        import ChessBitboard
+        return ChessBitboard.GameState()
+    return ChessEngine.GameState()
+
+def perft(gs, depth):
+    moves = gs.getValidMoves()
+    if depth == 1:
+        return len(moves) # Bulk count, no need to make the last moves
+    nodes = 0
+    for move in moves:
+        gs.makeMove(move)
+        nodes += perft(gs, depth - 1)
+        gs.undoMove()
+    return nodes
+
+def getMoveName(move):
+    return move.getUCINotation() # Promotions need the piece, the four of them are different moves
+
+# Node count below every root move, compare with another engine's divide to find the move that is wrong
+def divide(gs, depth):
+    counts = {}
+    for move in gs.getValidMoves():
+        gs.makeMove(move)
+        counts[getMoveName(move)] = perft(gs, depth - 1) if depth > 1 else 1
+        gs.undoMove()
+    return counts
+
+def timedPerft(gs, depth):
+    start = time.perf_counter()
+    nodes = perft(gs, depth)
+    seconds = time.perf_counter() - start
+    return nodes, seconds, nodes / seconds if seconds > 0 else 0.0
+
+# Runs every standard position up to maxDepth (and maxNodes expected nodes), returns True if all counts match
+def runSuite(backend="array", maxDepth=4, maxNodes=200000, out=sys.stdout):
+    allPassed = True
+    totalNodes = 0
+    totalSeconds = 0.0
+    for name, fen, expected in standardPositions:
+        for depth in sorted(expected):
+            if depth > maxDepth or expected[depth] > maxNodes:
+                break
+            gs = newGameState(backend)
+            gs.loadFEN(fen)
+            nodes, seconds, nps = timedPerft(gs, depth)
+            passed = nodes == expected[depth]
+            allPassed = allPassed and passed
+            totalNodes += nodes
+            totalSeconds += seconds
+            print(f"{name:14} depth {depth}  {nodes:>9} nodes  {seconds:7.2f}s  {nps:>9.0f} nps  " +
+                  ("OK" if passed else "FAIL expected " + str(expected[depth])), file=out)
+    print(f"Total {totalNodes} nodes in {totalSeconds:.2f}s, {totalNodes / totalSeconds if totalSeconds else 0:.0f} nps", file=out)
+    return allPassed
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft move generator test and benchmark")
+    parser.add_argument("--backend", choices=("array", "bitboard"), default="array")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--max-nodes", type=int, default=200000, help="skip suite depths with more nodes than this")
+    parser.add_argument("--fen", help="run one position instead of the suite")
+    parser.add_argument("--divide", action="store_true", help="print the node count below every root move")
+    args = parser.parse_args()
+
+    if args.fen is None:
+        sys.exit(0 if runSuite(args.backend, args.depth, args.max_nodes) else 1)
+
+    gs = newGameState(args.backend)
+    gs.loadFEN(args.fen)
+    if args.divide:
+        start = time.perf_counter()
+        counts = divide(gs, args.depth)
+        seconds = time.perf_counter() - start
+        for moveName in sorted(counts):
+            print(moveName + ":", counts[moveName])
+        nodes = sum(counts.values())
+        print(f"Nodes {nodes}  {seconds:.2f}s  {nodes / seconds if seconds else 0:.0f} nps")
+    else:
+        nodes, seconds, nps = timedPerft(gs, args.depth)
+        print(f"Nodes {nodes}  {seconds:.2f}s  {nps:.0f} nps")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Asyncio game server, hosts many games at once over TCP on localhost.
+Every request and reply is one line of JSON. Moves are checked against getValidMoves and the AI's replies are searched in a bounded process pool,
+every game has its own AI time budget, and when too many searches are waiting the server answers busy instead of queueing without limit.
+Run: python ChessServer.py [--port N] [--workers N] [--move-time SECONDS] [--game-time SECONDS]
+
+Requests: {"cmd": "new", "color": "w"}             -> {"ok": true, "game": id, "moves": [the AI's move if it plays white], "legalMoves": [...], "status": "playing"}
+          {"cmd": "move", "game": id, "move": "e2e4"} -> {"ok": true, "moves": ["e2e4", the AI's reply], "legalMoves": [...], "status": ...}
+          {"cmd": "close", "game": id}             -> {"ok": true}
+Moves are in UCI notation (e2e4, e7e8q), status is "playing", "checkmate" or "stalemate". Errors are {"ok": false, "error": "..."},
+a move answered with "busy" was not made and can be sent again.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import time
+import ChessAI
+import ChessEngine
+
+serverHost = "127.0.0.1"
+serverPort = 8765
+searchProcesses = os.cpu_count() or 1
+moveTimeLimit = 0.5 # Most AI time for one move
+gameTimeBudget = 30.0 # AI time for a whole game, every move gets an even share of what is left over budgetMovesToGo moves
+budgetMovesToGo = 20
+minMoveTime = 0.01 # Time a move still gets once the game's budget is spent
+waitingSearchesPerProcess = 16 # Searches that may wait for a pool process before moves are answered busy
+
+class GameSession():
+    def __init__(self, gameID, aiColor):
+        self.gameID = gameID
+        self.gs = ChessEngine.GameState()
+        self.aiColor = aiColor # Color the AI plays, "w" or "b"
+        self.moveNames = [] # UCI names of the moves made, the pool process replays them
+        self.aiTimeLeft = gameTimeBudget
+        self.lock = asyncio.Lock() # One move at a time even if two connections play the same game
+        self.updateValidMoves()
+
+    def updateValidMoves(self):
+        self.validMoves = {move.getUCINotation(): move for move in self.gs.getValidMoves()}
+
+    def makeMove(self, name):
+        self.gs.makeMove(self.validMoves[name])
+        self.moveNames.append(name)
+        self.updateValidMoves()
+
+    def getStatus(self):
+        return "checkmate" if self.gs.checkmate else "stalemate" if self.gs.stalemate else "playing"
+
+    def isAITurn(self):
+        return self.getStatus() == "playing" and self.aiColor == ("w" if self.gs.whiteToMove else "b")
+
+    def getReply(self, moves):
+        return {"ok": True, "game": self.gameID, "moves": moves, "legalMoves": sorted(self.validMoves), "status": self.getStatus()}
+
+class GameServer():
+    def __init__(self, processes=searchProcesses, moveTime=moveTimeLimit):
+        self.moveTime = moveTime
+        # Spawned, a forked process would inherit the listening socket and the pool's pipes and outlive the server
+        self.pool = concurrent.futures.ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"),
+                                                           initializer=initSearchProcess, initargs=(ChessAI.getSearchSettings(),))
+        self.searchSlots = asyncio.Semaphore(processes) # Searches handed to the pool, the rest wait here where they can be counted
+        self.waitingSearches = 0
+        self.maxWaitingSearches = processes * waitingSearchesPerProcess
+        self.games = {}
+        self.gameIDs = itertools.count(1)
+
+    # One client, requests are answered in order, while a request waits on a search no more of its input is read (TCP backpressure)
+    # Games the connection created are closed when it goes away
+    async def handleConnection(self, reader, writer):
+        ownGames = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    reply = await self.handleRequest(json.loads(line), ownGames)
+                except (ValueError, KeyError, TypeError, AttributeError) as error:
+                    reply = {"ok": False, "error": "bad request: " + repr(error)}
+                writer.write((json.dumps(reply) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for gameID in ownGames:
+                self.games.pop(gameID, None)
+            writer.close()
+
+    async def handleRequest(self, request, ownGames):
+        command = request["cmd"]
+        if command == "new":
+            color = request.get("color", "w")
+            if color not in ("w", "b"):
+                return {"ok": False, "error": "color must be w or b"}
+            session = GameSession(next(self.gameIDs), "b" if color == "w" else "w")
+            self.games[session.gameID] = session
+            ownGames.add(session.gameID)
+            async with session.lock:
+                moves = []
+                if session.isAITurn():
+                    moves.append(await self.playAIMove(session)) # Nothing to take back, so a new game waits instead of being busy
+                return session.getReply(moves)
+        session = self.games.get(request.get("game"))
+        if session is None:
+            return {"ok": False, "error": "no such game"}
+        if command == "move":
+            async with session.lock:
+                name = request["move"]
+                if session.isAITurn() or name not in session.validMoves:
+                    return {"ok": False, "error": "illegal move " + str(name)}
+                session.makeMove(name)
+                moves = [name]
+                if session.isAITurn():
+                    if self.waitingSearches >= self.maxWaitingSearches: # Take the move back, the client sends it again later
+                        session.gs.undoMove()
+                        session.moveNames.pop()
+                        session.updateValidMoves()
+                        return {"ok": False, "error": "busy"}
+                    moves.append(await self.playAIMove(session))
+                return session.getReply(moves)
+        if command == "close":
+            self.games.pop(session.gameID, None)
+            ownGames.discard(session.gameID)
+            return {"ok": True}
+        return {"ok": False, "error": "unknown command " + str(command)}
+
+    # Searches the AI's move in the pool with its share of the game's budget and makes it, returns its name
+    async def playAIMove(self, session):
+        timeLimit = max(min(self.moveTime, session.aiTimeLeft / budgetMovesToGo), minMoveTime)
+        self.waitingSearches += 1
+        try:
+            async with self.searchSlots:
+                name, seconds = await asyncio.get_running_loop().run_in_executor(self.pool, searchMove, list(session.moveNames), timeLimit)
+        finally:
+            self.waitingSearches -= 1
+        session.aiTimeLeft -= seconds
+        session.makeMove(name)
+        return name
+
+    def close(self):
+        self.pool.shutdown(cancel_futures=True)
+
+# Pool process setup, the settings come from the server process since the pool may not share its globals (spawn start method)
+def initSearchProcess(settings):
+    vars(ChessAI).update(settings)
+    ChessAI.searchWorkers = 1 # The pool already uses every core
+
+# Runs in a pool process, returns the UCI name of the AI's move after moveNames from the start position and the seconds it took
+def searchMove(moveNames, timeLimit):
+    start = time.perf_counter()
+    gs = ChessEngine.GameState()
+    for name in moveNames:
+        gs.makeMove(next(move for move in gs.getValidMoves() if move.getUCINotation() == name))
+    validMoves = gs.getValidMoves()
+    ChessAI.findBestMove(gs, validMoves, queue.Queue(), timeLimit)
+    move = ChessAI.nextMove if ChessAI.nextMove is not None else ChessAI.findRandomMove(validMoves)
+    return move.getUCINotation(), time.perf_counter() - start
+
+async def serve(host, port, processes, moveTime):
+    server = GameServer(processes, moveTime)
+    listener = await asyncio.start_server(server.handleConnection, host, port, backlog=1024)
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, listener.close) # Stop serving, the pool is shut down below
+    print(f"Serving on {host}:{port} with {processes} search processes", flush=True)
+    try:
+        await listener.serve_forever()
+    except asyncio.CancelledError:
+        pass
+    finally:
+        server.close()
+
+def main():
+    global gameTimeBudget
+    parser = argparse.ArgumentParser(description="Asyncio server hosting many games")
+    parser.add_argument("--host", default=serverHost)
+    parser.add_argument("--port", type=int, default=serverPort)
+    parser.add_argument("--workers", type=int, default=searchProcesses, help="search processes")
+    parser.add_argument("--move-time", type=float, default=moveTimeLimit, help="most AI seconds per move")
+    parser.add_argument("--game-time", type=float, default=gameTimeBudget, help="AI seconds per game")
+    args = parser.parse_args()
+    gameTimeBudget = args.game_time
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.move_time))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+"""
+Headless self-play tournament between two engine configurations, for testing evaluation and search changes.
+Games are played in a process pool, one game per process at a time, in pairs that start from the same random opening with
+the colors swapped. Games are ended early by adjudication rules and appended to a PGN file as they finish, the Elo difference
+of the first engine is printed with its 95% error margin after every game.
+Run it again with the same arguments to carry on a stopped tournament, the games already in the PGN file are not played again.
+Run: python ChessTournament.py --engine name=base --engine name=test,depth=4,useNullMove=false [--games N] [--pgn FILE] [--workers N]
+
+Engine options are comma separated key=value pairs: name, time (seconds per move), depth, nodes, eval (a JSON file with
+pieceScore and/or piecePositionScores replacing the tables in ChessEvaluation) and any setting of ChessAI.getSearchSettings.
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import queue
+import random
+import signal
+import sys
+import ChessAI
+import ChessEngine
+import ChessEvaluation
+
+tournamentProcesses = os.cpu_count() or 1
+moveTimeLimit = 0.1 # Seconds per move for an engine given no time, depth or nodes
+openingPlies = 8 # Random moves played before the engines take over
+openingMaxImbalance = 1 # Pawns of material, a random opening further from equal than this is drawn again
+maxGamePlies = 400 # Longer games are drawn
+resignScore = 6.0 # Pawns, a game is won when every engine score of the last resignPlies plies is at least this for the same side
+resignPlies = 8
+drawScore = 0.2 # Pawns, a game is drawn when every engine score of the last drawPlies plies is within this of equal
+drawPlies = 16
+drawMinPlies = 80 # No draw adjudication before this ply
+gamesInFlightPerProcess = 2 # Games handed to the pool per process, enough to keep every process busy
+pgnLineLength = 79
+
+# One configuration as the pool processes need it: ChessAI and ChessEvaluation globals (all of them, so nothing of the other engine is left over) and the budget
+def makeEngine(name, settings, evaluation, timeLimit, nodeLimit):
+    return {"name": name, "settings": settings, "evaluation": evaluation, "timeLimit": timeLimit, "nodeLimit": nodeLimit}
+
+# Engine from "name=test,depth=4,eval=tables.json,useNullMove=false"
+def parseEngine(text):
+    settings = ChessAI.getSearchSettings()
+    settings.update(searchWorkers=1, collectSearchStats=False, searchStatsFile=None) # The pool already uses every core
+    evaluation = {"pieceScore": ChessEvaluation.pieceScore, "piecePositionScores": ChessEvaluation.piecePositionScores}
+    options = dict(option.split("=", 1) for option in text.split(",") if option)
+    name = options.pop("name", None)
+    if not name:
+        raise ValueError("engine needs a name: " + text)
+    timeLimit = float(options.pop("time")) if "time" in options else None
+    nodeLimit = int(options.pop("nodes")) if "nodes" in options else None
+    if "depth" in options:
+        settings["maxSearchDepth"] = int(options.pop("depth"))
+    if timeLimit is None:
+        timeLimit = float("inf") if nodeLimit is not None or settings["maxSearchDepth"] != ChessAI.maxSearchDepth else moveTimeLimit
+    if "eval" in options:
+        with open(options.pop("eval")) as file:
+            tables = json.load(file)
+        evaluation["pieceScore"] = {**ChessEvaluation.pieceScore, **tables.get("pieceScore", {})}
+        evaluation["piecePositionScores"] = {**ChessEvaluation.piecePositionScores, **tables.get("piecePositionScores", {})}
+    for key, value in options.items():
+        if key not in settings and key not in evaluation:
+            raise ValueError("unknown engine option " + key)
+        target = settings if key in settings else evaluation
+        try:
+            target[key] = json.loads(value)
+        except ValueError:
+            target[key] = value # Plain strings like searchBackend=array
+    return makeEngine(name, settings, evaluation, timeLimit, nodeLimit)
+
+# Pool process globals, set by initTournamentProcess
+tournamentEngines = None
+tournamentSeed = 0
+evaluationEngine = None # Name of the engine whose evaluation tables are built
+
+def initTournamentProcess(engines, seed):
+    global tournamentEngines, tournamentSeed
+    tournamentEngines = engines
+    tournamentSeed = seed
+    if any(engine["settings"]["searchBackend"] == "bitboard" for engine in engines):
+        import ChessBitboard # Build the bitboard tables now instead of on the clock of the first move
+
+# Makes engine the one ChessAI searches with, the running board score is summed again if the evaluation tables change
+def applyEngine(engine, gs):
+    global evaluationEngine
+    vars(ChessAI).update(engine["settings"])
+    if evaluationEngine != engine["name"]:
+        vars(ChessEvaluation).update(engine["evaluation"])
+        ChessEvaluation.buildEvaluationTables()
+        gs.boardScore = gs.computeBoardScore()
+        evaluationEngine = engine["name"]
+
+# Plays openingPlies random moves, drawn again until the position is playable and not too one sided
+def playOpening(gs, sans, rng):
+    while True:
+        for ply in range(openingPlies):
+            validMoves = gs.getValidMoves()
+            if not validMoves:
+                break
+            move = rng.choice(validMoves)
+            sans.append(gs.getSAN(move, validMoves))
+            gs.makeMove(move)
+        if gs.getValidMoves() and abs(getMaterialBalance(gs)) <= openingMaxImbalance:
+            return
+        while gs.moveLog:
+            gs.undoMove()
+        sans.clear()
+
+# White's material minus black's in pawns, counted with fixed values so both games of a pair get the same opening whatever the engines' tables
+def getMaterialBalance(gs):
+    return sum(ChessEvaluation.exchangeValues[square[1]] * (1 if square[0] == "w" else -1) for row in gs.board for square in row if square != "--")
+
+# Only kings, or kings and one knight or bishop
+def isInsufficientMaterial(gs):
+    pieces = [square for row in gs.board for square in row if square != "--" and square[1] != "K"]
+    return not pieces or (len(pieces) == 1 and pieces[0][1] in "NB")
+
+# (result, termination) if the game is over by the rules or by adjudication, otherwise (None, None)
+# scores are the engines' scores of their moves so far from white's point of view
+def getGameResult(gs, validMoves, scores):
+    if not validMoves:
+        return ("0-1" if gs.whiteToMove else "1-0", "checkmate") if gs.checkmate else ("1/2-1/2", "stalemate")
+    if gs.halfmoveClock >= 100:
+        return "1/2-1/2", "fifty move rule"
+    if gs.halfmoveClock and gs.zobristLog[-gs.halfmoveClock:].count(gs.zobristKey) >= 2: # Earlier positions can't come back after a capture or pawn move
+        return "1/2-1/2", "threefold repetition"
+    if isInsufficientMaterial(gs):
+        return "1/2-1/2", "insufficient material"
+    if len(gs.moveLog) >= maxGamePlies:
+        return "1/2-1/2", "adjudication: max plies"
+    lastScores = scores[-resignPlies:]
+    if len(lastScores) == resignPlies and all(score >= resignScore for score in lastScores):
+        return "1-0", "adjudication: score"
+    if len(lastScores) == resignPlies and all(score <= -resignScore for score in lastScores):
+        return "0-1", "adjudication: score"
+    lastScores = scores[-drawPlies:]
+    if len(gs.moveLog) >= drawMinPlies and len(lastScores) == drawPlies and all(abs(score) <= drawScore for score in lastScores):
+        return "1/2-1/2", "adjudication: draw score"
+    return None, None
+
+# Runs in a pool process, plays game gameIndex of the tournament and returns it as a dict
+# Games 2n and 2n+1 start from the same opening with the first engine white in the even game
+def playGame(gameIndex):
+    white, black = tournamentEngines if gameIndex % 2 == 0 else tournamentEngines[::-1]
+    random.seed(f"{tournamentSeed}-{gameIndex}") # ChessAI picks book moves at random, the same arguments give the same games under depth or node limits
+    gs = ChessEngine.GameState()
+    sans = []
+    playOpening(gs, sans, random.Random(f"{tournamentSeed}-opening-{gameIndex // 2}"))
+    transpositionTables = {} # Every engine keeps its own table for the game so neither sees what the other searched
+    scores = []
+    while True:
+        validMoves = gs.getValidMoves()
+        result, termination = getGameResult(gs, validMoves, scores)
+        if result is not None:
+            break
+        engine = white if gs.whiteToMove else black
+        applyEngine(engine, gs)
+        ChessAI.transpositionTable = transpositionTables.get(engine["name"])
+        ChessAI.findBestMove(gs, list(validMoves), queue.Queue(), engine["timeLimit"], engine["nodeLimit"])
+        transpositionTables[engine["name"]] = ChessAI.transpositionTable
+        moveID = ChessAI.nextMove.moveID if ChessAI.nextMove is not None else ChessAI.findRandomMove(validMoves).moveID
+        move = next(move for move in validMoves if move.moveID == moveID) # The search may return a move of its bitboard copy
+        scores.append(ChessAI.searchScore if gs.whiteToMove else -ChessAI.searchScore)
+        sans.append(gs.getSAN(move, validMoves))
+        gs.makeMove(move)
+    return {"index": gameIndex, "white": white["name"], "black": black["name"], "result": result, "termination": termination, "moves": sans}
+
+def formatPGN(game, event, date):
+    tags = [("Event", event), ("Site", "?"), ("Date", date), ("Round", str(game["index"] + 1)), ("White", game["white"]),
+            ("Black", game["black"]), ("Result", game["result"]), ("PlyCount", str(len(game["moves"]))), ("Termination", game["termination"])]
+    tokens = []
+    for ply, san in enumerate(game["moves"]):
+        tokens.append(f"{ply // 2 + 1}. {san}" if ply % 2 == 0 else san)
+    tokens.append(game["result"])
+    lines = [""]
+    for token in tokens:
+        if lines[-1] and len(lines[-1]) + 1 + len(token) > pgnLineLength:
+            lines.append("")
+        lines[-1] += (" " if lines[-1] else "") + token
+    return "".join(f'[{tag} "{value}"]\n' for tag, value in tags) + "\n" + "\n".join(lines) + "\n\n"
+
+# Games already in a PGN file written by this runner, round -> (white, black, result), and the length of the file up to the last whole game
+def readFinishedGames(path):
+    games = {}
+    tags = {}
+    validLength = 0
+    offset = 0
+    with open(path, "rb") as file:
+        for line in file:
+            offset += len(line)
+            text = line.decode("utf-8", "replace").strip()
+            if text.startswith("[") and text.endswith("]") and " " in text:
+                tag, value = text[1:-1].split(" ", 1)
+                tags[tag] = value.strip('"')
+            elif text.split() and text.split()[-1] in ("1-0", "0-1", "1/2-1/2") and "Round" in tags:
+                games[int(tags["Round"]) - 1] = (tags.get("White"), tags.get("Black"), text.split()[-1])
+                tags = {}
+                validLength = offset
+    return games, validLength
+
+# Elo difference from a score of wins, draws and losses and its 95% margin from the spread of the game results, inf if it can't be told yet
+def getEloDifference(wins, draws, losses):
+    games = wins + draws + losses
+    if games == 0:
+        return 0.0, math.inf
+    score = (wins + draws / 2) / games
+    deviation = math.sqrt((wins * (1 - score) ** 2 + draws * (0.5 - score) ** 2 + losses * score ** 2) / games / games)
+    def elo(score):
+        return 400 * math.log10(score / (1 - score)) if 0 < score < 1 else math.copysign(math.inf, score - 0.5)
+    if not 0 < score < 1:
+        return elo(score), math.inf
+    return elo(score), (elo(score + 1.96 * deviation) - elo(score - 1.96 * deviation)) / 2
+
+class Standings():
+    def __init__(self, engineName):
+        self.engineName = engineName # Wins, draws and losses are counted for this engine
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add(self, white, result):
+        if result == "1/2-1/2":
+            self.draws += 1
+        elif (result == "1-0") == (white == self.engineName):
+            self.wins += 1
+        else:
+            self.losses += 1
+
+    def __str__(self):
+        elo, margin = getEloDifference(self.wins, self.draws, self.losses)
+        return f"{self.engineName}: +{self.wins} ={self.draws} -{self.losses}  Elo {elo:+.1f} +/- {margin:.1f}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Self-play tournament between two engine configurations")
+    parser.add_argument("--engine", action="append", default=[], help="engine options, given twice")
+    parser.add_argument("--games", type=int, default=100, help="games in the tournament, played in pairs with colors swapped")
+    parser.add_argument("--pgn", default="tournament.pgn", help="PGN file the games are appended to, read to carry on a tournament")
+    parser.add_argument("--workers", type=int, default=tournamentProcesses, help="games played at once")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the openings")
+    args = parser.parse_args()
+    if len(args.engine) != 2:
+        parser.error("give --engine twice")
+    try:
+        engines = [parseEngine(text) for text in args.engine]
+    except (ValueError, OSError) as error:
+        parser.error(str(error))
+    if engines[0]["name"] == engines[1]["name"]:
+        parser.error("the engines need different names")
+
+    standings = Standings(engines[0]["name"])
+    finished = {}
+    if os.path.exists(args.pgn):
+        finished, validLength = readFinishedGames(args.pgn)
+        for index, (white, black, result) in sorted(finished.items()):
+            expected = (engines[0]["name"], engines[1]["name"]) if index % 2 == 0 else (engines[1]["name"], engines[0]["name"])
+            if (white, black) != expected: # Games of other engines would be mixed into the standings
+                parser.error(f"game {index + 1} in {args.pgn} is {white} - {black}, not {expected[0]} - {expected[1]}, "
+                             "use another --pgn for these engines")
+        with open(args.pgn, "r+b") as file:
+            file.truncate(validLength) # Drop a game that was cut off part way through writing
+        for white, black, result in finished.values():
+            standings.add(white, result)
+        if finished:
+            print(f"Carrying on after {len(finished)} games in {args.pgn}  {standings}")
+    remaining = iter([index for index in range(args.games) if index not in finished])
+    event = f"{engines[0]['name']} vs {engines[1]['name']}"
+    date = datetime.date.today().strftime("%Y.%m.%d")
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(1)) # Unwind so the pool is shut down instead of left running
+
+    pool = concurrent.futures.ProcessPoolExecutor(args.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                  initializer=initTournamentProcess, initargs=(engines, args.seed))
+    try:
+        with open(args.pgn, "a") as pgn:
+            pending = set()
+            while True:
+                for index in remaining:
+                    pending.add(pool.submit(playGame, index))
+                    if len(pending) >= args.workers * gamesInFlightPerProcess:
+                        break
+                if not pending:
+                    break
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    game = future.result()
+                    pgn.write(formatPGN(game, event, date))
+                    pgn.flush() # A stopped tournament loses at most the games being played
+                    finished[game["index"]] = game
+                    standings.add(game["white"], game["result"])
+                    print(f"Game {game['index'] + 1:4d}  {game['white']} - {game['black']}  {game['result']:7s}  {game['termination']:28s}  "
+                          f"{len(finished)}/{args.games}  {standings}", flush=True)
+    finally:
+        pool.shutdown(cancel_futures=True)
+    print(standings)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+UCI (Universal Chess Interface) front end, so tournament managers and test harnesses can run the engine over stdin and stdout.
+Commands are read on the main thread while the search runs on its own thread, so stop, isready and quit are answered during a search.
+Run: python ChessUCI.py
+"""
+
+import os
+import sys
+import threading
+import time
+import ChessAI
+import ChessEngine
+
+engineName = "Chess"
+engineAuthor = "Chess contributors"
+maxHashSizeMB = 1024
+defaultMovesToGo = 30 # Moves the remaining clock time is shared between when the GUI doesn't send movestogo
+moveOverhead = 0.05 # Seconds kept back from every move for the GUI and the pipe
+
+class UCIEngine():
+    def __init__(self, out=sys.stdout):
+        self.out = out
+        self.outLock = threading.Lock() # The search thread sends info and bestmove while the main thread answers commands
+        self.gs = ChessEngine.GameState()
+        self.searchThread = None
+        self.stopEvent = threading.Event()
+        self.maxSearchDepth = ChessAI.maxSearchDepth
+        ChessAI.stopRequested = self.stopEvent.is_set
+        if ChessAI.searchBackend == "bitboard":
+            import ChessBitboard # Build the bitboard tables now instead of on the clock of the first move
+
+    def send(self, line):
+        with self.outLock:
+            print(line, file=self.out, flush=True)
+
+    # Handles one line of input, returns False after quit
+    def handle(self, line):
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send("id name " + engineName)
+            self.send("id author " + engineAuthor)
+            self.send(f"option name Hash type spin default {ChessAI.hashSizeMB} min 1 max {maxHashSizeMB}")
+            self.send(f"option name Threads type spin default {ChessAI.searchWorkers} min 1 max {os.cpu_count() or 1}")
+            self.send(f"option name OwnBook type check default {str(ChessAI.useOpeningBook).lower()}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "setoption":
+            self.setOption(args)
+        elif command == "ucinewgame":
+            self.stopSearch()
+            ChessAI.transpositionTable = None # Nothing from the last game carries over
+        elif command == "position":
+            self.stopSearch()
+            self.setPosition(args)
+        elif command == "go":
+            self.stopSearch()
+            self.go(args)
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "quit":
+            self.stopSearch()
+            return False
+        # Anything else (debug, register, ponderhit...) is ignored as UCI asks
+        return True
+
+    # setoption name <id> value <x>
+    def setOption(self, args):
+        if "value" not in args or args[0] != "name":
+            return
+        name = " ".join(args[1:args.index("value")]).lower()
+        value = " ".join(args[args.index("value") + 1:])
+        try:
+            if name == "hash":
+                ChessAI.hashSizeMB = min(max(int(value), 1), maxHashSizeMB) # The table is rebuilt at the start of the next search
+            elif name == "threads":
+                ChessAI.searchWorkers = max(int(value), 1)
+            elif name == "ownbook":
+                ChessAI.useOpeningBook = value.lower() == "true"
+        except ValueError:
+            self.send("info string bad value " + value + " for " + name)
+
+    # position [startpos | fen <fen>] [moves <move> ...]
+    def setPosition(self, args):
+        gs = ChessEngine.GameState()
+        movesIndex = args.index("moves") if "moves" in args else len(args)
+        if args and args[0] == "fen":
+            try:
+                gs.loadFEN(" ".join(args[1:movesIndex]))
+            except ValueError as error:
+                self.send("info string " + str(error))
+                return
+        for name in args[movesIndex + 1:]:
+            move = findMove(gs, name)
+            if move is None:
+                self.send("info string illegal move " + name)
+                break
+            gs.makeMove(move)
+        self.gs = gs
+
+    # go [depth N] [movetime MS] [wtime MS] [btime MS] [winc MS] [binc MS] [movestogo N] [nodes N] [infinite]
+    def go(self, args):
+        options = {}
+        for i, arg in enumerate(args):
+            if arg in ("depth", "movetime", "wtime", "btime", "winc", "binc", "movestogo", "nodes") and i + 1 < len(args):
+                options[arg] = int(args[i + 1])
+        infinite = "infinite" in args
+        clock = options.get("wtime" if self.gs.whiteToMove else "btime")
+        if "movetime" in options:
+            timeLimit = options["movetime"] / 1000
+        elif clock is not None:
+            increment = options.get("winc" if self.gs.whiteToMove else "binc", 0)
+            timeLimit = allocateTime(clock / 1000, increment / 1000, options.get("movestogo", defaultMovesToGo))
+        elif infinite or "depth" in options or "nodes" in options:
+            timeLimit = float("inf") # Only the depth, the nodes or stop end the search
+        else:
+            timeLimit = ChessAI.searchTimeLimit
+        ChessAI.maxSearchDepth = min(options.get("depth", self.maxSearchDepth), self.maxSearchDepth)
+        if ChessAI.searchWorkers > 1:
+            # The pool is forked here on the main thread, forked from the search thread while this one waits on stdin
+            # a pool process would hang closing its copy of stdin, whose lock is held by the read
+            ChessAI.getSearchPool(ChessAI.searchWorkers)
+        self.stopEvent.clear()
+        self.searchThread = threading.Thread(target=self.search, args=(self.gs, timeLimit, options.get("nodes"), infinite), daemon=True)
+        self.searchThread.start()
+
+    def search(self, gs, timeLimit, nodeLimit, infinite):
+        validMoves = gs.getValidMoves()
+        if validMoves:
+            ChessAI.findBestMove(gs, validMoves, InfoSender(self), timeLimit, nodeLimit)
+        if infinite: # UCI only allows bestmove after stop in infinite mode, even if the search ended by itself
+            self.stopEvent.wait()
+        bestMove = ChessAI.nextMove if validMoves else None
+        line = "bestmove " + (bestMove.getUCINotation() if bestMove is not None else "0000")
+        if bestMove is not None and len(ChessAI.principalVariation) > 1:
+            line += " ponder " + ChessAI.principalVariation[1].getUCINotation()
+        self.send(line)
+
+    # Cooperative cancel, the search sees it within a few hundred nodes and sends bestmove before this returns
+    def stopSearch(self):
+        if self.searchThread is not None:
+            self.stopEvent.set()
+            self.searchThread.join()
+            self.searchThread = None
+
+# Stands in for the returnQueue findBestMove puts every finished depth's move on, sends an info line for it
+class InfoSender():
+    def __init__(self, engine):
+        self.engine = engine
+        self.depth = 0
+        self.start = time.perf_counter()
+
+    def put(self, move):
+        if move is None:
+            return
+        self.depth += 1
+        seconds = time.perf_counter() - self.start
+        pv = ChessAI.principalVariation or [move]
+        # Mate scores carry no distance (and the line can be cut short by the hash table), so they go out as a huge cp score instead of score mate
+        self.engine.send(f"info depth {self.depth} score cp {round(ChessAI.searchScore * 100)} nodes {ChessAI.searchNodes} nps {int(ChessAI.searchNodes / seconds) if seconds > 0 else 0} "
+                         f"time {int(seconds * 1000)} pv " + " ".join(pvMove.getUCINotation() for pvMove in pv))
+
+# Legal move in long algebraic notation (e2e4, e7e8q) or None
+def findMove(gs, name):
+    for move in gs.getValidMoves():
+        if move.getUCINotation() == name:
+            return move
+    return None
+
+# Seconds for the next move from the clock: an even share of what is left over movesToGo moves plus most of the increment,
+# never more than half the clock so a slow move can't lose on time
+def allocateTime(clock, increment, movesToGo):
+    timeLimit = clock / max(movesToGo, 1) + increment * 0.75
+    return max(min(timeLimit, clock / 2) - moveOverhead, 0.01)
+
+def main():
+    engine = UCIEngine()
+    for line in sys.stdin:
+        if not engine.handle(line):
+            break
+    engine.stopSearch()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Long lived AI search process.
+The worker keeps its own GameState in step with the game through small messages (move IDs, undo, new game) instead of
+pickling the whole GameState for every search, so the process, the bitboard tables and the transposition table stay warm between moves.
+Results come back on a listener thread that calls onResult, nothing has to poll the process.
+Pondering searches the reply the last search expects while the opponent thinks, if they play it the search carries on as the real one.
+"""
+
+import atexit
+import multiprocessing
+import threading
+import time
+import ChessAI
+import ChessEngine
+
+class SearchWorker():
+    # onResult(searchID, moveID, final, pv, ponderMoveID) is called on the listener thread for every finished depth and once more with final=True
+    # moveID is 0 if there was no move, the receiver should ignore results whose searchID is not the search it is waiting for
+    # pv is the line the search expects as text, best move first, ponderMoveID is the reply it expects (0 if none) to pass to ponder
+    def __init__(self, onResult=None):
+        self.onResult = onResult
+        self.commands = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.activeSearchID = multiprocessing.Value("i", 0, lock=False) # Search the worker should be running, anything else stops it
+        self.deadline = multiprocessing.Value("d", 0.0, lock=False) # time.time() the running search has to stop at, 0 for its own limits
+        self.lastSearchID = 0
+        self.ponderStart = 0.0
+        self.process = multiprocessing.Process(target=runWorker, args=(self.commands, self.results, self.activeSearchID, self.deadline, ChessAI.getSearchSettings()))
+        self.process.start()
+        self.listener = threading.Thread(target=self.listen, daemon=True)
+        self.listener.start()
+        atexit.register(self.close)
+
+    def newGame(self):
+        self.stop()
+        self.commands.put(("new",))
+
+    # Every move made on the GUI GameState has to be sent so the worker's copy stays the same
+    def makeMove(self, move):
+        self.commands.put(("move", move.moveID))
+
+    def undoMove(self):
+        self.commands.put(("undo",))
+
+    # Starts searching the current position, returns the searchID its results will carry
+    def go(self, timeLimit=None, nodeLimit=None):
+        self.lastSearchID += 1
+        self.deadline.value = 0.0
+        self.activeSearchID.value = self.lastSearchID
+        self.commands.put(("go", self.lastSearchID, timeLimit, nodeLimit))
+        return self.lastSearchID
+
+    # Cooperative cancel, the search sees it within a few hundred nodes and still sends its final result
+    def stop(self):
+        self.activeSearchID.value = 0
+
+    # Makes the expected reply and searches after it with no time limit, returns the searchID
+    # Must be followed by ponderHit or ponderMiss before anything else is sent
+    def ponder(self, moveID):
+        self.commands.put(("move", moveID))
+        self.ponderStart = time.time()
+        return self.go(timeLimit=float("inf"))
+
+    # The opponent played the expected reply, the ponder search becomes the real search with timeLimit counted from when pondering started
+    # so after a long think its result comes straight away, returns the searchID to wait for
+    def ponderHit(self, timeLimit=None):
+        timeLimit = ChessAI.searchTimeLimit if timeLimit is None else timeLimit
+        self.deadline.value = self.ponderStart + timeLimit if timeLimit is not None else time.time()
+        return self.lastSearchID
+
+    # The opponent played something else, stop pondering and take the expected reply back so the real move can be sent
+    def ponderMiss(self):
+        self.stop()
+        self.undoMove()
+
+    def close(self):
+        if self.process.is_alive():
+            self.stop()
+            self.commands.put(("quit",))
+            self.process.join(5)
+            if self.process.is_alive():
+                self.process.terminate()
+
+    def listen(self):
+        while True:
+            message = self.results.get()
+            if message is None: # Worker quit
+                break
+            if self.onResult is not None:
+                self.onResult(*message)
+
+# Stands in for the returnQueue findBestMove puts every finished depth's move on
+class ResultSender():
+    def __init__(self, results, searchID):
+        self.results = results
+        self.searchID = searchID
+
+    def put(self, move):
+        self.results.put((self.searchID, move.moveID if move is not None else 0, False, getPrincipalVariationText(), getPonderMoveID()))
+
+def getPrincipalVariationText():
+    return " ".join(str(move) for move in ChessAI.principalVariation)
+
+def getPonderMoveID():
+    return ChessAI.principalVariation[1].moveID if len(ChessAI.principalVariation) > 1 else 0
+
+# Worker process main loop
+def runWorker(commands, results, activeSearchID, deadline, settings):
+    vars(ChessAI).update(settings)
+    gs = ChessEngine.GameState()
+    while True:
+        command = commands.get()
+        if command[0] == "quit":
+            results.put(None)
+            break
+        elif command[0] == "new":
+            gs = ChessEngine.GameState()
+        elif command[0] == "move":
+            for move in gs.getValidMoves():
+                if move.moveID == command[1]:
+                    gs.makeMove(move)
+                    break
+        elif command[0] == "undo":
+            gs.undoMove()
+        elif command[0] == "go":
+            searchID, timeLimit, nodeLimit = command[1:]
+            if activeSearchID.value != searchID: # Stopped before it started
+                results.put((searchID, 0, True, "", 0))
+                continue
+            ChessAI.stopRequested = lambda: activeSearchID.value != searchID or (deadline.value != 0.0 and time.time() >= deadline.value)
+            ChessAI.findBestMove(gs, gs.getValidMoves(), ResultSender(results, searchID), timeLimit, nodeLimit)
+            results.put((searchID, ChessAI.nextMove.moveID if ChessAI.nextMove is not None else 0, True, getPrincipalVariationText(), getPonderMoveID()))
@@ -0,0 +1,68 @@
+"""
+Tests that the bitboard backend agrees with the array backend on every legal move list, board, check and FEN.
+Run: python -m pytest test_ChessBitboard.py
+"""
+
+import random
+import unittest
+import ChessBitboard
+import ChessEngine
+import ChessPerft
+
+def moveKeys(moves):
+    return sorted((move.moveID, move.enPassant, move.castleMove) for move in moves)
+
+class CompareBackendsTest(unittest.TestCase):
+    def assertSamePosition(self, arrayState, bitboardState):
+        line = " ".join(str(move) for move in arrayState.moveLog)
+        arrayMoves = arrayState.getValidMoves()
+        bitboardMoves = bitboardState.getValidMoves()
+        self.assertEqual(moveKeys(arrayMoves), moveKeys(bitboardMoves), "moves differ after " + line)
+        self.assertEqual(arrayState.inCheck, bitboardState.inCheck, "check differs after " + line)
+        self.assertEqual((arrayState.checkmate, arrayState.stalemate), (bitboardState.checkmate, bitboardState.stalemate), line)
+        self.assertEqual([list(row) for row in arrayState.board], bitboardState.board, "boards differ after " + line)
+        self.assertEqual(arrayState.getFEN(), bitboardState.getFEN(), line)
+        self.assertEqual(arrayState.zobristKey, bitboardState.zobristKey, line)
+        return arrayMoves, bitboardMoves
+
+    # Random games played on both backends side by side, with some moves taken back to exercise undo
+    def testRandomGames(self, games=30, maxPlies=150):
+        rng = random.Random(0)
+        for game in range(games):
+            arrayState = ChessEngine.GameState()
+            bitboardState = ChessBitboard.GameState()
+            for ply in range(maxPlies):
+                arrayMoves, bitboardMoves = self.assertSamePosition(arrayState, bitboardState)
+                if not arrayMoves:
+                    break
+                if ply > 0 and rng.random() < 0.1:
+                    arrayState.undoMove()
+                    bitboardState.undoMove()
+                    continue
+                move = rng.choice(arrayMoves)
+                arrayState.makeMove(move)
+                bitboardState.makeMove(next(bitboardMove for bitboardMove in bitboardMoves if bitboardMove.moveID == move.moveID))
+
+    # Every position two plies from the perft positions, they are picked for castling, pins, enPassant and promotions
+    def testPerftPositions(self):
+        for name, fen, expected in ChessPerft.standardPositions:
+            arrayState = ChessEngine.GameState(fen)
+            bitboardState = ChessBitboard.GameState(fen)
+            for move in self.assertSamePosition(arrayState, bitboardState)[0]:
+                arrayState.makeMove(move)
+                bitboardState.makeMove(move)
+                for reply in self.assertSamePosition(arrayState, bitboardState)[0]:
+                    arrayState.makeMove(reply)
+                    bitboardState.makeMove(reply)
+                    self.assertSamePosition(arrayState, bitboardState)
+                    arrayState.undoMove()
+                    bitboardState.undoMove()
+                arrayState.undoMove()
+                bitboardState.undoMove()
+
+    def testFromGameState(self):
+        gs = ChessEngine.GameState(ChessPerft.standardPositions[1][1])
+        self.assertSamePosition(gs, ChessBitboard.GameState.fromGameState(gs))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+"""
+Tests for the EPD batch analyser.
+Run: python -m pytest test_ChessEPD.py
+"""
+
+import unittest
+from unittest import mock
+import ChessAI
+import ChessEPD
+
+validLine = 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - bm Bb5; id "test.001";\n'
+
+class AnalysePositionsTest(unittest.TestCase):
+    def setUp(self):
+        self.settings = ChessAI.getSearchSettings()
+        ChessAI.useOpeningBook = False
+
+    def tearDown(self):
+        vars(ChessAI).update(self.settings)
+
+    def analyse(self, lines):
+        return list(ChessEPD.analysePositions(enumerate(lines, 1), processes=1, timeLimit=float("inf"), nodeLimit=500))
+
+    def testMalformedLineDoesNotStopTheStream(self):
+        results = self.analyse(["not a position\n", validLine])
+        self.assertEqual([result["line"] for result in results], [1, 2])
+        self.assertIn("error", results[0])
+        self.assertNotIn("error", results[1])
+        self.assertEqual(results[1]["id"], "test.001")
+        self.assertIn("bestMove", results[1])
+
+    def testSearchFailureIsReportedOnItsLine(self):
+        findBestMove = ChessAI.findBestMove
+        calls = []
+        def failFirstSearch(*args):
+            calls.append(args)
+            if len(calls) == 1:
+                raise RuntimeError("search blew up")
+            return findBestMove(*args)
+        with mock.patch.object(ChessAI, "findBestMove", failFirstSearch):
+            results = self.analyse([validLine, validLine])
+        self.assertEqual(len(results), 2)
+        self.assertIn("search blew up", results[0]["error"])
+        self.assertEqual(results[0]["id"], "test.001")
+        self.assertNotIn("error", results[1])
+        self.assertIn("bestMove", results[1])
+
+    def testFinishedPositionHasAStatus(self):
+        results = self.analyse(["rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq -\n"])
+        self.assertEqual(results[0]["status"], "checkmate")
+
+if __name__ == "__main__":
+    unittest.main()
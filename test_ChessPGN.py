@@ -0,0 +1,61 @@
+"""
+Tests for the PGN reader and replayer.
+Run: python -m pytest test_ChessPGN.py
+"""
+
+import io
+import unittest
+import ChessPGN
+
+scholarsMate = """[Event "Test"]
+[White "A"]
+[Black "B"]
+[Result "1-0"]
+
+1. e4 e5 ; comment to the end of the line
+2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+"""
+
+class ReadGamesTest(unittest.TestCase):
+    def replay(self, text, backend="bitboard"):
+        games = list(ChessPGN.readGames(io.StringIO(text)))
+        self.assertEqual(len(games), 1)
+        return ChessPGN.replayGame(*games[0], backend=backend)
+
+    def testSemicolonCommentEndsAtLineEnd(self):
+        for backend in ("array", "bitboard"):
+            result = self.replay(scholarsMate, backend)
+            self.assertNotIn("error", result)
+            self.assertEqual(result["plies"], 7)
+            self.assertEqual(result["result"], "1-0")
+
+    def testSemicolonCommentKeepsResultToken(self):
+        number, tags, movetext = next(ChessPGN.readGames(io.StringIO(scholarsMate)))
+        moves, resultToken = ChessPGN.getMoveTokens(movetext)
+        self.assertEqual(moves, ["e4", "e5", "Qh5", "Nc6", "Bc4", "Nf6", "Qxf7#"])
+        self.assertEqual(resultToken, "1-0")
+
+    def testBraceCommentOverLines(self):
+        result = self.replay(scholarsMate.replace("; comment to the end of the line", "{ a comment; over\ntwo lines }"))
+        self.assertNotIn("error", result)
+        self.assertEqual(result["plies"], 7)
+
+class MoveFromSANTest(unittest.TestCase):
+    def testLowercasePromotion(self):
+        for backend in ("array", "bitboard"):
+            gs = ChessPGN.newGameState(backend, "8/4P1k1/8/8/8/8/8/4K3 w - - 0 1")
+            for san in ("e8=q", "e8q", "e8=Q", "e8=n"):
+                move = gs.getMoveFromSAN(san)
+                self.assertIsNotNone(move, san)
+                self.assertEqual(move.promotionPiece, san[-1].upper())
+            self.assertIsNone(gs.getMoveFromSAN("e8=k"))
+
+    def testLowercasePromotionInGame(self):
+        game = '[Result "*"]\n\n1. e4 d5 2. exd5 c6 3. dxc6 Nf6 4. cxb7 Nbd7 5. bxa8=q *\n'
+        number, tags, movetext = next(ChessPGN.readGames(io.StringIO(game)))
+        result = ChessPGN.replayGame(number, tags, movetext)
+        self.assertNotIn("error", result)
+        self.assertEqual(result["plies"], 9)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+"""
+Perft node counts of the standard positions on both backends, the regression test for getValidMoves.
+Deeper counts are left to python ChessPerft.py --depth N, which also times them.
+Run: python -m pytest test_ChessPerft.py
+"""
+
+import unittest
+import ChessPerft
+
+maxTestNodes = 100000 # Depths with more expected nodes than this are skipped, they take too long for every test run
+
+class PerftTest(unittest.TestCase):
+    def checkBackend(self, backend):
+        for name, fen, expected in ChessPerft.standardPositions:
+            for depth, nodes in sorted(expected.items()):
+                if nodes > maxTestNodes:
+                    break
+                with self.subTest(position=name, depth=depth):
+                    gs = ChessPerft.newGameState(backend)
+                    gs.loadFEN(fen)
+                    self.assertEqual(ChessPerft.perft(gs, depth), nodes)
+
+    def testArray(self):
+        self.checkBackend("array")
+
+    def testBitboard(self):
+        self.checkBackend("bitboard")
+
+    def testDivideAddsUp(self):
+        gs = ChessPerft.newGameState("array")
+        gs.loadFEN(ChessPerft.standardPositions[1][1])
+        self.assertEqual(sum(ChessPerft.divide(gs, 2).values()), ChessPerft.standardPositions[1][2][2])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""
+Tests for the UCI front end, run as a process over stdin and stdout like a GUI runs it.
+Run: python -m pytest test_ChessUCI.py
+"""
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+engineScript = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ChessUCI.py")
+
+class StopTest(unittest.TestCase):
+    # Starts an infinite search with the given threads, sends stop thinkSeconds after stopDepth is finished and returns the output lines
+    # The stop lands in the middle of the next depth, which has to end within stopSeconds instead of running to its end
+    def stopSearch(self, threads, stopDepth=7, thinkSeconds=2.0, stopSeconds=2.0):
+        engine = subprocess.Popen([sys.executable, engineScript], stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            engine.stdin.write(f"uci\nsetoption name Threads value {threads}\nsetoption name OwnBook value false\n"
+                               "position startpos moves e2e4\ngo infinite\n")
+            engine.stdin.flush()
+            lines = []
+            while not lines or not lines[-1].startswith(f"info depth {stopDepth} "):
+                line = engine.stdout.readline()
+                self.assertTrue(line, lines) # The engine ended before reaching stopDepth
+                lines.append(line.strip())
+            time.sleep(thinkSeconds)
+            start = time.perf_counter()
+            out, err = engine.communicate("stop\nquit\n", timeout=60)
+            self.assertLess(time.perf_counter() - start, stopSeconds)
+        finally:
+            engine.kill()
+        return lines + out.splitlines()
+
+    def testStopOneThread(self):
+        lines = self.stopSearch(1)
+        self.assertTrue(any(line.startswith("bestmove ") and line != "bestmove 0000" for line in lines), lines)
+
+    def testStopSeveralThreads(self):
+        lines = self.stopSearch(2)
+        self.assertTrue(any(line.startswith("bestmove ") and line != "bestmove 0000" for line in lines), lines)
+        self.assertTrue(any(line.startswith("info depth ") for line in lines), lines)
+
+if __name__ == "__main__":
+    unittest.main()